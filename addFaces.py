@@ -1,7 +1,9 @@
 import cv2
-import pickle
 import numpy as np
 import os
+from face_gallery import FaceGallery
+from recognition_index import publish_index
+from face_detection import detector_from_config
 
 # Check if 'data/' directory exists, if not create it
 if not os.path.exists('data/'):
@@ -9,7 +11,7 @@ if not os.path.exists('data/'):
     
 # Open the default camera (usually the built-in webcam)
 video = cv2.VideoCapture(0)
-facedetect = cv2.CascadeClassifier('data/haarcascade_frontalface_default.xml')
+facedetect = detector_from_config()
 faces_data=[] #emty list
 
 i=0
@@ -20,7 +22,7 @@ while True:
     ret, frame = video.read()
     
     gray= cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) #for color and conversion
-    faces= facedetect.detectMultiScale(gray, 1.3, 5)
+    faces= facedetect.detect(gray)
     
     #get coordinate from faces: xy and w h widtyh height 
     for (x,y,w,h) in faces:
@@ -50,29 +52,9 @@ cv2.destroyAllWindows()
 faces_data= np.asarray(faces_data)
 faces_data= faces_data.reshape(100, -1)
 
-#for names
-if 'names.pkl' not in os.listdir('data/'):
-    names= [name]*100
-    with open ('data/names.pkl','wb') as f:
-        pickle.dump(names, f)
-        
-else:
-    with open ('data/names.pkl','rb') as f:
-        names= pickle.load(f)
-    names =names+[name]*100
-    with open ('data/names.pkl', 'wb') as f:
-        pickle.dump(names, f)   
-        
-#for faces        
-if 'faces_data.pkl' not in os.listdir('data/'):
-    with open ('data/faces_data.pkl', 'wb') as f:
-        pickle.dump(faces_data, f)
-        
-else:
-    with open ('data/faces_data.pkl', 'rb') as f:
-        faces= pickle.load(f)
-    faces = np.append(faces, faces_data, axis=0)
-    with open ('data/faces_data.pkl', 'wb') as f:
-        pickle.dump(faces, f)                  
-    
-    print("Face data and names saved successfully!")
+# Append as a new gallery segment; existing samples are not rewritten
+gallery = FaceGallery()
+gallery.migrate_legacy()
+gallery.append(faces_data, name)
+publish_index()
+print("Face data and names saved successfully!")
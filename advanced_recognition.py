@@ -1,14 +1,17 @@
-from sklearn.neighbors import KNeighborsClassifier 
 import cv2
-import pickle
 import numpy as np
 import os
-import csv 
 import time
 from datetime import datetime
 import pygame
 import threading
-from win32com.client import Dispatch
+from recognition_engine import RecognitionEngine
+from pipeline import RecognitionPipeline
+from face_tracker import tracker_from_config
+from motion_gate import motion_gate_from_config
+from face_detection import detector_from_config
+from notifications import announcer_from_config
+from attendance_writer import get_writer
 
 class AdvancedFaceRecognition:
     def __init__(self):
@@ -19,21 +22,16 @@ class AdvancedFaceRecognition:
     def setup_system(self):
         """Initialize system components"""
         self.video = cv2.VideoCapture(0)
-        self.facedetect = cv2.CascadeClassifier('data/haarcascade_frontalface_default.xml')
         self.attendance_marked = set()  # Track who has been marked today
         self.last_recognition = {}  # Prevent spam marking
         self.confidence_threshold = 0.7
+        self.attendance_writer = get_writer()
         
     def load_models(self):
         """Load trained face recognition models"""
         try:
-            with open('data/names.pkl', 'rb') as f:
-                self.LABELS = pickle.load(f)
-            with open('data/faces_data.pkl', 'rb') as f:
-                self.FACES = pickle.load(f)
-            
-            self.knn = KNeighborsClassifier(n_neighbors=5)
-            self.knn.fit(self.FACES, self.LABELS)
+            self.engine = RecognitionEngine(
+                n_neighbors=5, confidence='distance', threshold=self.confidence_threshold)
             print("✅ Face recognition models loaded successfully")
             
         except Exception as e:
@@ -43,17 +41,15 @@ class AdvancedFaceRecognition:
         """Setup audio notifications"""
         try:
             pygame.mixer.init()
-            self.speak_engine = Dispatch("SAPI.SpVoice")
             print("✅ Audio system initialized")
         except:
             print("⚠️ Audio system not available")
+        # Speech runs on a worker thread; falls back to console output without a voice
+        self.announcer = announcer_from_config()
             
     def speak(self, text):
-        """Text to speech"""
-        try:
-            self.speak_engine.speak(text)
-        except:
-            print(f"🔊 {text}")
+        """Text to speech, queued so the video loop never waits on it"""
+        self.announcer.announce(text)
             
     def play_sound(self, sound_type="success"):
         """Play notification sounds"""
@@ -67,12 +63,6 @@ class AdvancedFaceRecognition:
         except:
             pass
             
-    def get_face_confidence(self, face_encoding):
-        """Calculate confidence score for face recognition"""
-        distances = self.knn.kneighbors([face_encoding], return_distance=True)[0][0]
-        confidence = 1.0 - (np.mean(distances) / 100)  # Normalize
-        return max(0, min(1, confidence))
-        
     def draw_enhanced_ui(self, frame, name, confidence, x, y, w, h):
         """Draw enhanced UI elements on frame"""
         # Main face rectangle
@@ -107,7 +97,7 @@ class AdvancedFaceRecognition:
         # System info text
         info_lines = [
             "🎯 Advanced Face Recognition System",
-            f"👥 Trained Users: {len(set(self.LABELS))}",
+            f"👥 Trained Users: {len(set(self.engine.classes))}",
             f"📅 Date: {datetime.now().strftime('%d-%m-%Y')}",
             "⌨️ Controls: 'O'=Mark | 'Q'=Quit | 'R'=Reset"
         ]
@@ -136,31 +126,15 @@ class AdvancedFaceRecognition:
         self.last_recognition[name] = current_time
         self.attendance_marked.add(name)
         
-        # Save to CSV
-        ts = time.time()
-        date = datetime.fromtimestamp(ts).strftime("%d-%m-%y")
-        timestamp = datetime.fromtimestamp(ts).strftime("%H:%M-%S")
-        
-        attendance_file = f"Attendance/Attendance_{date}.csv"
-        file_exists = os.path.isfile(attendance_file)
-        
-        try:
-            with open(attendance_file, "a", newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                if not file_exists:
-                    writer.writerow(["NAME", "TIME"])
-                writer.writerow([name, timestamp])
-                
-            # Audio notifications
-            self.speak(f"Attendance marked for {name}")
-            self.play_sound("success")
+        # Queued for the attendance writer thread; nothing touches the disk here
+        marked_at = self.attendance_writer.mark(name)
             
-            print(f"✅ Attendance marked: {name} at {timestamp}")
-            return True
-            
-        except Exception as e:
-            print(f"❌ Error marking attendance: {e}")
-            return False
+        # Audio notifications
+        self.speak(f"Attendance marked for {name}")
+        self.play_sound("success")
+        
+        print(f"✅ Attendance marked: {name} at {marked_at.strftime('%H:%M-%S')}")
+        return True
             
     def run(self):
         """Main recognition loop"""
@@ -170,7 +144,14 @@ class AdvancedFaceRecognition:
         print("  - Press 'Q' to quit")
         print("  - Press 'R' to reset today's attendance")
         
+        pipeline = RecognitionPipeline(
+            self.video, detector_from_config, self.engine,
+            tracker=tracker_from_config(), motion_gate=motion_gate_from_config())
+        result = None
+        
         try:
+            pipeline.start()
+            
             # Load background if exists
             if os.path.exists("background.png"):
                 img_background = cv2.imread("background.png")
@@ -178,26 +159,17 @@ class AdvancedFaceRecognition:
                 img_background = None
                 
             while True:
-                ret, frame = self.video.read()
-                if not ret:
-                    break
-                    
-                # Detect faces
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = self.facedetect.detectMultiScale(gray, 1.3, 5)
+                # Capture, detection and batched recognition run on pipeline threads
+                item = pipeline.get(timeout=0.1)
+                if item is None:
+                    if not pipeline.is_alive():
+                        break
+                    cv2.waitKey(1)
+                    continue
+                frame, faces, result = item.frame, item.boxes, item.result
                 
                 # Process each detected face
-                for (x, y, w, h) in faces:
-                    # Extract and process face
-                    crop_img = frame[y:y+h, x:x+w, :]
-                    resized_img = cv2.resize(crop_img, (50, 50)).flatten().reshape(1, -1)
-                    
-                    # Predict identity
-                    output = self.knn.predict(resized_img)
-                    confidence = self.get_face_confidence(resized_img[0])
-                    
-                    name = output[0] if confidence > self.confidence_threshold else "Unknown"
-                    
+                for (x, y, w, h), name, confidence in zip(faces, result.names, result.confidence):
                     # Draw enhanced UI
                     frame = self.draw_enhanced_ui(frame, name, confidence, x, y, w, h)
                 
@@ -227,15 +199,10 @@ class AdvancedFaceRecognition:
                 if key == ord('q') or key == ord('Q'):
                     break
                 elif key == ord('o') or key == ord('O'):
-                    # Mark attendance for all recognized faces
-                    for (x, y, w, h) in faces:
-                        crop_img = frame[y:y+h, x:x+w, :]
-                        resized_img = cv2.resize(crop_img, (50, 50)).flatten().reshape(1, -1)
-                        output = self.knn.predict(resized_img)
-                        confidence = self.get_face_confidence(resized_img[0])
-                        
-                        if confidence > self.confidence_threshold:
-                            self.mark_attendance(output[0])
+                    # Mark attendance for all recognized faces, reusing the displayed frame's results
+                    if result is not None:
+                        for name, confidence in result.recognized():
+                            self.mark_attendance(name)
                             
                 elif key == ord('r') or key == ord('R'):
                     # Reset today's attendance tracking
@@ -248,6 +215,13 @@ class AdvancedFaceRecognition:
             
         finally:
             # Cleanup
+            print(f"📈 Pipeline: {pipeline.format_stats()}")
+            try:
+                pipeline.stop()
+            except Exception as e:
+                print(f"❌ Recognition pipeline failed: {e}")
+            self.announcer.close()
+            self.attendance_writer.close()
             self.video.release()
             cv2.destroyAllWindows()
             print("👋 Face Recognition System stopped")
@@ -3,40 +3,29 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-import os
-import glob
+from attendance_db import get_db
+from attendance_archive import get_archive
+from attendance_bitmap import get_bitmap
 
 st.set_page_config(page_title="📊 Advanced Attendance Analytics", layout="wide")
 
-def load_all_attendance_data():
-    """Load all attendance files and combine them"""
-    all_files = glob.glob("Attendance/Attendance_*.csv")
-    all_data = []
-    
-    for file in all_files:
-        try:
-            df = pd.read_csv(file)
-            if not df.empty and 'NAME' in df.columns:
-                # Extract date from filename
-                date_str = file.split('_')[1].replace('.csv', '')
-                df['DATE'] = date_str
-                df['FULL_DATE'] = pd.to_datetime(date_str, format='%d-%m-%y')
-                all_data.append(df)
-        except:
-            continue
-    
-    if all_data:
-        return pd.concat(all_data, ignore_index=True)
-    return pd.DataFrame()
+def load_all_attendance_data(start=None, end=None, names=None):
+    """Query attendance records, reading only the archived months in range plus recent days from SQLite"""
+    try:
+        return get_archive().load(start, end, names)
+    except Exception as e:
+        st.error(f"Error reading attendance database: {e}")
+        return pd.DataFrame()
 
 def main():
     st.title("📊 Advanced Face Recognition Attendance Analytics")
     st.markdown("---")
     
-    # Load data
-    df_all = load_all_attendance_data()
+    # Filter choices come straight from the database
+    db = get_db()
+    min_date, max_date = db.date_bounds()
     
-    if df_all.empty:
+    if min_date is None:
         st.warning("No attendance data found!")
         return
     
@@ -44,9 +33,6 @@ def main():
     st.sidebar.header("🔍 Filters")
     
     # Date range filter
-    min_date = df_all['FULL_DATE'].min()
-    max_date = df_all['FULL_DATE'].max()
-    
     date_range = st.sidebar.date_input(
         "Select Date Range",
         value=(min_date, max_date),
@@ -55,35 +41,32 @@ def main():
     )
     
     # Person filter
-    all_people = df_all['NAME'].unique()
+    all_people = db.people()
     selected_people = st.sidebar.multiselect(
         "Select People",
         options=all_people,
         default=all_people
     )
     
-    # Filter data
+    # Headline metrics and charts come from the rollup tables, not raw rows
     if len(date_range) == 2:
-        mask = (df_all['FULL_DATE'] >= pd.Timestamp(date_range[0])) & \
-               (df_all['FULL_DATE'] <= pd.Timestamp(date_range[1])) & \
-               (df_all['NAME'].isin(selected_people))
-        filtered_df = df_all[mask]
+        start, end = date_range
     else:
-        filtered_df = df_all[df_all['NAME'].isin(selected_people)]
+        start = end = None
+    summary = db.summary(start, end, selected_people)
     
     # Main dashboard
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("📊 Total Records", len(filtered_df))
+        st.metric("📊 Total Records", summary['records'])
     with col2:
-        st.metric("👥 Unique People", filtered_df['NAME'].nunique())
+        st.metric("👥 Unique People", summary['people'])
     with col3:
-        st.metric("📅 Days Covered", filtered_df['DATE'].nunique())
+        st.metric("📅 Days Covered", summary['days'])
     with col4:
-        if not filtered_df.empty:
-            avg_daily = len(filtered_df) / max(1, filtered_df['DATE'].nunique())
-            st.metric("📈 Avg Daily Records", f"{avg_daily:.1f}")
+        if summary['records']:
+            st.metric("📈 Avg Daily Records", f"{summary['avg_daily']:.1f}")
     
     st.markdown("---")
     
@@ -92,21 +75,19 @@ def main():
     
     with col1:
         st.subheader("📊 Attendance by Person")
-        if not filtered_df.empty:
-            person_counts = filtered_df['NAME'].value_counts()
+        person_counts = db.person_summary(start, end, selected_people)
+        if not person_counts.empty:
             fig_pie = px.pie(
-                values=person_counts.values,
-                names=person_counts.index,
+                values=person_counts['Count'],
+                names=person_counts['NAME'],
                 title="Distribution of Attendance Records"
             )
             st.plotly_chart(fig_pie, use_container_width=True)
     
     with col2:
         st.subheader("📈 Daily Attendance Trend")
-        if not filtered_df.empty:
-            daily_counts = filtered_df.groupby('FULL_DATE').size().reset_index()
-            daily_counts.columns = ['Date', 'Count']
-            
+        daily_counts = db.daily_summary(start, end, selected_people)
+        if not daily_counts.empty:
             fig_line = px.line(
                 daily_counts,
                 x='Date',
@@ -116,11 +97,42 @@ def main():
             )
             st.plotly_chart(fig_line, use_container_width=True)
     
+    # Attendance patterns from the per-day bitmap
+    st.subheader("🧮 Attendance Patterns")
+    try:
+        bitmap = get_bitmap()
+        rates = bitmap.rates(start, end).reindex(selected_people).dropna()
+        perfect = [name for name in bitmap.attended_all(start, end) if name in selected_people]
+        min_missed = st.slider("Flag people who missed at least (days)", 1, 30, 3)
+        missed = bitmap.missed(start, end, min_missed)
+        missed = missed[missed.index.isin(selected_people)]
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("🗓️ Class Days", bitmap.active_days(start, end))
+            st.markdown("**🏆 Perfect Attendance**")
+            st.write(", ".join(perfect) if perfect else "Nobody yet")
+        with col2:
+            st.markdown(f"**⚠️ Missed {min_missed}+ Days**")
+            st.dataframe(missed.rename("Days Missed"), use_container_width=True)
+        with col3:
+            st.markdown("**📈 Attendance Rate & Streaks**")
+            streaks = [bitmap.streaks(name, start, end) for name in rates.index]
+            st.dataframe(pd.DataFrame({
+                'Rate': (rates * 100).round(1).astype(str) + '%',
+                'Current Streak': [current for current, _ in streaks],
+                'Longest Streak': [longest for _, longest in streaks],
+            }, index=rates.index).sort_values('Longest Streak', ascending=False), use_container_width=True)
+    except Exception as e:
+        st.error(f"Error reading attendance bitmap: {e}")
+    
+    filtered_df = load_all_attendance_data(start, end, selected_people)
+    
     # Detailed table
     st.subheader("📋 Detailed Records")
     if not filtered_df.empty:
         # Sort by date and time
-        display_df = filtered_df[['NAME', 'TIME', 'DATE']].sort_values(['DATE', 'TIME'], ascending=[False, False])
+        display_df = filtered_df.sort_values('TS', ascending=False)[['NAME', 'TIME', 'DATE']]
         st.dataframe(display_df, use_container_width=True)
     
     # Export options
@@ -1,8 +1,8 @@
 import streamlit as st 
 import pandas as pd
 import time
-import os
 from datetime import datetime
+from attendance_db import get_db
 
 # Set page configuration
 st.set_page_config(page_title="Face Recognition Attendance System", page_icon="📊", layout="wide")
@@ -16,13 +16,13 @@ ts = time.time()
 date = datetime.fromtimestamp(ts).strftime("%d-%m-%y")
 timestamp = datetime.fromtimestamp(ts).strftime("%H:%M-%S")
 
-# File path for today's attendance
-attendance_file = f"Attendance/Attendance_{date}.csv"
+# Today's attendance from the attendance database
+db = get_db()
+today = datetime.fromtimestamp(ts).date()
 
-# Check if today's attendance file exists
-if os.path.exists(attendance_file):
+if db.day_count(today):
     try:
-        df = pd.read_csv(attendance_file)
+        df = db.day_records(today)
         
         if not df.empty:
             st.success(f"📅 Attendance for {date}")
@@ -42,19 +42,17 @@ if os.path.exists(attendance_file):
             # Show trained people info
             st.markdown("### 👥 System Information")
             try:
-                import pickle
-                with open('data/names.pkl', 'rb') as f:
-                    all_names = pickle.load(f)
-                trained_people = list(set(all_names))
+                from face_gallery import load_manifest
+                trained_people = load_manifest().people
                 st.info(f"**Trained People ({len(trained_people)})**: {', '.join(sorted(trained_people))}")
             except:
                 st.warning("Could not load trained people information")
                 
         else:
-            st.warning("📝 Attendance file exists but is empty")
+            st.warning("📝 No attendance records for today yet")
             
     except Exception as e:
-        st.error(f"Error reading attendance file: {str(e)}")
+        st.error(f"Error reading attendance: {str(e)}")
         
 else:
     st.info(f"📋 No attendance records found for today ({date})")
@@ -62,20 +60,21 @@ else:
     st.write("1. Run the face recognition system: `python test.py`")
     st.write("2. Press 'o' when a face is detected to mark attendance")
     
-    # Show available attendance files
-    st.markdown("### 📁 Available Attendance Files:")
-    attendance_files = [f for f in os.listdir("Attendance/") if f.endswith('.csv')]
+    # Show days that have attendance
+    st.markdown("### 📁 Available Attendance Days:")
+    attendance_days = db.days()
     
-    if attendance_files:
-        selected_file = st.selectbox("View previous attendance:", attendance_files)
-        if selected_file:
+    if attendance_days:
+        selected_day = st.selectbox("View previous attendance:", attendance_days,
+                                    format_func=lambda day: day.strftime("%d-%m-%y"))
+        if selected_day:
             try:
-                prev_df = pd.read_csv(f"Attendance/{selected_file}")
+                prev_df = db.day_records(selected_day)
                 st.dataframe(prev_df.style.highlight_max(axis=0), use_container_width=True)
             except Exception as e:
-                st.error(f"Error reading {selected_file}: {str(e)}")
+                st.error(f"Error reading {selected_day}: {str(e)}")
     else:
-        st.write("No previous attendance files found.")
+        st.write("No previous attendance found.")
 
 # Refresh button
 if st.button("🔄 Refresh Data"):
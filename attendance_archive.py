@@ -0,0 +1,189 @@
+import argparse
+import calendar
+import json
+import os
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from attendance_db import add_display_columns, get_db
+from config import load_config
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+ARCHIVE_DIR = 'data/attendance_archive'
+MANIFEST_FILE = 'manifest.json'
+
+
+def month_bounds(year, month):
+    """First and last day of a month"""
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def months_between(start, end):
+    """(year, month) pairs overlapping ``start``..``end`` inclusive"""
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+class AttendanceArchive:
+    """Month-partitioned Parquet copy of closed attendance days
+
+    ``compact`` writes every day before today into
+    ``year=YYYY/month=MM/attendance.parquet`` with a dictionary-encoded
+    NAME column and a real timestamp, rewriting only months whose row
+    count or last row id in SQLite changed since the previous run. ``load``
+    reads just the partitions overlapping the requested dates, with a
+    timestamp filter inside them, and takes days after the archive (or
+    months changed since it was written) from SQLite's day index. Without
+    pyarrow everything comes from SQLite.
+    """
+
+    def __init__(self, root=ARCHIVE_DIR, db=None):
+        self.root = root
+        self.db = db or get_db()
+        self.manifest_path = os.path.join(root, MANIFEST_FILE)
+        self.manifest = self._load_manifest()
+
+    @staticmethod
+    def available():
+        return pq is not None
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {'covered_until': None, 'months': {}}
+
+    def _save_manifest(self):
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def partition_path(self, year, month):
+        return os.path.join(self.root, f"year={year:04d}", f"month={month:02d}", 'attendance.parquet')
+
+    def compact(self, until=None):
+        """Archive every day before ``until`` (default today); returns the months rewritten"""
+        if not self.available():
+            raise RuntimeError("pyarrow is required for the Parquet archive (pip install pyarrow)")
+        until = until or date.today()
+        first, _ = self.db.date_bounds()
+        if first is None or first >= until:
+            return []
+        os.makedirs(self.root, exist_ok=True)
+        last_closed = until - timedelta(days=1)
+        written = []
+        current = self.db.month_stats(month_bounds(first.year, first.month)[0], last_closed)
+        for year, month in months_between(first, last_closed):
+            start, end = month_bounds(year, month)
+            end = min(end, last_closed)
+            key = f"{year:04d}-{month:02d}"
+            rows, max_id = current.get(key, (0, 0))
+            entry = {'rows': rows, 'max_id': max_id, 'last_day': end.isoformat()}
+            if self.manifest['months'].get(key) == entry:
+                continue
+            path = self.partition_path(year, month)
+            if rows == 0:
+                if os.path.exists(path):
+                    os.remove(path)
+                self.manifest['months'].pop(key, None)
+                continue
+            df = self.db.query_records(start, end)
+            table = pa.Table.from_pandas(pd.DataFrame({
+                'NAME': df['NAME'].astype('category'),
+                'TS': df['TS'].astype('datetime64[s]'),
+            }), preserve_index=False)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + '.tmp'
+            pq.write_table(table, tmp)
+            os.replace(tmp, path)
+            self.manifest['months'][key] = entry
+            written.append((key, rows, os.path.getsize(path)))
+        self.manifest['covered_until'] = until.isoformat()
+        self.manifest['compacted_at'] = datetime.now().isoformat(timespec='seconds')
+        self._save_manifest()
+        return written
+
+    def _read_partition(self, year, month, start, end, names):
+        filters = [('TS', '>=', datetime.combine(start, datetime.min.time())),
+                   ('TS', '<', datetime.combine(end + timedelta(days=1), datetime.min.time()))]
+        if names is not None:
+            filters.append(('NAME', 'in', list(names)))
+        df = pq.read_table(self.partition_path(year, month), columns=['NAME', 'TS'], filters=filters).to_pandas()
+        df['NAME'] = df['NAME'].astype(str)
+        return df
+
+    def load(self, start=None, end=None, names=None):
+        """NAME/TS/TIME/DATE/FULL_DATE records from ``start`` to ``end``, touching only those months"""
+        names = None if names is None else list(names)
+        covered_until = self.manifest.get('covered_until')
+        if not self.available() or covered_until is None:
+            return self.db.query_records(start, end, names)
+        last_archived = date.fromisoformat(covered_until) - timedelta(days=1)
+        if start is None or end is None:
+            first, last = self.db.date_bounds()
+            if first is None:
+                return self.db.query_records(start, end, names)
+            start, end = start or first, end or last
+
+        frames = []
+        current = {}
+        if start <= last_archived:
+            # Row counts of the archived months touched, in one grouped query; the
+            # check compares whole months, so the bounds are month edges
+            stop = min(end, last_archived)
+            current = self.db.month_stats(month_bounds(start.year, start.month)[0],
+                                          min(month_bounds(stop.year, stop.month)[1], last_archived))
+        for year, month in months_between(start, min(end, last_archived)):
+            month_start, month_end = month_bounds(year, month)
+            month_end = min(month_end, last_archived)
+            first, last = max(month_start, start), min(month_end, end)
+            key = f"{year:04d}-{month:02d}"
+            entry = self.manifest['months'].get(key)
+            archived = (entry['rows'], entry['max_id']) if entry else (0, 0)
+            if current.get(key, (0, 0)) != archived:
+                # Edited since it was archived: SQLite has the current rows
+                frames.append(self.db.query_records(first, last, names)[['NAME', 'TS']])
+            elif entry:
+                frames.append(self._read_partition(year, month, first, last, names))
+        live_start = max(start, last_archived + timedelta(days=1))
+        if end >= live_start:
+            frames.append(self.db.query_records(live_start, end, names)[['NAME', 'TS']])
+
+        frames = [frame for frame in frames if len(frame)]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame({'NAME': [], 'TS': []})
+        return add_display_columns(df.sort_values('TS', kind='stable').reset_index(drop=True))
+
+
+def get_archive(config=None):
+    """AttendanceArchive at the configured ``attendance.archive`` path"""
+    return AttendanceArchive((config or load_config())['attendance']['archive'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roll closed attendance days into monthly Parquet partitions")
+    parser.add_argument('--until', type=date.fromisoformat, default=None,
+                        help="archive days before this YYYY-MM-DD (default: today)")
+    args = parser.parse_args()
+
+    archive = get_archive()
+    if not archive.available():
+        print("❌ pyarrow is not installed: pip install pyarrow")
+        return
+    written = archive.compact(args.until)
+    for key, rows, size in written:
+        print(f"📦 {key}: {rows} records, {size / 1024:.1f} KB")
+    print(f"✅ Archive up to date ({len(written)} months rewritten) in {archive.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+import argparse
+import json
+import os
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from config import load_config
+
+BITMAP_DIR = 'data/attendance_bitmap'
+BITS_FILE = 'days.npy'
+META_FILE = 'meta.json'
+# Capacity grows in whole blocks so most marks never resize the file
+DAY_BLOCK = 366
+PEOPLE_BLOCK = 512
+
+
+def _longest_run(bits):
+    """Length of the longest run of ones in a 0/1 vector"""
+    if not bits.any():
+        return 0
+    edges = np.diff(np.concatenate(([0], bits.astype(np.int8), [0])))
+    return int((np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)).max())
+
+
+class AttendanceBitmap:
+    """One bitset per day over every person ever marked
+
+    People are numbered in order of first appearance (``meta.json``) and
+    day ``start + i`` is row ``i`` of the uint8 matrix in ``days.npy``,
+    memory-mapped, with bit ``j`` set when person ``j`` was marked that day.
+    Range questions reduce to OR/AND/popcounts over a slice of rows: 10k
+    people over five years is under 3 MB.
+
+    ``sync`` keeps it in step with the attendance table by folding in rows
+    added since the last sync (a single mark costs a bit set); when rows
+    were removed or replaced it rebuilds from the per-day rollup. Days with
+    no marks at all are treated as closed and left out of rates, misses and
+    streaks.
+    """
+
+    def __init__(self, root=BITMAP_DIR):
+        self.root = root
+        self.bits_path = os.path.join(root, BITS_FILE)
+        self.meta_path = os.path.join(root, META_FILE)
+        self._lock = threading.Lock()
+        self._meta_mtime = None
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.meta_path, 'r') as f:
+                self.meta = json.load(f)
+            self.bits = np.load(self.bits_path, mmap_mode='r+')
+            self._meta_mtime = os.stat(self.meta_path).st_mtime_ns
+        except (FileNotFoundError, ValueError):
+            self.meta = {'start': None, 'days': 0, 'people': [], 'count': 0, 'last_id': 0}
+            self.bits = np.zeros((0, 0), dtype=np.uint8)
+            self._meta_mtime = None
+        self.index = {name: i for i, name in enumerate(self.meta['people'])}
+        self._active_rows = None
+        self.start = date.fromisoformat(self.meta['start']) if self.meta['start'] else None
+
+    def _save_meta(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self.meta_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self.meta_path)
+        self._meta_mtime = os.stat(self.meta_path).st_mtime_ns
+
+    def _reshape(self, start, n_days, n_people):
+        """Make room for ``n_days`` days from ``start`` and ``n_people`` people, copying the old bits"""
+        shape = (-(-n_days // DAY_BLOCK) * DAY_BLOCK, -(-n_people // PEOPLE_BLOCK) * PEOPLE_BLOCK // 8)
+        shift = (self.start - start).days if self.start else 0
+        if self.start == start and shape[0] <= self.bits.shape[0] and shape[1] <= self.bits.shape[1]:
+            return
+        shape = (max(shape[0], self.bits.shape[0] + shift), max(shape[1], self.bits.shape[1]))
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self.bits_path + '.tmp.npy'
+        bits = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.uint8, shape=shape)
+        bits[shift:shift + self.bits.shape[0], :self.bits.shape[1]] = self.bits
+        bits.flush()
+        del bits
+        os.replace(tmp, self.bits_path)
+        self.bits = np.load(self.bits_path, mmap_mode='r+')
+        self.start = start
+        self.meta['start'] = start.isoformat()
+
+    def add(self, pairs):
+        """Set the bit of each (name, day) pair"""
+        pairs = list(pairs)
+        if not pairs:
+            return
+        for name, _ in pairs:
+            if name not in self.index:
+                self.index[name] = len(self.meta['people'])
+                self.meta['people'].append(name)
+        days = [day for _, day in pairs]
+        first = min(days + ([self.start] if self.start else []))
+        last = max(days + ([self.start + timedelta(days=self.meta['days'] - 1)] if self.meta['days'] else []))
+        n_days = (last - first).days + 1
+        self._reshape(first, n_days, len(self.meta['people']))
+        self.meta['days'] = n_days
+        rows = np.array([(day - self.start).days for day in days])
+        cols = np.array([self.index[name] for name, _ in pairs])
+        np.bitwise_or.at(self.bits, (rows, cols >> 3), (1 << (cols & 7)).astype(np.uint8))
+        self.bits.flush()
+        self._active_rows = None
+
+    def rebuild(self, db):
+        """Start over from the per-day person rollup of ``db``"""
+        for path in (self.bits_path, self.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._load()
+        count, last_id = self._db_state(db)
+        pairs = db.conn.execute(
+            "SELECT p.name, d.day FROM daily_persons d JOIN persons p ON p.id = d.person_id ORDER BY d.day")
+        self.add((name, date.fromisoformat(day)) for name, day in pairs)
+        self.meta.update(count=count, last_id=last_id)
+        self._save_meta()
+
+    @staticmethod
+    def _db_state(db):
+        # One statement, so one snapshot; both come from the rollup and the rowid, not a table scan
+        return tuple(db.conn.execute(
+            "SELECT (SELECT COALESCE(SUM(records), 0) FROM daily_totals),"
+            " (SELECT COALESCE(MAX(id), 0) FROM attendance)").fetchone())
+
+    def sync(self, db):
+        """Fold in marks added to ``db`` since the last sync; returns how many were new"""
+        with self._lock:
+            try:
+                if os.stat(self.meta_path).st_mtime_ns != self._meta_mtime:
+                    # Another process (the writer, the CLI) updated it
+                    self._load()
+            except FileNotFoundError:
+                pass
+            count, last_id = self._db_state(db)
+            if (count, last_id) == (self.meta['count'], self.meta['last_id']):
+                return 0
+            new = db.conn.execute(
+                "SELECT p.name, a.day FROM attendance a JOIN persons p ON p.id = a.person_id"
+                " WHERE a.id > ? AND a.id <= ?", (self.meta['last_id'], last_id)).fetchall()
+            if self.meta['count'] + len(new) != count:
+                # Rows were deleted or re-imported: the bits can only be set, so start over
+                self.rebuild(db)
+                return count
+            self.add((name, date.fromisoformat(day)) for name, day in new)
+            self.meta.update(count=count, last_id=last_id)
+            self._save_meta()
+            return len(new)
+
+    # Queries: ``start``/``end`` are inclusive dates, None means the first/last day stored
+
+    def _active(self, start=None, end=None):
+        """Row numbers of the days in the range on which anyone was marked"""
+        if self.start is None:
+            return np.zeros(0, dtype=np.intp)
+        if self._active_rows is None:
+            # Closed days (nobody marked) do not count against anyone
+            self._active_rows = np.flatnonzero(self.bits[:self.meta['days']].any(axis=1))
+        lo = 0 if start is None else (start - self.start).days
+        hi = self.meta['days'] if end is None else (end - self.start).days + 1
+        rows = self._active_rows
+        return rows[np.searchsorted(rows, lo):np.searchsorted(rows, hi)]
+
+    def _rows(self, start=None, end=None):
+        rows = self._active(start, end)
+        if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+            return self.bits[rows[0]:rows[-1] + 1]
+        return self.bits[rows]
+
+    def _names(self, packed):
+        cols = np.flatnonzero(np.unpackbits(packed, bitorder='little')[:len(self.meta['people'])])
+        return [self.meta['people'][i] for i in cols]
+
+    def active_days(self, start=None, end=None):
+        """Number of days in the range on which anyone was marked"""
+        return len(self._active(start, end))
+
+    def attended_any(self, start=None, end=None):
+        """People marked on at least one day of the range"""
+        rows = self._rows(start, end)
+        return self._names(np.bitwise_or.reduce(rows, axis=0)) if len(rows) else []
+
+    def attended_all(self, start=None, end=None):
+        """People marked on every active day of the range"""
+        rows = self._rows(start, end)
+        return self._names(np.bitwise_and.reduce(rows, axis=0)) if len(rows) else []
+
+    def days_present(self, start=None, end=None):
+        """Active days each person was marked on, as a Series indexed by name"""
+        rows = self._rows(start, end)
+        people = self.meta['people']
+        if not len(rows):
+            return pd.Series(0, index=people, dtype=int)
+        counts = np.unpackbits(rows, axis=1, bitorder='little')[:, :len(people)].sum(axis=0)
+        return pd.Series(counts, index=people)
+
+    def missed(self, start=None, end=None, min_days=1):
+        """People who missed at least ``min_days`` active days, with the number missed"""
+        missed = self.active_days(start, end) - self.days_present(start, end)
+        return missed[missed >= min_days].sort_values(ascending=False)
+
+    def rates(self, start=None, end=None):
+        """Share of active days each person attended"""
+        present = self.days_present(start, end)
+        return present / max(1, self.active_days(start, end))
+
+    def streaks(self, name, start=None, end=None):
+        """(current, longest) run of consecutive active days ``name`` attended"""
+        if name not in self.index:
+            return 0, 0
+        col = self.index[name]
+        bits = (self.bits[self._active(start, end), col >> 3] >> (col & 7)) & 1
+        zeros = np.flatnonzero(bits == 0)
+        current = len(bits) - (zeros[-1] + 1) if len(zeros) else len(bits)
+        return int(current), _longest_run(bits)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_bitmap(config=None, db=None):
+    """Process-wide AttendanceBitmap, synced with the attendance database"""
+    global _shared
+    from attendance_db import get_db
+
+    with _shared_lock:
+        if _shared is None:
+            _shared = AttendanceBitmap((config or load_config())['attendance']['bitmap'])
+    _shared.sync(db or get_db(config))
+    return _shared
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the per-day attendance bitmap from the attendance database")
+    parser.add_argument('--rebuild', action='store_true', help="discard the bitmap and rebuild it")
+    args = parser.parse_args()
+
+    from attendance_db import get_db
+
+    db = get_db()
+    bitmap = AttendanceBitmap(load_config()['attendance']['bitmap'])
+    if args.rebuild:
+        bitmap.rebuild(db)
+    else:
+        bitmap.sync(db)
+    if not bitmap.meta['days']:
+        print("📝 No attendance recorded yet")
+        return
+    print(f"✅ {len(bitmap.meta['people'])} people x {bitmap.meta['days']} days "
+          f"({os.path.getsize(bitmap.bits_path) / 1024:.1f} KB) in {bitmap.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,597 @@
+import argparse
+import contextlib
+import csv
+import io
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from config import load_config
+
+DB_FILE = 'data/attendance.db'
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+# get_db() re-checks the CSV folder for outside changes at most this often
+SYNC_INTERVAL = 2.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS persons (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS attendance (
+    id INTEGER PRIMARY KEY,
+    person_id INTEGER NOT NULL REFERENCES persons(id),
+    ts TEXT NOT NULL,
+    day TEXT NOT NULL,
+    source TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_attendance_person_ts ON attendance(person_id, ts);
+CREATE INDEX IF NOT EXISTS idx_attendance_day ON attendance(day);
+CREATE INDEX IF NOT EXISTS idx_attendance_source ON attendance(source);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS daily_totals (
+    day TEXT PRIMARY KEY,
+    records INTEGER NOT NULL,
+    people INTEGER NOT NULL,
+    first_ts TEXT NOT NULL,
+    last_ts TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS daily_persons (
+    day TEXT NOT NULL,
+    person_id INTEGER NOT NULL REFERENCES persons(id),
+    records INTEGER NOT NULL,
+    PRIMARY KEY (day, person_id)
+);
+CREATE TABLE IF NOT EXISTS person_totals (
+    person_id INTEGER PRIMARY KEY REFERENCES persons(id),
+    records INTEGER NOT NULL,
+    first_ts TEXT NOT NULL,
+    last_ts TEXT NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS attendance_rollup_insert AFTER INSERT ON attendance BEGIN
+    INSERT INTO daily_persons(day, person_id, records) VALUES (NEW.day, NEW.person_id, 1)
+        ON CONFLICT(day, person_id) DO UPDATE SET records = records + 1;
+    INSERT INTO daily_totals(day, records, people, first_ts, last_ts) VALUES (NEW.day, 1, 1, NEW.ts, NEW.ts)
+        ON CONFLICT(day) DO UPDATE SET
+            records = records + 1,
+            people = people + (SELECT records = 1 FROM daily_persons
+                               WHERE day = NEW.day AND person_id = NEW.person_id),
+            first_ts = MIN(first_ts, NEW.ts),
+            last_ts = MAX(last_ts, NEW.ts);
+    INSERT INTO person_totals(person_id, records, first_ts, last_ts) VALUES (NEW.person_id, 1, NEW.ts, NEW.ts)
+        ON CONFLICT(person_id) DO UPDATE SET
+            records = records + 1,
+            first_ts = MIN(first_ts, NEW.ts),
+            last_ts = MAX(last_ts, NEW.ts);
+END;
+CREATE TRIGGER IF NOT EXISTS attendance_rollup_delete AFTER DELETE ON attendance BEGIN
+    UPDATE daily_persons SET records = records - 1 WHERE day = OLD.day AND person_id = OLD.person_id;
+    UPDATE daily_totals SET
+        records = records - 1,
+        people = people - (SELECT records = 0 FROM daily_persons
+                           WHERE day = OLD.day AND person_id = OLD.person_id),
+        first_ts = COALESCE((SELECT MIN(ts) FROM attendance WHERE day = OLD.day), ''),
+        last_ts = COALESCE((SELECT MAX(ts) FROM attendance WHERE day = OLD.day), '')
+        WHERE day = OLD.day;
+    DELETE FROM daily_persons WHERE day = OLD.day AND person_id = OLD.person_id AND records = 0;
+    DELETE FROM daily_totals WHERE day = OLD.day AND records = 0;
+    UPDATE person_totals SET
+        records = records - 1,
+        first_ts = COALESCE((SELECT MIN(ts) FROM attendance WHERE person_id = OLD.person_id), ''),
+        last_ts = COALESCE((SELECT MAX(ts) FROM attendance WHERE person_id = OLD.person_id), '')
+        WHERE person_id = OLD.person_id;
+    DELETE FROM person_totals WHERE person_id = OLD.person_id AND records = 0;
+END;
+CREATE TABLE IF NOT EXISTS imported_files (
+    source TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    rows INTEGER NOT NULL
+);
+"""
+
+_TIME_RE = re.compile(r'^\s*(\d{1,2})[:.](\d{1,2})(?:[:.\-](\d{1,2}))?\s*$')
+
+
+def parse_csv_date(filename):
+    """Day of an ``Attendance_dd-mm-yy.csv`` file (four-digit years accepted too)"""
+    stem = os.path.basename(filename)[len('Attendance_'):-len('.csv')]
+    for fmt in ("%d-%m-%y", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(stem, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_csv_time(value):
+    """(hour, minute, second) from ``HH:MM-SS`` / ``HH:MM:SS`` / ``HH:MM``, or None"""
+    match = _TIME_RE.match(value or '')
+    if not match:
+        return None
+    hour, minute, second = (int(part or 0) for part in match.groups())
+    if hour > 23 or minute > 59 or second > 59:
+        return None
+    return hour, minute, second
+
+
+def is_attendance_csv(name):
+    return name.startswith('Attendance_') and name.endswith('.csv')
+
+
+def read_attendance_csv(path, offset=0, end=None):
+    """Clean (name, datetime) rows of one daily CSV, from byte ``offset`` up to ``end``
+
+    Blank lines and repeated ``NAME,TIME`` headers are skipped, and
+    malformed rows are counted rather than raising. Returns None when
+    ``offset`` does not fall on a line boundary, i.e. the file was rewritten
+    rather than appended to, or when an appended tail ends mid-row.
+    ``end`` is the size the caller stat'ed, so rows appended after that are
+    left for the next import instead of being recorded under the old size.
+    """
+    day = parse_csv_date(path)
+    if day is None:
+        return [], 0
+    rows, skipped = [], 0
+    with open(path, 'rb') as f:
+        if offset:
+            f.seek(offset - 1)
+            if f.read(1) != b'\n':
+                return None
+        data = f.read() if end is None else f.read(max(0, end - offset))
+        if offset and data and not data.endswith(b'\n'):
+            return None
+        text = data.decode('utf-8', errors='replace')
+    for row in csv.reader(io.StringIO(text, newline='')):
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        name = row[0].strip()
+        if name.upper() == 'NAME':
+            continue
+        parsed = parse_csv_time(row[1]) if len(row) > 1 else None
+        if not name or parsed is None:
+            skipped += 1
+            continue
+        rows.append((name, datetime(day.year, day.month, day.day, *parsed)))
+    return rows, skipped
+
+
+def add_display_columns(df):
+    """Derive the TIME/DATE strings and FULL_DATE day from a TS column, in place"""
+    ts = pd.to_datetime(df['TS'])
+    df['TS'] = ts
+    df['TIME'] = ts.dt.strftime("%H:%M-%S")
+    df['DATE'] = ts.dt.strftime("%d-%m-%y")
+    df['FULL_DATE'] = ts.dt.normalize()
+    return df
+
+
+def _range_clause(start, end, names):
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("a.day >= ?")
+        params.append(start.strftime("%Y-%m-%d"))
+    if end is not None:
+        clauses.append("a.day <= ?")
+        params.append(end.strftime("%Y-%m-%d"))
+    if names is not None:
+        names = list(names)
+        clauses.append(f"p.name IN ({', '.join('?' * len(names))})" if names else "0")
+        params.extend(names)
+    return ("WHERE " + " AND ".join(clauses)) if clauses else '', params
+
+
+class AttendanceDB:
+    """Attendance records in SQLite (WAL mode), one connection per thread
+
+    WAL lets the dashboards read while the recognizer's writer thread
+    inserts. Timestamps are ISO ``YYYY-MM-DD HH:MM:SS`` text with a
+    separate ``day`` column, indexed on (person_id, ts) and (day). Each row
+    keeps the CSV file it belongs to as ``source``, so re-importing a file
+    replaces its rows instead of duplicating them.
+
+    ``sync_directory`` keeps the table in step with the CSV folder keyed by
+    each file's (size, mtime): unchanged files cost one stat, files that
+    grew are read from their previous end only, and a cold import parses
+    files on a thread pool. ``frame()`` caches the whole table as a typed
+    DataFrame in-process and only fetches rows added since the last call,
+    so dashboard reruns do not re-read history.
+
+    Triggers on ``attendance`` keep rollups in the same transaction as each
+    insert or delete: ``daily_totals`` (records, distinct people, first and
+    last mark per day), ``daily_persons`` (who was seen each day, and how
+    often) and ``person_totals`` (count and first/last seen per person).
+    Headline metrics and trend charts read these, costing O(days) rather
+    than O(records).
+    """
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._person_ids = {}
+        self._lock = threading.Lock()
+        self._cache = None
+        self._cache_last_id = 0
+        self._cache_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn.executescript(SCHEMA)
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'rollups'").fetchone() is None:
+            self.rebuild_rollups()
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def rebuild_rollups(self):
+        """Recompute the rollup tables from scratch (databases created before they existed)"""
+        with self.conn:
+            self.conn.execute("DELETE FROM daily_persons")
+            self.conn.execute("DELETE FROM daily_totals")
+            self.conn.execute("DELETE FROM person_totals")
+            self.conn.execute(
+                "INSERT INTO daily_persons(day, person_id, records)"
+                " SELECT day, person_id, COUNT(*) FROM attendance GROUP BY day, person_id")
+            self.conn.execute(
+                "INSERT INTO daily_totals(day, records, people, first_ts, last_ts)"
+                " SELECT day, COUNT(*), COUNT(DISTINCT person_id), MIN(ts), MAX(ts) FROM attendance GROUP BY day")
+            self.conn.execute(
+                "INSERT INTO person_totals(person_id, records, first_ts, last_ts)"
+                " SELECT person_id, COUNT(*), MIN(ts), MAX(ts) FROM attendance GROUP BY person_id")
+            self.conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('rollups', ?)",
+                              (datetime.now().strftime(TS_FORMAT),))
+
+    def person_id(self, name):
+        with self._lock:
+            if name not in self._person_ids:
+                self.conn.execute("INSERT OR IGNORE INTO persons(name) VALUES (?)", (name,))
+                (pid,) = self.conn.execute("SELECT id FROM persons WHERE name = ?", (name,)).fetchone()
+                self._person_ids[name] = pid
+            return self._person_ids[name]
+
+    def _rows(self, marks, source):
+        return [(self.person_id(name), when.strftime(TS_FORMAT), when.strftime("%Y-%m-%d"), source)
+                for name, when in marks]
+
+    @contextlib.contextmanager
+    def _immediate(self):
+        """Write transaction that takes the database lock up front
+
+        Checks made inside it (how far a CSV was imported) stay true until
+        it commits, so two importers cannot both decide to add the same rows.
+        """
+        conn = self.conn
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def _imported_size(self, source):
+        seen = self.conn.execute("SELECT size FROM imported_files WHERE source = ?", (source,)).fetchone()
+        return seen[0] if seen else 0
+
+    def _record_file(self, source, stat, rows):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO imported_files(source, size, mtime, rows) VALUES (?, ?, ?, ?)",
+            (source, stat.st_size, stat.st_mtime, rows))
+
+    def insert(self, marks, source):
+        """Insert (name, datetime) marks belonging to the CSV ``source`` in one transaction"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO attendance(person_id, ts, day, source) VALUES (?, ?, ?, ?)",
+                self._rows(marks, source))
+
+    def _replace_file(self, path, stat, rows):
+        source = os.path.basename(path)
+        with self.conn:
+            self.conn.execute("DELETE FROM attendance WHERE source = ?", (source,))
+            self.conn.executemany(
+                "INSERT INTO attendance(person_id, ts, day, source) VALUES (?, ?, ?, ?)",
+                self._rows(rows, source))
+            self._record_file(source, stat, len(rows))
+
+    def _extend_file(self, path, stat, rows, offset):
+        """Add the rows read from ``offset`` on; False if the table is no longer where the read started"""
+        source = os.path.basename(path)
+        with self._immediate():
+            imported = self._imported_size(source)
+            if imported >= stat.st_size:
+                # The attendance writer mirrored these bytes meanwhile
+                return True
+            if imported != offset:
+                return False
+            (previous_rows,) = self.conn.execute(
+                "SELECT rows FROM imported_files WHERE source = ?", (source,)).fetchone()
+            self.conn.executemany(
+                "INSERT INTO attendance(person_id, ts, day, source) VALUES (?, ?, ?, ?)",
+                self._rows(rows, source))
+            self._record_file(source, stat, previous_rows + len(rows))
+        return True
+
+    def import_csv(self, path):
+        """Reload one daily CSV, replacing its earlier rows; returns (rows, skipped)"""
+        stat = os.stat(path)
+        rows, skipped = read_attendance_csv(path, end=stat.st_size)
+        self._replace_file(path, stat, rows)
+        return len(rows), skipped
+
+    def mark_imported(self, path):
+        """Record that ``path`` is fully reflected in the table (after live inserts)"""
+        stat = os.stat(path)
+        (rows,) = self.conn.execute(
+            "SELECT COUNT(*) FROM attendance WHERE source = ?", (os.path.basename(path),)).fetchone()
+        with self.conn:
+            self._record_file(os.path.basename(path), stat, rows)
+
+    def append_csv_rows(self, path, marks, previous_size):
+        """Mirror rows just appended to ``path``, which was ``previous_size`` bytes before
+
+        If the table was not in step with the file before the append (a file
+        written by something else, a failed earlier insert), the whole file
+        is re-imported instead.
+        """
+        source = os.path.basename(path)
+        with self._immediate():
+            imported = self._imported_size(source)
+            stat = os.stat(path)
+            if imported >= stat.st_size:
+                # A CSV sync already imported the appended bytes
+                return
+            if imported == previous_size:
+                self.conn.executemany(
+                    "INSERT INTO attendance(person_id, ts, day, source) VALUES (?, ?, ?, ?)",
+                    self._rows(marks, source))
+                (rows,) = self.conn.execute(
+                    "SELECT COUNT(*) FROM attendance WHERE source = ?", (source,)).fetchone()
+                self._record_file(source, stat, rows)
+                return
+        self.import_csv(path)
+
+    def sync_directory(self, directory='Attendance', force=False, workers=None):
+        """Bring the table in step with every daily CSV that changed since the last sync"""
+        totals = {'files': 0, 'rows': 0, 'skipped': 0}
+        if not os.path.isdir(directory):
+            return totals
+        known = {source: (size, mtime, rows) for source, size, mtime, rows in
+                 self.conn.execute("SELECT source, size, mtime, rows FROM imported_files")}
+        jobs = []
+        for entry in os.scandir(directory):
+            if not is_attendance_csv(entry.name):
+                continue
+            if parse_csv_date(entry.name) is None:
+                print(f"⚠️ Skipping {entry.path}: no dd-mm-yy date in the name")
+                continue
+            stat = entry.stat()
+            seen = known.get(entry.name)
+            if not force and seen and seen[:2] == (stat.st_size, stat.st_mtime):
+                continue
+            # A file that only grew is read from where the last sync stopped
+            grown = not force and seen and stat.st_size > seen[0]
+            jobs.append((entry.path, stat, seen[0] if grown else 0))
+        if not jobs:
+            return totals
+
+        def parse(job):
+            path, stat, offset = job
+            return read_attendance_csv(path, offset, stat.st_size)
+
+        with ThreadPoolExecutor(workers or min(8, len(jobs))) as pool:
+            parsed = list(pool.map(parse, jobs))
+        for (path, stat, offset), result in zip(jobs, parsed):
+            if result is None:
+                # Rewritten rather than appended: read the whole file again
+                offset, result = 0, read_attendance_csv(path, end=stat.st_size)
+            rows, skipped = result
+            if offset and not self._extend_file(path, stat, rows, offset):
+                # Imported by someone else up to a different point: start the file over
+                stat = os.stat(path)
+                rows, skipped = read_attendance_csv(path, end=stat.st_size)
+                offset = 0
+            if not offset:
+                self._replace_file(path, stat, rows)
+            totals['files'] += 1
+            totals['rows'] += len(rows)
+            totals['skipped'] += skipped
+        return totals
+
+    def migrate_csv_archive(self, directory='Attendance'):
+        """One-time import of the CSV archive into a new database; later runs are no-ops"""
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'csv_migrated'").fetchone():
+            return None
+        totals = self.sync_directory(directory)
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('csv_migrated', ?)",
+                              (datetime.now().strftime(TS_FORMAT),))
+        if totals['rows']:
+            print(f"✅ Imported {totals['rows']} attendance records from {totals['files']} CSV files")
+        return totals
+
+    def _query(self, where='', params=()):
+        df = pd.read_sql_query(
+            "SELECT a.id AS ID, p.name AS NAME, a.ts AS TS FROM attendance a"
+            f" JOIN persons p ON p.id = a.person_id {where} ORDER BY a.ts", self.conn, params=params)
+        return add_display_columns(df)
+
+    def query_records(self, start=None, end=None, names=None):
+        """Like ``records`` but read straight from SQLite through the day index, bypassing the cache"""
+        return self._query(*_range_clause(start, end, names))
+
+    def month_stats(self, start, end):
+        """{'YYYY-MM': (row count, max row id)} for the days from ``start`` to ``end``, in one query"""
+        return {month: (rows, max_id) for month, rows, max_id in self.conn.execute(
+            "SELECT substr(day, 1, 7), COUNT(*), MAX(id) FROM attendance WHERE day >= ? AND day <= ?"
+            " GROUP BY substr(day, 1, 7)", (start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")))}
+
+    def frame(self):
+        """The whole table as a cached DataFrame, topped up with rows added since the last call"""
+        with self._cache_lock:
+            total, last_id = self.conn.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM attendance").fetchone()
+            if self._cache is not None and last_id >= self._cache_last_id:
+                new = self._query("WHERE a.id > ?", (self._cache_last_id,)) if last_id > self._cache_last_id else None
+                added = 0 if new is None else len(new)
+                # Same count plus the new rows means nothing was deleted or replaced
+                if len(self._cache) + added == total:
+                    if added:
+                        self._cache = pd.concat([self._cache, new], ignore_index=True)
+                    self._cache_last_id = last_id
+                    return self._cache
+            self._cache = self._query()
+            self._cache_last_id = last_id
+            return self._cache
+
+    def records(self, start=None, end=None, names=None):
+        """Marks between two dates (inclusive) as NAME/TIME/DATE/FULL_DATE/TS columns"""
+        df = self.frame()
+        mask = pd.Series(True, index=df.index)
+        if start is not None:
+            mask &= df['FULL_DATE'] >= pd.Timestamp(start)
+        if end is not None:
+            mask &= df['FULL_DATE'] <= pd.Timestamp(end)
+        if names is not None:
+            mask &= df['NAME'].isin(list(names))
+        return df[mask].sort_values('TS', kind='stable').reset_index(drop=True)
+
+    def day_records(self, day):
+        """NAME/TIME table of one day, in the layout of the daily CSV"""
+        return self._query("WHERE a.day = ?", (day.strftime("%Y-%m-%d"),))[['NAME', 'TIME']]
+
+    def day_count(self, day):
+        row = self.conn.execute(
+            "SELECT records FROM daily_totals WHERE day = ?", (day.strftime("%Y-%m-%d"),)).fetchone()
+        return row[0] if row else 0
+
+    def days(self):
+        """Dates that have at least one mark, newest first"""
+        rows = self.conn.execute("SELECT day FROM daily_totals ORDER BY day DESC").fetchall()
+        return [datetime.strptime(day, "%Y-%m-%d").date() for (day,) in rows]
+
+    def date_bounds(self):
+        """(first, last) marked date, or (None, None) when empty"""
+        first, last = self.conn.execute("SELECT MIN(day), MAX(day) FROM daily_totals").fetchone()
+        if first is None:
+            return None, None
+        return datetime.strptime(first, "%Y-%m-%d").date(), datetime.strptime(last, "%Y-%m-%d").date()
+
+    def people(self):
+        """Names with at least one mark"""
+        rows = self.conn.execute(
+            "SELECT p.name FROM person_totals t JOIN persons p ON p.id = t.person_id ORDER BY p.name")
+        return [name for (name,) in rows]
+
+    def _rollup_query(self, sql, start, end, names):
+        where, params = _range_clause(start, end, names)
+        return pd.read_sql_query(sql.format(where=where.replace('a.day', 'd.day')), self.conn, params=params)
+
+    def daily_summary(self, start=None, end=None, names=None):
+        """Per-day Date/Count/People (plus First/Last mark when unfiltered by name) from the rollups"""
+        if names is None:
+            where, params = _range_clause(start, end, None)
+            df = pd.read_sql_query(
+                "SELECT day AS Date, records AS Count, people AS People, first_ts AS First, last_ts AS Last"
+                f" FROM daily_totals {where.replace('a.day', 'day')} ORDER BY day", self.conn, params=params)
+        else:
+            # Restricted to some people: sum their per-day rows instead
+            df = self._rollup_query(
+                "SELECT d.day AS Date, SUM(d.records) AS Count, COUNT(*) AS People"
+                " FROM daily_persons d JOIN persons p ON p.id = d.person_id"
+                " {where} GROUP BY d.day ORDER BY d.day", start, end, names)
+        df['Date'] = pd.to_datetime(df['Date'])
+        return df
+
+    def person_summary(self, start=None, end=None, names=None):
+        """Per-person NAME/Count/Days/First/Last from the rollups, most marks first"""
+        if start is None and end is None:
+            where, params = _range_clause(None, None, names)
+            return pd.read_sql_query(
+                "SELECT p.name AS NAME, t.records AS Count,"
+                " (SELECT COUNT(*) FROM daily_persons d WHERE d.person_id = t.person_id) AS Days,"
+                " t.first_ts AS First, t.last_ts AS Last FROM person_totals t JOIN persons p ON p.id = t.person_id"
+                f" {where} ORDER BY Count DESC, NAME", self.conn, params=params)
+        return self._rollup_query(
+            "SELECT p.name AS NAME, SUM(d.records) AS Count, COUNT(*) AS Days, MIN(d.day) AS First,"
+            " MAX(d.day) AS Last FROM daily_persons d JOIN persons p ON p.id = d.person_id"
+            " {where} GROUP BY d.person_id ORDER BY Count DESC, NAME", start, end, names)
+
+    def summary(self, start=None, end=None, names=None):
+        """Total records, unique people and days covered, from the rollups"""
+        daily = self.daily_summary(start, end, names)
+        if names is None and start is None and end is None:
+            (people,) = self.conn.execute("SELECT COUNT(*) FROM person_totals").fetchone()
+        else:
+            (people,) = self._rollup_query(
+                "SELECT COUNT(DISTINCT d.person_id) FROM daily_persons d JOIN persons p ON p.id = d.person_id"
+                " {where}", start, end, names).iloc[0]
+        records, days = int(daily['Count'].sum()), len(daily)
+        return {'records': records, 'people': int(people), 'days': days,
+                'avg_daily': records / days if days else 0.0}
+
+
+_shared = None
+_shared_lock = threading.Lock()
+_last_sync = 0.0
+
+
+def get_db(config=None):
+    """Process-wide AttendanceDB, synced with CSVs written outside the attendance writer
+
+    The first call imports the CSV archive; later calls pick up new or
+    appended CSV files at most every ``SYNC_INTERVAL`` seconds.
+    """
+    global _shared, _last_sync
+    with _shared_lock:
+        if _shared is None:
+            settings = (config or load_config())['attendance']
+            _shared = AttendanceDB(settings['database'])
+            _shared.directory = settings['directory']
+            _shared.migrate_csv_archive(_shared.directory)
+            _last_sync = time.monotonic()
+        elif time.monotonic() - _last_sync >= SYNC_INTERVAL:
+            _shared.sync_directory(_shared.directory)
+            _last_sync = time.monotonic()
+        return _shared
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import the daily attendance CSVs into SQLite")
+    parser.add_argument('--directory', default=None, help="folder of Attendance_dd-mm-yy.csv files")
+    parser.add_argument('--force', action='store_true', help="re-import files even if unchanged")
+    args = parser.parse_args()
+
+    settings = load_config()['attendance']
+    db = AttendanceDB(settings['database'])
+    totals = db.sync_directory(args.directory or settings['directory'], force=args.force)
+    print(f"✅ Imported {totals['rows']} records from {totals['files']} files "
+          f"({totals['skipped']} malformed rows skipped) into {db.path}")
+
+
+if __name__ == "__main__":
+    main()
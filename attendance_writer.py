@@ -0,0 +1,300 @@
+import atexit
+import csv
+import glob
+import itertools
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from attendance_bitmap import AttendanceBitmap
+from attendance_db import AttendanceDB
+from config import load_config
+from file_lock import file_lock, pid_alive
+
+ATTENDANCE_DIR = 'Attendance'
+HEADER = ['NAME', 'TIME']
+JOURNAL_FILE = '.attendance_journal'
+LOCK_FILE = '.attendance.lock'
+DATE_FORMAT = "%d-%m-%y"
+TIME_FORMAT = "%H:%M-%S"
+
+# journals of the writers alive in this process, never replayed by a sibling
+_live_journals = set()
+_journal_ids = itertools.count()
+
+
+def attendance_path(day, directory=ATTENDANCE_DIR):
+    """CSV file holding the marks of ``day`` (a date or datetime)"""
+    return os.path.join(directory, f"Attendance_{day.strftime(DATE_FORMAT)}.csv")
+
+
+class _Flush:
+    """Queue marker: write everything queued before it, then signal"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        # first write error since the previous marker, if any
+        self.error = None
+
+
+class AttendanceWriter:
+    """Background attendance writer with one long-lived CSV handle per day
+
+    ``mark`` only enqueues, so callers never touch the filesystem. The
+    writer thread drains the queue in batches of up to ``max_batch`` marks,
+    at least every ``flush_interval`` seconds, and appends them to the day's
+    file, opened once and swapped when the date rolls over. The header goes
+    into new files only. Each batch is first written to a small journal
+    (always fsynced) with the file sizes before the write; a batch left in
+    the journal by a crash is rolled back and replayed on the next start.
+    Each writer has its own journal (``.attendance_journal.<pid>.<n>``) and
+    holds ``.attendance.lock`` from the journal write until it is cleared,
+    so writers in several processes never interleave within a batch and
+    only journals of exited processes are replayed.
+    ``fsync`` controls whether the CSV itself is fsynced after each batch.
+
+    With a ``database`` path every batch is also inserted into the SQLite
+    store once the CSV write succeeded; replayed batches re-import their
+    files there. A ``bitmap`` path then folds each batch into the per-day
+    attendance bitmap as well.
+    """
+
+    def __init__(self, directory=ATTENDANCE_DIR, flush_interval=1.0, max_batch=256, fsync=True,
+                 database=None, bitmap=None):
+        self.directory = directory
+        self.db = AttendanceDB(database) if database else None
+        self.bitmap = AttendanceBitmap(bitmap) if bitmap and self.db is not None else None
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.fsync = fsync
+        self.journal_path = os.path.join(directory, f"{JOURNAL_FILE}.{os.getpid()}.{next(_journal_ids)}")
+        self.lock_path = os.path.join(directory, LOCK_FILE)
+        self.queue = queue.Queue()
+        self.day = None
+        self.handle = None
+        self.writer = None
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self._unflushed_error = None
+        os.makedirs(directory, exist_ok=True)
+        self.recovered = self.recover()
+        _live_journals.add(self.journal_path)
+        if self.db is not None:
+            self._sync_db(lambda: self.db.migrate_csv_archive(directory))
+        self.thread = threading.Thread(target=self._run, name='attendance-writer', daemon=True)
+        self.thread.start()
+
+    def mark(self, name, when=None):
+        """Queue an attendance mark for ``name``; returns its datetime"""
+        when = when or datetime.now()
+        self.queue.put((str(name), when))
+        return when
+
+    def flush(self, timeout=5.0):
+        """Block until every mark queued so far is written; False on a timeout or write error"""
+        marker = _Flush()
+        self.queue.put(marker)
+        return marker.done.wait(timeout) and marker.error is None
+
+    def close(self, timeout=5.0):
+        """Write what is queued and release the file handle"""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+        if not self.thread.is_alive():
+            _live_journals.discard(self.journal_path)
+
+    def recover(self):
+        """Roll back and replay batches interrupted by a crash; returns rows replayed
+
+        Only journals whose process has exited are touched: one of a live
+        writer belongs to a batch that writer is still completing.
+        """
+        replayed = 0
+        with file_lock(self.lock_path):
+            for journal in sorted(glob.glob(os.path.join(self.directory, JOURNAL_FILE + '*'))):
+                if not self._orphaned(journal):
+                    continue
+                try:
+                    with open(journal, 'r') as f:
+                        entries = json.loads(f.read() or '[]')
+                except FileNotFoundError:
+                    continue
+                except ValueError:
+                    # Torn journal write: the crash came before the CSV was touched
+                    entries = []
+                for entry in entries:
+                    replayed += self._replay(entry)
+                os.remove(journal)
+        if replayed:
+            print(f"♻️ Recovered {replayed} attendance marks from the journal")
+        return replayed
+
+    @staticmethod
+    def _orphaned(journal):
+        if journal in _live_journals:
+            return False
+        owner = os.path.basename(journal)[len(JOURNAL_FILE):].lstrip('.').split('.')[0]
+        # An unsuffixed journal comes from a writer without per-process journals
+        if not owner.isdigit() or int(owner) == os.getpid():
+            return True
+        return not pid_alive(int(owner))
+
+    def _replay(self, entry):
+        path = entry['file']
+        if os.path.exists(path) and os.path.getsize(path) > entry['offset']:
+            os.truncate(path, entry['offset'])
+        with open(path, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if f.tell() == 0:
+                writer.writerow(HEADER)
+            writer.writerows(entry['rows'])
+            f.flush()
+            os.fsync(f.fileno())
+        self._sync_db(lambda: self.db.import_csv(path))
+        return len(entry['rows'])
+
+    def _sync_db(self, update):
+        # The CSV stays the source of truth; a failed insert is picked up by the next import
+        if self.db is None:
+            return
+        try:
+            update()
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"⚠️ Attendance database not updated: {e}")
+
+    def _write_journal(self, entries):
+        with open(self.journal_path, 'w') as f:
+            json.dump(entries, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _clear_journal(self):
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def _open_day(self, day):
+        """Point the long-lived handle at ``day``'s file, closing the previous day's"""
+        if self.handle is not None:
+            self.handle.close()
+        self.day = day
+        self.handle = open(attendance_path(day, self.directory), 'a', newline='')
+        self.writer = csv.writer(self.handle)
+        if self.handle.tell() == 0:
+            self.writer.writerow(HEADER)
+
+    def _write_batch(self, marks):
+        by_day = {}
+        for name, when in marks:
+            by_day.setdefault(when.date(), []).append((name, when))
+        today = datetime.now().date()
+        # Offsets, journal and rows stay consistent only while no other process appends
+        with file_lock(self.lock_path):
+            if today in by_day and self.day != today:
+                self._open_day(today)
+            elif self.handle is not None:
+                self.handle.flush()
+
+            entries = []
+            for day, rows in by_day.items():
+                path = attendance_path(day, self.directory)
+                offset = os.path.getsize(path) if os.path.exists(path) else 0
+                entries.append({'file': path, 'offset': offset,
+                                'rows': [[name, when.strftime(TIME_FORMAT)] for name, when in rows]})
+            self._write_journal(entries)
+
+            for day, entry in zip(by_day, entries):
+                rows = entry['rows']
+                if day == self.day:
+                    self.writer.writerows(rows)
+                    continue
+                # Marks for another day (manual entries, a queue spanning midnight) don't move the handle
+                with open(attendance_path(day, self.directory), 'a', newline='') as f:
+                    writer = csv.writer(f)
+                    if f.tell() == 0:
+                        writer.writerow(HEADER)
+                    writer.writerows(rows)
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+            if self.handle is not None:
+                self.handle.flush()
+                if self.fsync:
+                    os.fsync(self.handle.fileno())
+            self._clear_journal()
+        # The CSV rows are committed; a crash before these inserts is caught by the next import
+        for entry, day_marks in zip(entries, by_day.values()):
+            self._sync_db(lambda: self.db.append_csv_rows(entry['file'], day_marks, entry['offset']))
+        self.written += len(marks)
+        self.batches += 1
+        if self.bitmap is not None:
+            try:
+                self.bitmap.sync(self.db)
+            except (sqlite3.Error, OSError) as e:
+                # The next sync folds this batch in again
+                print(f"⚠️ Attendance bitmap not updated: {e}")
+
+    def _run(self):
+        running = True
+        while running:
+            try:
+                first = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            items = [first]
+            deadline = time.monotonic() + self.flush_interval
+            # Gather whatever else arrives until the batch is full or the interval ends
+            while len(items) < self.max_batch and isinstance(items[-1], tuple):
+                remaining = deadline - time.monotonic()
+                try:
+                    items.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            marks = [item for item in items if isinstance(item, tuple)]
+            if marks:
+                try:
+                    self._write_batch(marks)
+                except OSError as e:
+                    self.errors += 1
+                    self._unflushed_error = self._unflushed_error or e
+                    print(f"❌ Error writing attendance: {e}")
+            for item in items:
+                if isinstance(item, _Flush):
+                    item.error, self._unflushed_error = self._unflushed_error, None
+                    item.done.set()
+                elif item is None:
+                    running = False
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+    def stats(self):
+        return {
+            'queued': self.queue.qsize(),
+            'written': self.written,
+            'batches': self.batches,
+            'errors': self.errors,
+            'recovered': self.recovered,
+        }
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_writer(config=None):
+    """Process-wide AttendanceWriter built from the ``attendance`` settings"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            settings = dict((config or load_config())['attendance'])
+            settings.pop('archive', None)
+            _shared = AttendanceWriter(**settings)
+            atexit.register(_shared.close)
+        return _shared
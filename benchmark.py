@@ -0,0 +1,316 @@
+import argparse
+import time
+
+import numpy as np
+
+from face_gallery import load_gallery
+
+
+def _time_per_call(fn, repeats):
+    fn()  # warm-up: page in mmaps, lazily load index files
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeats
+
+
+def _noisy_queries(faces, n, rng):
+    rows = rng.choice(len(faces), n)
+    noise = rng.integers(-20, 21, size=(n, faces.shape[1]))
+    return np.clip(faces[rows].astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def bench_recognition(args):
+    """Per-frame cost of the old sklearn KNN path against RecognitionEngine"""
+    from sklearn.neighbors import KNeighborsClassifier
+
+    from recognition_engine import RecognitionEngine
+
+    gallery = load_gallery()
+    faces = np.asarray(gallery.faces)
+    names = gallery.names
+    rng = np.random.default_rng(0)
+
+    start = time.perf_counter()
+    knn = KNeighborsClassifier(n_neighbors=5).fit(faces, names)
+    fit_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    engine = RecognitionEngine(n_neighbors=5)
+    engine.recognize(faces[:1])
+    load_ms = (time.perf_counter() - start) * 1000
+
+    print(f"Gallery: {len(faces)} samples, index dims: {engine.index.meta['dim']}, "
+          f"backend: {engine.index.meta['index']['backend']}")
+    print(f"Startup: sklearn fit {fit_ms:.1f} ms | index load {load_ms:.1f} ms")
+    print(f"{'faces/frame':>11}{'sklearn ms':>12}{'engine ms':>11}{'speedup':>9}{'agree':>8}")
+    for n_faces in args.faces:
+        batch = _noisy_queries(faces, n_faces, rng)
+
+        def sklearn_frame():
+            # test.py / web_attendance.py: predict + predict_proba for every face
+            for row in batch:
+                knn.predict(row.reshape(1, -1))
+                knn.predict_proba(row.reshape(1, -1))
+
+        sk_ms = _time_per_call(sklearn_frame, args.repeats)
+        engine_ms = _time_per_call(lambda: engine.recognize(batch), args.repeats)
+        agree = (knn.predict(batch) == engine.recognize(batch).labels).mean()
+        print(f"{n_faces:>11}{sk_ms:>12.2f}{engine_ms:>11.2f}{sk_ms / engine_ms:>8.1f}x{agree:>8.2f}")
+
+
+RESOLUTIONS = {'480p': (640, 480), '720p': (1280, 720), '1080p': (1920, 1080)}
+
+
+def bench_detection(args):
+    """Full-resolution cascade against the downscaled, size-bounded, ROI and tiled detectors"""
+    import cv2
+
+    from face_detection import detector_from_config
+
+    image = cv2.imread(args.image)
+    if image is None:
+        raise SystemExit(f"❌ Could not read {args.image}")
+    baseline = cv2.CascadeClassifier('data/haarcascade_frontalface_default.xml')
+
+    print(f"{'resolution':>10}{'baseline ms':>13}{'full ms':>9}{'roi ms':>8}{'full x':>8}{'roi x':>7}{'faces':>10}")
+    for label in args.resolutions:
+        gray = cv2.cvtColor(cv2.resize(image, RESOLUTIONS[label]), cv2.COLOR_BGR2GRAY)
+        full = detector_from_config(roi=False)
+        roi = detector_from_config()
+        base_ms = _time_per_call(lambda: baseline.detectMultiScale(gray, 1.3, 5), args.repeats)
+        full_ms = _time_per_call(lambda: full.detect(gray), args.repeats)
+        roi_ms = _time_per_call(lambda: roi.detect(gray), args.repeats)
+        counts = f"{len(baseline.detectMultiScale(gray, 1.3, 5))}/{len(full.detect(gray))}"
+        print(f"{label:>10}{base_ms:>13.2f}{full_ms:>9.2f}{roi_ms:>8.2f}"
+              f"{base_ms / full_ms:>7.1f}x{full_ms / roi_ms:>6.1f}x{counts:>10}")
+    # The same still every frame is the ROI search's best case: it always hits
+    # and sweeps the whole frame only every ``full_sweep_every`` calls
+    print("full x: full detector vs baseline | roi x: ROI vs full detector, an upper bound on a still image")
+
+    if args.tile_size:
+        # Full-resolution tiled sweeps: throughput should grow with the worker count
+        print(f"\nTiled full-resolution detection, {args.tile_size}px tiles")
+        print(f"{'resolution':>10}{'workers':>9}{'ms':>9}{'fps':>8}{'faces':>7}")
+        for label in args.resolutions:
+            gray = cv2.cvtColor(cv2.resize(image, RESOLUTIONS[label]), cv2.COLOR_BGR2GRAY)
+            for workers in args.workers:
+                tiled = detector_from_config(roi=False, detect_width=0, tile_size=args.tile_size, tile_workers=workers)
+                tiled_ms = _time_per_call(lambda: tiled.detect(gray), args.repeats)
+                print(f"{label:>10}{workers:>9}{tiled_ms:>9.2f}{1000 / tiled_ms:>8.1f}{len(tiled.detect(gray)):>7}")
+                tiled.close()
+
+
+def _box_agreement(boxes, reference, threshold=0.5):
+    """Boxes matched one-to-one at IoU >= threshold, greedy by overlap"""
+    from face_tracker import iou
+
+    pairs = sorted(((iou(a, b), i, j) for i, a in enumerate(boxes) for j, b in enumerate(reference)), reverse=True)
+    used_a, used_b = set(), set()
+    for score, i, j in pairs:
+        if score < threshold:
+            break
+        if i not in used_a and j not in used_b:
+            used_a.add(i)
+            used_b.add(j)
+    return len(used_a)
+
+
+def bench_detectors(args):
+    """Latency percentiles and box agreement of each detector backend over a folder of frames"""
+    import os
+
+    import cv2
+
+    from face_detection import DETECTOR_BACKENDS, detector_from_config
+
+    paths = sorted(os.path.join(args.frames, name) for name in os.listdir(args.frames)
+                   if name.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')))
+    frames = [cv2.imread(path, cv2.IMREAD_GRAYSCALE) for path in paths]
+    frames = [frame for frame in frames if frame is not None]
+    if not frames:
+        raise SystemExit(f"❌ No readable frames in {args.frames}")
+
+    results = {}
+    for name in args.backends or list(DETECTOR_BACKENDS):
+        try:
+            detector = detector_from_config(backend=name, roi=False)
+        except (FileNotFoundError, cv2.error) as e:
+            print(f"⚠️ Skipping {name}: {e}")
+            continue
+        detector.detect(frames[0])  # warm-up
+        latencies, boxes = [], []
+        for frame in frames:
+            start = time.perf_counter()
+            boxes.append(detector.detect(frame))
+            latencies.append((time.perf_counter() - start) * 1000)
+        results[name] = (np.array(latencies), boxes)
+
+    if not results:
+        raise SystemExit("❌ No detector backend could be loaded")
+    reference = args.reference if args.reference in results else next(iter(results))
+    print(f"{len(frames)} frames from {args.frames}, agreement against '{reference}' at IoU >= {args.iou}")
+    print(f"{'backend':>8}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'fps':>8}{'boxes':>7}{'recall':>8}{'precision':>11}")
+    ref_boxes = results[reference][1]
+    for name, (latencies, boxes) in results.items():
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        matched = sum(_box_agreement(b, r, args.iou) for b, r in zip(boxes, ref_boxes))
+        found = sum(len(b) for b in boxes)
+        expected = sum(len(r) for r in ref_boxes)
+        recall = matched / expected if expected else 1.0
+        precision = matched / found if found else 1.0
+        print(f"{name:>8}{p50:>9.2f}{p90:>9.2f}{p99:>9.2f}{1000 / latencies.mean():>8.1f}{found:>7}"
+              f"{recall:>8.2f}{precision:>11.2f}")
+
+
+def bench_attendance(args):
+    """Dashboard rerun cost: globbing every CSV against the synced SQLite frame cache and rollups"""
+    import glob
+    import os
+    import shutil
+    import tempfile
+    from datetime import date, timedelta
+
+    import pandas as pd
+
+    from attendance_db import AttendanceDB
+
+    root = tempfile.mkdtemp(prefix='attendance_bench_')
+    try:
+        first = date.today() - timedelta(days=args.days - 1)
+        for i in range(args.days):
+            day = first + timedelta(days=i)
+            with open(os.path.join(root, f"Attendance_{day:%d-%m-%y}.csv"), 'w', newline='') as f:
+                f.write("NAME,TIME\n" + "".join(f"P{j},09:{j % 60:02d}-00\n" for j in range(args.rows)))
+        today = os.path.join(root, f"Attendance_{date.today():%d-%m-%y}.csv")
+
+        def glob_all():
+            # analytics.py before the attendance database
+            return pd.concat([pd.read_csv(path) for path in glob.glob(os.path.join(root, 'Attendance_*.csv'))])
+
+        db = AttendanceDB(os.path.join(root, 'attendance.db'))
+        start = time.perf_counter()
+        db.sync_directory(root)
+        db.records()
+        cold_ms = (time.perf_counter() - start) * 1000
+
+        def rerun():
+            db.sync_directory(root)
+            return db.records(first, date.today(), ['P1'])
+
+        def append_and_rerun():
+            with open(today, 'a', newline='') as f:
+                f.write("P1,18:00-00\n")
+            return rerun()
+
+        print(f"{args.days} daily files x {args.rows} rows")
+        print(f"glob + read_csv per rerun: {_time_per_call(glob_all, args.repeats):.1f} ms")
+        print(f"cold import + first frame: {cold_ms:.1f} ms")
+        print(f"rerun, nothing changed:    {_time_per_call(rerun, args.repeats):.1f} ms")
+        print(f"rerun after one new mark:  {_time_per_call(append_and_rerun, args.repeats):.1f} ms")
+
+        def metrics_from_rows():
+            df = db.query_records()
+            return len(df), df['NAME'].nunique(), df.groupby('FULL_DATE').size(), df['NAME'].value_counts()
+
+        def metrics_from_rollups():
+            return db.summary(), db.daily_summary(), db.person_summary()
+
+        print(f"headline metrics, raw rows: {_time_per_call(metrics_from_rows, args.repeats):.1f} ms")
+        print(f"headline metrics, rollups:  {_time_per_call(metrics_from_rollups, args.repeats):.1f} ms")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def bench_bitmap(args):
+    """Range/streak/rate queries: pandas over raw records vs the per-day bitmap"""
+    import os
+    import shutil
+    import tempfile
+    from datetime import date, timedelta
+
+    import pandas as pd
+
+    from attendance_bitmap import AttendanceBitmap
+
+    rng = np.random.default_rng(0)
+    root = tempfile.mkdtemp(prefix='bitmap_bench_')
+    try:
+        first = date.today() - timedelta(days=args.days - 1)
+        days = [first + timedelta(days=i) for i in range(args.days)]
+        names = [f"P{i}" for i in range(args.people)]
+        present = rng.random((args.days, args.people)) < args.rate
+        day_idx, person_idx = np.nonzero(present)
+        df = pd.DataFrame({'NAME': np.asarray(names)[person_idx],
+                           'FULL_DATE': pd.to_datetime(np.asarray(days)[day_idx])})
+
+        # Register everyone through add(), then bulk-load the packed bits
+        bitmap = AttendanceBitmap(root)
+        bitmap.add([(name, first) for name in names] + [(names[0], days[-1])])
+        bitmap.bits[:args.days] = 0
+        bitmap.bits[:args.days, :(args.people + 7) // 8] = np.packbits(present, axis=1, bitorder='little')
+        month = (date.today() - timedelta(days=29), date.today())
+
+        def pandas_queries():
+            sub = df[(df['FULL_DATE'] >= pd.Timestamp(month[0])) & (df['FULL_DATE'] <= pd.Timestamp(month[1]))]
+            present = sub.groupby('NAME')['FULL_DATE'].nunique()
+            active = sub['FULL_DATE'].nunique()
+            return present[present == active], present / active, df[df['NAME'] == 'P1']['FULL_DATE'].unique()
+
+        def bitmap_queries():
+            return bitmap.attended_all(*month), bitmap.rates(*month), bitmap.streaks('P1')
+
+        print(f"{args.people} people x {args.days} days, {len(df)} marks "
+              f"(bitmap {os.path.getsize(bitmap.bits_path) / 1024:.0f} KB)")
+        print(f"pandas over raw records: {_time_per_call(pandas_queries, args.repeats):.2f} ms")
+        print(f"bitmap:                  {_time_per_call(bitmap_queries, args.repeats):.2f} ms")
+        for label, query in (("attended every day", lambda: bitmap.attended_all(*month)),
+                             ("rates", lambda: bitmap.rates(*month)),
+                             ("streak", lambda: bitmap.streaks('P1'))):
+            print(f"  {label:<20} {_time_per_call(query, args.repeats) * 1000:.0f} µs")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance benchmarks for the attendance system")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    recognition = sub.add_parser('recognition', help="sklearn KNN vs the recognition engine")
+    recognition.add_argument('--faces', type=int, nargs='+', default=[1, 4, 16])
+    recognition.add_argument('--repeats', type=int, default=50)
+    recognition.set_defaults(func=bench_recognition)
+
+    detection = sub.add_parser('detection', help="full-frame cascade vs the bounded face detector")
+    detection.add_argument('--image', default='face-ak-an.jpg', help="frame scaled to each resolution")
+    detection.add_argument('--resolutions', nargs='+', choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    detection.add_argument('--repeats', type=int, default=20)
+    detection.add_argument('--tile-size', type=int, default=640, help="0 skips the tiled comparison")
+    detection.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    detection.set_defaults(func=bench_detection)
+
+    detectors = sub.add_parser('detectors', help="latency and agreement of each detector backend")
+    detectors.add_argument('frames', help="directory of frames (jpg/png)")
+    detectors.add_argument('--backends', nargs='+', help="default: every backend whose model files exist")
+    detectors.add_argument('--reference', default='dnn', help="backend the others are scored against")
+    detectors.add_argument('--iou', type=float, default=0.5)
+    detectors.set_defaults(func=bench_detectors)
+
+    attendance = sub.add_parser('attendance', help="CSV globbing vs the incremental attendance store")
+    attendance.add_argument('--days', type=int, default=365)
+    attendance.add_argument('--rows', type=int, default=30, help="marks per daily file")
+    attendance.add_argument('--repeats', type=int, default=10)
+    attendance.set_defaults(func=bench_attendance)
+
+    bitmap = sub.add_parser('bitmap', help="pandas groupbys vs the per-day attendance bitmap")
+    bitmap.add_argument('--people', type=int, default=10000)
+    bitmap.add_argument('--days', type=int, default=5 * 365)
+    bitmap.add_argument('--rate', type=float, default=0.8, help="chance a person attends a given day")
+    bitmap.add_argument('--repeats', type=int, default=10)
+    bitmap.set_defaults(func=bench_bitmap)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
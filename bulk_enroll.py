@@ -0,0 +1,171 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from config import load_config
+from face_detection import FaceDetector
+from face_gallery import GALLERY_DIR, FaceGallery
+from recognition_engine import FACE_SIZE, crop_faces
+from recognition_index import publish_index
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.webm'}
+
+_detector = None
+
+
+def find_sources(paths):
+    """(name, file) pairs for every image and video under ``paths``
+
+    Files are enrolled under the name of the folder they sit in, so a
+    folder of per-person folders is a whole cohort. A file passed on its
+    own is enrolled under its file name.
+    """
+    sources = []
+    for path in paths:
+        if os.path.isfile(path):
+            sources.append((os.path.splitext(os.path.basename(path))[0], path))
+            continue
+        for folder, dirs, files in os.walk(path):
+            dirs.sort()
+            name = os.path.basename(os.path.normpath(folder))
+            for file in sorted(files):
+                if os.path.splitext(file)[1].lower() in IMAGE_EXTENSIONS | VIDEO_EXTENSIONS:
+                    sources.append((name, os.path.join(folder, file)))
+    return sources
+
+
+def _init_worker(detection):
+    global _detector
+    # One detector per process; cv2's own threads would only fight the pool
+    cv2.setNumThreads(1)
+    settings = dict(detection, roi=False, tile_size=0, tile_workers=1)
+    # No camera geometry: a face may fill an ID photo
+    _detector = FaceDetector(**settings)
+
+
+def _largest_face(frame):
+    boxes = _detector.detect_full(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+    if len(boxes) == 0:
+        return None
+    return crop_faces(frame, boxes[[np.argmax(boxes[:, 2] * boxes[:, 3])]])
+
+
+def _extract(task):
+    """Gallery samples of the largest face in an image, or in every Nth video frame"""
+    name, path, every, limit = task
+    crops = []
+    if os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS:
+        video = cv2.VideoCapture(path)
+        if not video.isOpened():
+            return name, path, None, 0
+        frames = 0
+        while not limit or len(crops) < limit:
+            ret, frame = video.read()
+            if not ret:
+                break
+            if frames % every == 0:
+                crop = _largest_face(frame)
+                if crop is not None:
+                    crops.append(crop)
+            frames += 1
+        video.release()
+    else:
+        frame = cv2.imread(path)
+        if frame is None:
+            return name, path, None, 0
+        frames = 1
+        crop = _largest_face(frame)
+        if crop is not None:
+            crops.append(crop)
+    faces = np.concatenate(crops) if crops else np.empty((0, FACE_SIZE[0] * FACE_SIZE[1] * 3), dtype=np.uint8)
+    return name, path, faces, frames
+
+
+def extract_faces(sources, workers=0, every=10, max_per_person=100, detection=None):
+    """Run detection and cropping over a process pool
+
+    Returns (faces, names, stats) with samples in source order, capped at
+    ``max_per_person`` per name.
+    """
+    detection = detection or load_config()['detection']
+    tasks = [(name, path, every, max_per_person) for name, path in sources]
+    workers = workers or os.cpu_count() or 1
+    faces, names = [], []
+    kept = {}
+    stats = {'files': len(tasks), 'frames': 0, 'unreadable': [], 'no_face': []}
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(detection,)) as pool:
+        chunksize = max(1, len(tasks) // (workers * 8))
+        for name, path, crops, frames in pool.map(_extract, tasks, chunksize=chunksize):
+            stats['frames'] += frames
+            if crops is None:
+                stats['unreadable'].append(path)
+                continue
+            if not len(crops):
+                stats['no_face'].append(path)
+                continue
+            room = max_per_person - kept.get(name, 0) if max_per_person else len(crops)
+            crops = crops[:max(room, 0)]
+            kept[name] = kept.get(name, 0) + len(crops)
+            faces.append(crops)
+            names.extend([name] * len(crops))
+    faces = np.concatenate(faces) if faces else np.empty((0, FACE_SIZE[0] * FACE_SIZE[1] * 3), dtype=np.uint8)
+    return faces, names, stats
+
+
+def main():
+    enrollment = load_config()['enrollment']
+    parser = argparse.ArgumentParser(description="Enroll many people at once from photo folders or videos")
+    parser.add_argument('paths', nargs='+', help="a folder per person, a folder of such folders, or video files")
+    parser.add_argument('--workers', type=int, default=enrollment['workers'], help="detection processes (0 = every core)")
+    parser.add_argument('--every', type=int, default=enrollment['video_every'], help="sample one video frame in N")
+    parser.add_argument('--max-per-person', type=int, default=enrollment['max_per_person'],
+                        help="samples kept per person (0 = no limit)")
+    parser.add_argument('--dry-run', action='store_true', help="extract and report, do not write the gallery")
+    args = parser.parse_args()
+
+    sources = find_sources(args.paths)
+    if not sources:
+        print("📝 No images or videos found")
+        return
+    gallery = FaceGallery(GALLERY_DIR)
+    gallery.migrate_legacy()
+    pending = set(gallery.manifest().pending_removal)
+    skipped = sorted({name for name, _ in sources if name in pending})
+    if skipped:
+        # append() refuses these, and one of them must not sink the whole cohort
+        print(f"⚠️ Skipping {', '.join(skipped)}: awaiting removal (python compact_gallery.py --purge)")
+        sources = [(name, path) for name, path in sources if name not in pending]
+
+    print(f"🔍 {len(sources)} files for {len({name for name, _ in sources})} people")
+    start = time.time()
+    faces, names, stats = extract_faces(sources, args.workers, max(1, args.every), args.max_per_person)
+    elapsed = time.time() - start
+    print(f"⚡ {len(faces)} faces from {stats['frames']} images/frames in {elapsed:.2f}s "
+          f"({len(faces) / max(elapsed, 1e-9):.1f} faces/s, {stats['frames'] / max(elapsed, 1e-9):.1f} frames/s)")
+    for path in stats['unreadable']:
+        print(f"❌ Could not read {path}")
+    for path in stats['no_face']:
+        print(f"⚠️ No face found in {path}")
+    people = sorted(set(names))
+    missing = sorted({name for name, _ in sources} - set(people))
+    if missing:
+        print(f"⚠️ Nobody enrolled for: {', '.join(missing)}")
+    if args.dry_run or not len(faces):
+        return
+
+    # One segment and one manifest commit for the whole cohort
+    commit_start = time.time()
+    seg_id = gallery.append(faces, names)
+    print(f"✅ Enrolled {len(people)} people ({len(faces)} samples) as segment {seg_id} "
+          f"in {time.time() - commit_start:.2f}s")
+    publish_index()
+    print(f"🏁 {len(faces) / max(time.time() - start, 1e-9):.1f} faces/s end to end")
+
+
+if __name__ == "__main__":
+    main()
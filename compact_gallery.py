@@ -0,0 +1,244 @@
+import argparse
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from face_gallery import GALLERY_DIR, FaceGallery, load_gallery
+from index_backends import blocked_top_k, kmeans, squared_distances
+from recognition_index import publish_index
+
+BLOCK_ROWS = 512
+
+
+def near_duplicate_mask(X, threshold):
+    """Boolean (m, m) matrix of sample pairs closer than ``threshold`` RMS grey levels"""
+    X = np.asarray(X, dtype=np.float32)
+    sq_norms = (X * X).sum(axis=1)
+    limit = threshold * threshold * X.shape[1]
+    near = np.empty((len(X), len(X)), dtype=bool)
+    for lo in range(0, len(X), BLOCK_ROWS):
+        near[lo:lo + BLOCK_ROWS] = squared_distances(X[lo:lo + BLOCK_ROWS], X, sq_norms) < limit
+    return near
+
+
+def drop_near_duplicates(X, threshold):
+    """Greedily keep a sample only if no earlier kept sample is a near-duplicate"""
+    near = near_duplicate_mask(X, threshold)
+    removed = np.zeros(len(X), dtype=bool)
+    kept = []
+    for i in range(len(X)):
+        if removed[i]:
+            continue
+        kept.append(i)
+        removed[i + 1:] |= near[i, i + 1:]
+    return np.asarray(kept, dtype=np.int64)
+
+
+def kmeans_prototypes(X, n_prototypes):
+    """Real samples closest to each of ``n_prototypes`` k-means centroids"""
+    X = np.asarray(X, dtype=np.float32)
+    if len(X) <= n_prototypes:
+        return np.arange(len(X))
+    centroids = kmeans(X, n_prototypes)
+    _, nearest = blocked_top_k(centroids, X, (X * X).sum(axis=1), 1)
+    return np.unique(nearest[:, 0])
+
+
+def condensed_nearest_neighbour(X, label_ids, max_passes=10):
+    """Hart's CNN: keep only samples the current prototype set misclassifies under 1-NN"""
+    X = np.asarray(X, dtype=np.float32)
+    store = np.zeros(len(X), dtype=bool)
+    for c in np.unique(label_ids):
+        store[np.flatnonzero(label_ids == c)[0]] = True
+    for _ in range(max_passes):
+        added = False
+        for lo in range(0, len(X), BLOCK_ROWS):
+            rows = np.arange(lo, min(lo + BLOCK_ROWS, len(X)))
+            rows = rows[~store[rows]]
+            if len(rows) == 0:
+                continue
+            kept = np.flatnonzero(store)
+            _, nearest = blocked_top_k(X[rows], X[kept], (X[kept] ** 2).sum(axis=1), 1)
+            wrong = label_ids[kept[nearest[:, 0]]] != label_ids[rows]
+            if wrong.any():
+                store[rows[wrong]] = True
+                added = True
+        if not added:
+            break
+    return np.flatnonzero(store)
+
+
+def holdout_accuracy(X, label_ids, kept, test_rows, k=5):
+    """5-NN accuracy on held-out rows using only the ``kept`` rows (minus the held-out ones)"""
+    train = np.setdiff1d(kept, test_rows)
+    X = np.asarray(X, dtype=np.float32)
+    mean = X[train].mean(axis=0)
+    G = X[train] - mean
+    _, neighbours = blocked_top_k(X[test_rows] - mean, G, (G * G).sum(axis=1), k)
+    votes = np.zeros((len(test_rows), label_ids.max() + 1), dtype=np.int32)
+    np.add.at(votes, (np.arange(len(test_rows))[:, None], label_ids[train][neighbours]), 1)
+    return float((votes.argmax(axis=1) == label_ids[test_rows]).mean())
+
+
+def compact(gallery, dup_threshold=4.0, prototypes=0, cnn=False):
+    """Row indices (into the gallery) that survive condensation"""
+    faces = gallery.faces
+    label_ids = gallery.label_ids
+    kept = []
+    for c in np.unique(label_ids):
+        rows = np.flatnonzero(label_ids == c)
+        X = np.asarray(faces[rows], dtype=np.float32)
+        local = drop_near_duplicates(X, dup_threshold) if dup_threshold > 0 else np.arange(len(rows))
+        if prototypes:
+            local = local[kmeans_prototypes(X[local], prototypes)]
+        kept.append(rows[local])
+    kept = np.sort(np.concatenate(kept))
+    if cnn:
+        kept = kept[condensed_nearest_neighbour(faces[kept], label_ids[kept])]
+    return kept
+
+
+def stage_gallery(staging, store):
+    """Empty gallery at ``staging`` sharing the label table of ``store``, for ``commit_rewrite``"""
+    shutil.rmtree(staging, ignore_errors=True)
+    staged = FaceGallery(staging)
+    os.makedirs(staging)
+    staged._save_label_table(store.load_label_table())
+    return staged
+
+
+def purge_removed(root=GALLERY_DIR):
+    """Rewrite the gallery and index without the rows of removed people; returns rows dropped
+
+    Segments are copied one at a time (never the whole matrix) into a
+    staging gallery that is committed only if nothing was enrolled or
+    removed meanwhile. No rollback copy is kept and the old segments are
+    deleted as soon as no process maps them: removal should not leave
+    face data behind.
+    """
+    store = FaceGallery(root)
+    before = store.manifest()
+    removed = set(before.pending_removal)
+    if not removed:
+        return 0
+    gallery = store.load()
+    removed_ids = [i for i, name in enumerate(gallery.label_table) if name in removed]
+    staged = stage_gallery(f"{root}.purging", store)
+    offset = dropped = 0
+    for segment in gallery.segments:
+        label_ids = gallery.label_ids[offset:offset + len(segment)]
+        offset += len(segment)
+        keep = np.flatnonzero(~np.isin(label_ids, removed_ids))
+        dropped += len(segment) - len(keep)
+        if len(keep):
+            staged.append(segment[keep], [gallery.label_table[i] for i in label_ids[keep]])
+    # Unmap the old segments so they can be deleted right after the commit (Windows)
+    gallery = segment = None
+    try:
+        if not staged.exists():
+            raise ValueError("Removing everyone would leave an empty gallery; use fresh_start.py instead")
+        staged.inherit_manifest(before)
+        store.commit_rewrite(staged, before.version)
+    finally:
+        shutil.rmtree(staged.root, ignore_errors=True)
+    # Older index versions still hold the removed people's vectors
+    publish_index(root, keep=0)
+    return dropped
+
+
+_purge_lock = threading.Lock()
+
+
+def start_background_purge(root=GALLERY_DIR):
+    """Run ``purge_removed`` on a daemon thread (at most one at a time); returns the thread or None"""
+    if not _purge_lock.acquire(blocking=False):
+        return None
+
+    def run():
+        try:
+            dropped = purge_removed(root)
+            if dropped:
+                print(f"✅ Compacted {dropped} samples of removed people out of the gallery and index")
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"❌ Background gallery compaction failed: {e}")
+        finally:
+            _purge_lock.release()
+
+    thread = threading.Thread(target=run, name='gallery-purge', daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Condense the face gallery into fewer, more distinct samples")
+    parser.add_argument('--dup-threshold', type=float, default=4.0,
+                        help="drop samples within this RMS grey-level distance of a kept one (0 disables)")
+    parser.add_argument('--prototypes', type=int, default=0,
+                        help="keep at most this many k-means prototypes per person")
+    parser.add_argument('--cnn', action='store_true', help="apply condensed nearest neighbour selection")
+    parser.add_argument('--test-fraction', type=float, default=0.2)
+    parser.add_argument('--dry-run', action='store_true', help="report only, do not write")
+    parser.add_argument('--rollback', action='store_true', help="restore the gallery from before the last compaction")
+    parser.add_argument('--purge', action='store_true', help="only drop the samples of removed people")
+    args = parser.parse_args()
+
+    if args.purge:
+        pending = FaceGallery().manifest().pending_removal
+        dropped = purge_removed()
+        print(f"✅ Purged {dropped} samples of {', '.join(pending)}" if pending else "📝 Nobody awaiting removal")
+        return
+
+    if args.rollback:
+        restored = FaceGallery().rollback()
+        if restored is None:
+            print("❌ No compaction to roll back")
+            return
+        publish_index()
+        print(f"✅ Restored the gallery as of {restored}")
+        return
+
+    gallery = load_gallery()
+    manifest = FaceGallery().manifest()
+    start = time.time()
+    kept = compact(gallery, args.dup_threshold, args.prototypes, args.cnn)
+    elapsed = time.time() - start
+
+    rng = np.random.default_rng(0)
+    test_rows = np.concatenate([
+        rng.choice(rows, max(1, int(len(rows) * args.test_fraction)), replace=False)
+        for rows in (np.flatnonzero(gallery.label_ids == c) for c in np.unique(gallery.label_ids))
+    ])
+    faces = np.asarray(gallery.faces)
+    before = holdout_accuracy(faces, gallery.label_ids, np.arange(len(gallery)), test_rows)
+    after = holdout_accuracy(faces, gallery.label_ids, kept, test_rows)
+
+    print(f"📊 Samples: {len(gallery)} -> {len(kept)} ({len(kept) / max(len(gallery), 1):.0%}) in {elapsed:.2f}s")
+    for c in np.unique(gallery.label_ids):
+        print(f"   {gallery.label_table[c]}: {(gallery.label_ids == c).sum()} -> {(gallery.label_ids[kept] == c).sum()}")
+    print(f"🎯 Held-out accuracy: {before:.3f} -> {after:.3f} ({after - before:+.3f})")
+
+    if args.dry_run:
+        return
+    store = FaceGallery()
+    compacted = stage_gallery(f"{GALLERY_DIR}.compacting", store)
+    # Removed people are left out here too, or the rewrite would bring them back
+    removed_ids = [i for i, name in enumerate(gallery.label_table) if name in set(manifest.pending_removal)]
+    kept = kept[~np.isin(gallery.label_ids[kept], removed_ids)]
+    try:
+        compacted.append(faces[kept], list(gallery.names[kept]))
+        gallery = faces = None
+        compacted.inherit_manifest(manifest)
+        store.commit_rewrite(compacted, manifest.version, keep_previous=True)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return
+    finally:
+        shutil.rmtree(compacted.root, ignore_errors=True)
+    publish_index()
+    print("✅ Compacted gallery committed; the original segments are kept (undo with --rollback)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import copy
+import json
+import os
+
+CONFIG_FILE = 'data/config.json'
+
+# Every key can be overridden from data/config.json; missing keys fall back here
+DEFAULTS = {
+    'recognition': {
+        'n_neighbors': 5,
+        # 'none' keeps raw 7500-dim pixels, 'pca' = Eigenfaces, 'lda' = Fisherfaces
+        'projection': 'pca',
+        'n_components': 128,
+        # running recognizers pick up enrollments and removals without a restart
+        'hot_reload': True,
+        'index': {
+            # 'brute' = exact, 'tree' = ball/KD-tree, 'ivf' = k-means partitions
+            'backend': 'brute',
+            'tree': 'ball',
+            'leaf_size': 40,
+            # 0 picks sqrt(n_samples) partitions
+            'n_lists': 0,
+            # partitions searched per query: higher = better recall, slower
+            'n_probe': 8,
+        },
+    },
+    'tracking': {
+        'enabled': True,
+        # full-frame detection runs every N frames (or when a track is lost)
+        'detect_every': 5,
+        'iou_threshold': 0.3,
+        'max_misses': 2,
+        'history': 10,
+        # stop re-recognizing once this many recent votes agree at this ratio
+        'converge_votes': 5,
+        'converge_ratio': 0.8,
+        # re-recognize when the box moved below this IoU from where it was recognized
+        'drift_iou': 0.5,
+        'template_threshold': 0.5,
+    },
+    'motion': {
+        'enabled': True,
+        # 'diff' = frame differencing, 'mog2' = background subtractor
+        'method': 'diff',
+        'downscale_width': 160,
+        'pixel_threshold': 25,
+        # share of downscaled pixels that must change to count as motion
+        'min_area': 0.005,
+        # seconds without motion or faces before going idle
+        'idle_after': 3.0,
+        'idle_fps': 5,
+    },
+    'detection': {
+        # 'haar' (default), 'lbp' (faster cascade) or 'dnn' (OpenCV DNN SSD, most accurate)
+        'backend': 'haar',
+        'backends': {
+            'haar': {'cascade': 'data/haarcascade_frontalface_default.xml', 'scale_factor': 1.3, 'min_neighbors': 5},
+            # from opencv/data/lbpcascades in the OpenCV sources
+            'lbp': {'cascade': 'data/lbpcascade_frontalface_improved.xml', 'scale_factor': 1.2, 'min_neighbors': 5},
+            # res10_300x300 SSD from the OpenCV face_detector sample
+            'dnn': {
+                'model': 'data/res10_300x300_ssd_iter_140000.caffemodel',
+                'config': 'data/deploy.prototxt',
+                'confidence': 0.5,
+                'input_size': 300,
+            },
+        },
+        # the cascade runs on a copy no wider than this (0 = full resolution)
+        'detect_width': 640,
+        # face width bounds in full-resolution pixels; 0 derives them from 'camera'
+        'min_face': 0,
+        'max_face': 0,
+        # search only around the previous faces, with a full sweep every N frames
+        'roi': True,
+        'roi_margin': 0.5,
+        'full_sweep_every': 10,
+        # split full sweeps into overlapping tiles searched in parallel (0 = off);
+        # overlap 0 uses the largest face size, workers 0 uses every core
+        'tile_size': 0,
+        'tile_overlap': 0,
+        'tile_workers': 0,
+    },
+    'camera': {
+        'horizontal_fov_deg': 60,
+        # closest and farthest a person stands from the camera, in metres
+        'min_distance_m': 0.3,
+        'max_distance_m': 3.0,
+        'face_width_m': 0.15,
+    },
+    'notifications': {
+        # 'auto' tries sapi, pyttsx3, espeak, then console; 'none' is silent
+        'backend': 'auto',
+        # the same announcement is spoken at most once per this many seconds
+        'coalesce_seconds': 10.0,
+        'max_queue': 5,
+    },
+    'attendance': {
+        'directory': 'Attendance',
+        # queued marks are written at least this often, in batches of up to max_batch
+        'flush_interval': 1.0,
+        'max_batch': 256,
+        # fsync the CSV after every batch (slower, survives power loss)
+        'fsync': True,
+        # SQLite store the dashboards query ('' keeps CSV files only)
+        'database': 'data/attendance.db',
+        # month-partitioned Parquet archive of closed days (needs pyarrow)
+        'archive': 'data/attendance_archive',
+        # per-day attendance bitsets for range/streak/rate queries ('' = off)
+        'bitmap': 'data/attendance_bitmap',
+    },
+    'enrollment': {
+        # bulk_enroll.py: detection processes (0 uses every core)
+        'workers': 0,
+        # sample one video frame in N, like addFaces.py does from the webcam
+        'video_every': 10,
+        # samples kept per person across all their photos and videos (0 = no limit)
+        'max_per_person': 100,
+    },
+}
+
+
+def _merge(base, override):
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _merge(base[key], value)
+        else:
+            base[key] = value
+    return base
+
+
+def load_config(path=CONFIG_FILE):
+    """Return the default settings merged with data/config.json if present"""
+    config = copy.deepcopy(DEFAULTS)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                _merge(config, json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable {path}: {e}")
+    return config
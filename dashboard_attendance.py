@@ -1,13 +1,14 @@
 import streamlit as st
 import cv2
-import pickle
 import numpy as np
 import pandas as pd
 import time
 import os
-import csv
 from datetime import datetime
-from sklearn.neighbors import KNeighborsClassifier
+from face_gallery import load_manifest
+from recognition_engine import RecognitionEngine
+from face_detection import detector_from_config
+from attendance_writer import get_writer
 from PIL import Image
 import tempfile
 
@@ -21,34 +22,26 @@ st.set_page_config(
 st.title("📋 Face Recognition Attendance Dashboard")
 st.markdown("---")
 
-# Load face recognition data
-@st.cache_data
+# Trained people and their sample counts, from the gallery manifest
 def load_face_data():
-    try:
-        with open('data/names.pkl', 'rb') as f:
-            names = pickle.load(f)
-        with open('data/faces_data.pkl', 'rb') as f:
-            faces = pickle.load(f)
-        return names, faces
-    except FileNotFoundError:
+    manifest = load_manifest()
+    if not manifest.samples:
         st.error("❌ Face recognition data not found. Please train the model first using addFaces.py")
-        return None, None
+        return None
+    return manifest.counts
 
-# Initialize KNN model
+# Initialize recognition engine (cached once; it hot-reloads new enrollments itself)
 @st.cache_resource
 def load_models():
-    names, faces = load_face_data()
-    if names is not None and faces is not None:
-        knn = KNeighborsClassifier(n_neighbors=5)
-        knn.fit(faces, names)
-        face_detector = cv2.CascadeClassifier('data/haarcascade_frontalface_default.xml')
-        return knn, face_detector, names
-    return None, None, None
+    engine = RecognitionEngine(n_neighbors=5)
+    face_detector = detector_from_config(roi=False)
+    return engine, face_detector
 
-# Load models
-knn_model, face_detector, trained_names = load_models()
+# Load models; the people list is re-read from the manifest on every rerun
+trained_counts = load_face_data()
+engine, face_detector = load_models() if trained_counts is not None else (None, None)
 
-if knn_model is None:
+if engine is None:
     st.error("❌ Could not load face recognition models. Please train the system first.")
     st.stop()
 
@@ -85,22 +78,16 @@ if attendance_method == "📷 Camera Capture":
                 if ret:
                     # Process the frame
                     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                    faces = face_detector.detectMultiScale(gray, 1.3, 5)
+                    faces = face_detector.detect(gray)
                     
                     recognized_persons = []
                     
-                    for (x, y, w, h) in faces:
-                        # Extract face
-                        face_roi = frame[y:y+h, x:x+w]
-                        resized_face = cv2.resize(face_roi, (50, 50)).flatten().reshape(1, -1)
-                        
-                        # Predict
-                        prediction = knn_model.predict(resized_face)
-                        probabilities = knn_model.predict_proba(resized_face)
-                        confidence = np.max(probabilities)
-                        
+                    # Recognize every face in the photo with one neighbour search
+                    result = engine.recognize_frame(frame, faces)
+                    
+                    for (x, y, w, h), prediction, confidence in zip(faces, result.labels, result.confidence):
                         if confidence >= confidence_threshold:
-                            name = prediction[0]
+                            name = prediction
                             recognized_persons.append((name, confidence))
                             
                             # Draw rectangle and label
@@ -125,32 +112,15 @@ if attendance_method == "📷 Camera Capture":
                                 st.write(f"**{name}** (Confidence: {conf:.2f})")
                             with col2:
                                 if st.button(f"✅ Mark {name}", key=f"mark_{name}"):
-                                    # Save attendance
-                                    ts = time.time()
-                                    date = datetime.fromtimestamp(ts).strftime("%d-%m-%y")
-                                    timestamp = datetime.fromtimestamp(ts).strftime("%H:%M-%S")
-                                    
-                                    attendance_file = f"Attendance/Attendance_{date}.csv"
-                                    attendance_data = [name, timestamp]
+                                    # Save attendance through the shared writer
+                                    writer = get_writer()
+                                    timestamp = writer.mark(name).strftime("%H:%M-%S")
                                     
-                                    file_exists = os.path.isfile(attendance_file)
-                                    
-                                    try:
-                                        if file_exists:
-                                            with open(attendance_file, "a", newline='') as csvfile:
-                                                writer = csv.writer(csvfile)
-                                                writer.writerow(attendance_data)
-                                        else:
-                                            with open(attendance_file, "w", newline='') as csvfile:
-                                                writer = csv.writer(csvfile)
-                                                writer.writerow(["NAME", "TIME"])
-                                                writer.writerow(attendance_data)
-                                        
+                                    if writer.flush():
                                         st.success(f"✅ Attendance marked for {name} at {timestamp}!")
                                         st.balloons()
-                                        
-                                    except Exception as e:
-                                        st.error(f"❌ Error saving attendance: {str(e)}")
+                                    else:
+                                        st.error("❌ Error saving attendance: the write failed or timed out")
                     else:
                         st.warning("⚠️ No faces recognized with sufficient confidence. Try again with better lighting.")
                 
@@ -167,7 +137,7 @@ elif attendance_method == "✏️ Manual Entry":
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        available_names = list(set(trained_names))
+        available_names = list(trained_counts)
         selected_name = st.selectbox("👤 Select Person", available_names)
     
     with col2:
@@ -181,26 +151,13 @@ elif attendance_method == "✏️ Manual Entry":
         date_str = entry_date.strftime("%d-%m-%y")
         time_str = entry_time.strftime("%H:%M-%S")
         
-        attendance_file = f"Attendance/Attendance_{date_str}.csv"
-        attendance_data = [selected_name, time_str]
-        
-        file_exists = os.path.isfile(attendance_file)
+        writer = get_writer()
+        writer.mark(selected_name, datetime.combine(entry_date, entry_time))
         
-        try:
-            if file_exists:
-                with open(attendance_file, "a", newline='') as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerow(attendance_data)
-            else:
-                with open(attendance_file, "w", newline='') as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerow(["NAME", "TIME"])
-                    writer.writerow(attendance_data)
-            
+        if writer.flush():
             st.success(f"✅ Manual attendance added for {selected_name} on {date_str} at {time_str}!")
-            
-        except Exception as e:
-            st.error(f"❌ Error adding manual attendance: {str(e)}")
+        else:
+            st.error("❌ Error adding manual attendance: the write failed or timed out")
 
 elif attendance_method == "📊 View Records":
     st.header("📊 Attendance Records")
@@ -265,12 +222,12 @@ elif attendance_method == "📊 View Records":
 # System Information Sidebar
 st.sidebar.markdown("---")
 st.sidebar.subheader("🔧 System Info")
-st.sidebar.info(f"👥 Trained People: {len(set(trained_names))}")
-st.sidebar.info(f"📊 Training Samples: {len(trained_names)}")
+st.sidebar.info(f"👥 Trained People: {len(trained_counts)}")
+st.sidebar.info(f"📊 Training Samples: {sum(trained_counts.values())}")
 
 # Current trained people
 with st.sidebar.expander("👥 Trained People"):
-    for name in set(trained_names):
+    for name in trained_counts:
         st.sidebar.write(f"• {name}")
 
 # Instructions
@@ -0,0 +1,264 @@
+import math
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from config import load_config
+
+# Smallest window the stock OpenCV frontal-face cascades can see
+CASCADE_WINDOW = 24
+
+
+def non_max_suppression(boxes, iou_threshold=0.3):
+    """Merge duplicate (x, y, w, h) boxes, keeping the larger of overlapping pairs"""
+    boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+    if len(boxes) < 2:
+        return boxes
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+    areas = boxes[:, 2] * boxes[:, 3]
+    order = np.argsort(areas)[::-1]
+    keep = []
+    while len(order):
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        iw = np.maximum(0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+        ih = np.maximum(0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+        inter = iw * ih
+        overlap = inter / (areas[i] + areas[rest] - inter)
+        # A box mostly inside a bigger one is the same face found at another scale
+        contained = inter / np.maximum(areas[rest], 1)
+        order = rest[(overlap <= iou_threshold) & (contained <= 0.7)]
+    return boxes[np.sort(keep)]
+
+
+def tile_grid(width, height, tile_size, overlap):
+    """(x0, y0, x1, y1) tiles of at most ``tile_size`` overlapping by ``overlap`` pixels"""
+    step = max(1, tile_size - overlap)
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        points = list(range(0, length - tile_size, step))
+        return points + [length - tile_size]
+
+    return [(x, y, min(width, x + tile_size), min(height, y + tile_size))
+            for y in starts(height) for x in starts(width)]
+
+
+class CascadeBackend:
+    """OpenCV cascade: the stock Haar file or the faster LBP one"""
+
+    def __init__(self, cascade, scale_factor=1.3, min_neighbors=5):
+        self.cascade = cv2.CascadeClassifier(cascade)
+        if self.cascade.empty():
+            raise FileNotFoundError(f"Could not load face cascade {cascade}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+
+    def detect(self, gray, min_size, max_size):
+        """Float (x, y, w, h) boxes with width between min_size and max_size (0 = any)"""
+        min_px = max(CASCADE_WINDOW, min_size)
+        boxes = self.cascade.detectMultiScale(
+            gray, self.scale_factor, self.min_neighbors,
+            minSize=(min_px, min_px), maxSize=(max_size, max_size) if max_size > min_px else (0, 0))
+        return np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+
+
+class DNNBackend:
+    """OpenCV DNN single-shot face detector (res10 SSD Caffe model) on the CPU"""
+
+    def __init__(self, model, config, confidence=0.5, input_size=300):
+        if not (os.path.exists(model) and os.path.exists(config)):
+            raise FileNotFoundError(f"Could not load DNN face model {model} / {config}")
+        self.net = cv2.dnn.readNet(model, config)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.confidence = confidence
+        self.input_size = input_size
+
+    def detect(self, gray, min_size, max_size):
+        h, w = gray.shape[:2]
+        # The network is trained on colour; a grey frame replicated to 3 channels works
+        image = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+        blob = cv2.dnn.blobFromImage(image, 1.0, (self.input_size, self.input_size), (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        detections = self.net.forward().reshape(-1, 7)
+        detections = detections[detections[:, 2] >= self.confidence]
+        corners = np.clip(detections[:, 3:7], 0, 1) * np.array([w, h, w, h], dtype=np.float32)
+        boxes = np.column_stack([corners[:, :2], corners[:, 2:] - corners[:, :2]]).astype(np.float32)
+        keep = (boxes[:, 2] >= max(1, min_size)) & ((boxes[:, 2] <= max_size) if max_size else True)
+        return boxes[keep].reshape(-1, 4)
+
+
+DETECTOR_BACKENDS = {
+    'haar': CascadeBackend,
+    'lbp': CascadeBackend,
+    'dnn': DNNBackend,
+}
+
+
+def make_backend(name, settings):
+    """Instantiate the named detector backend from its settings dict"""
+    if name not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown detector backend '{name}' (choose from {', '.join(DETECTOR_BACKENDS)})")
+    return DETECTOR_BACKENDS[name](**settings)
+
+
+def face_size_range(frame_width, camera):
+    """Min/max face width in pixels implied by the camera's field of view and distances"""
+    fov = math.radians(camera['horizontal_fov_deg'])
+    pixels_per_metre_at_1m = frame_width / (2 * math.tan(fov / 2))
+    min_face = camera['face_width_m'] * pixels_per_metre_at_1m / camera['max_distance_m']
+    max_face = camera['face_width_m'] * pixels_per_metre_at_1m / camera['min_distance_m']
+    return int(min_face), int(math.ceil(max_face))
+
+
+class FaceDetector:
+    """Face detection on a downscaled frame, bounded by face size and ROI
+
+    ``backend`` picks the detector from ``DETECTOR_BACKENDS`` ('haar',
+    'lbp' or 'dnn'), built from ``backends[backend]``. It runs on a copy of the grey frame no wider than
+    ``detect_width`` and boxes are mapped back to full resolution. Face
+    sizes outside the range implied by ``camera`` geometry are never
+    searched. With ``roi`` enabled, frames after a hit only search the
+    previous faces' boxes expanded by ``roi_margin``; a full-frame sweep
+    still runs every ``full_sweep_every`` frames and whenever nothing was
+    found.
+
+    With ``tile_size`` set, full sweeps split the frame into overlapping
+    tiles searched by a pool of ``tile_workers`` threads, each search on
+    one of ``tile_workers`` backend instances built up front; boxes found twice across a tile border are merged by
+    non-maximum suppression. The overlap defaults to the largest face size
+    (at most half a tile) so faces fit whole inside some tile.
+    """
+
+    def __init__(self, backend='haar', backends=None, detect_width=640, min_face=0, max_face=0,
+                 roi=True, roi_margin=0.5, full_sweep_every=10, tile_size=0, tile_overlap=0,
+                 tile_workers=0, camera=None):
+        self.backend_name = backend
+        self.backend_settings = (backends or {}).get(backend, {})
+        self.backend = make_backend(backend, self.backend_settings)
+        self.detect_width = detect_width
+        self.min_face = min_face
+        self.max_face = max_face
+        self.roi = roi
+        self.roi_margin = roi_margin
+        self.full_sweep_every = full_sweep_every
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.tile_workers = tile_workers or os.cpu_count() or 1
+        self.camera = camera
+        self._pool = None
+        # Cascades and DNN nets are not thread-safe: each tile search borrows one of these.
+        # They are built here, not in the pool threads, so a missing model fails at startup.
+        self._tile_backends = queue.Queue()
+        for _ in range(self.tile_workers if tile_size else 0):
+            self._tile_backends.put(make_backend(backend, self.backend_settings))
+        self.previous = np.empty((0, 4), dtype=np.int32)
+        self.frames = 0
+        self.full_sweeps = 0
+
+    def close(self):
+        """Stop the tile worker threads"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def size_range(self, frame_width):
+        """(min, max) face width in full-resolution pixels; 0 means unbounded"""
+        min_face, max_face = self.min_face, self.max_face
+        if self.camera and not (min_face and max_face):
+            geo_min, geo_max = face_size_range(frame_width, self.camera)
+            min_face = min_face or geo_min
+            max_face = max_face or geo_max
+        return min_face, max_face
+
+    def _search(self, gray, scale, min_face, max_face, backend=None):
+        max_px = int(max_face * scale) if max_face else 0
+        return (backend or self.backend).detect(gray, int(min_face * scale), max_px)
+
+    def _search_tiled(self, gray, scale, min_face, max_face):
+        h, w = gray.shape[:2]
+        overlap = int(self.tile_overlap * scale) or int(max_face * scale) or self.tile_size // 4
+        tiles = tile_grid(w, h, self.tile_size, min(overlap, self.tile_size // 2))
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.tile_workers, thread_name_prefix='detect-tile')
+
+        def search(tile):
+            x0, y0, x1, y1 = tile
+            backend = self._tile_backends.get()
+            try:
+                boxes = self._search(gray[y0:y1, x0:x1], scale, min_face, max_face, backend)
+            finally:
+                self._tile_backends.put(backend)
+            boxes[:, 0] += x0
+            boxes[:, 1] += y0
+            return boxes
+
+        boxes = np.concatenate(list(self._pool.map(search, tiles)))
+        return non_max_suppression(np.round(boxes)).astype(np.float32)
+
+    def detect_full(self, gray):
+        """Full-frame sweep, returning int (x, y, w, h) boxes at full resolution"""
+        h, w = gray.shape[:2]
+        scale = min(1.0, self.detect_width / float(w)) if self.detect_width else 1.0
+        small = gray if scale == 1.0 else cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        min_face, max_face = self.size_range(w)
+        if self.tile_size and max(small.shape[:2]) > self.tile_size:
+            boxes = self._search_tiled(small, scale, min_face, max_face)
+        else:
+            boxes = self._search(small, scale, min_face, max_face)
+        return np.round(boxes / scale).astype(np.int32)
+
+    def detect_regions(self, gray, regions):
+        """Search only the given (x, y, w, h) regions expanded by ``roi_margin``"""
+        H, W = gray.shape[:2]
+        min_face, max_face = self.size_range(W)
+        found = []
+        for x, y, w, h in regions:
+            mx, my = int(w * self.roi_margin), int(h * self.roi_margin)
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            x1, y1 = min(W, x + w + mx), min(H, y + h + my)
+            crop = gray[y0:y1, x0:x1]
+            scale = min(1.0, self.detect_width / float(W)) if self.detect_width else 1.0
+            if scale < 1.0:
+                crop = cv2.resize(crop, (max(1, int(crop.shape[1] * scale)), max(1, int(crop.shape[0] * scale))),
+                                  interpolation=cv2.INTER_AREA)
+            if min(crop.shape[:2]) < CASCADE_WINDOW:
+                continue
+            boxes = self._search(crop, scale, min_face, max_face) / scale
+            boxes[:, 0] += x0
+            boxes[:, 1] += y0
+            found.append(boxes)
+        if not found:
+            return np.empty((0, 4), dtype=np.int32)
+        return non_max_suppression(np.round(np.concatenate(found)).astype(np.int32))
+
+    def detect(self, gray):
+        """Drop-in for ``facedetect.detectMultiScale(gray, 1.3, 5)``"""
+        full_sweep = (not self.roi or len(self.previous) == 0
+                      or self.frames % self.full_sweep_every == 0)
+        self.frames += 1
+        if full_sweep:
+            self.full_sweeps += 1
+            boxes = self.detect_full(gray)
+        else:
+            boxes = self.detect_regions(gray, self.previous)
+            if len(boxes) == 0:
+                self.full_sweeps += 1
+                boxes = self.detect_full(gray)
+        self.previous = boxes
+        return boxes
+
+
+def detector_from_config(config=None, **overrides):
+    """FaceDetector built from the ``detection`` and ``camera`` settings"""
+    config = config or load_config()
+    settings = dict(config['detection'])
+    settings.update(overrides)
+    return FaceDetector(camera=config['camera'], **settings)
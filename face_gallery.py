@@ -0,0 +1,621 @@
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+
+from file_lock import file_lock
+
+GALLERY_DIR = 'data/gallery'
+LEGACY_FACES_FILE = 'data/faces_data.pkl'
+LEGACY_NAMES_FILE = 'data/names.pkl'
+
+LABEL_TABLE_FILE = 'labels.json'
+MANIFEST_FILE = 'manifest.json'
+# the manifest a compaction replaced, for rollback
+PREVIOUS_MANIFEST_FILE = 'manifest.previous.json'
+SEGMENT_PATTERN = 'seg_*.faces.npy'
+QUARANTINE_DIR = 'quarantine'
+
+
+class GalleryData:
+    """Read-only view over every segment of the gallery"""
+
+    def __init__(self, segments, label_ids, label_table):
+        self.segments = segments
+        self.label_ids = label_ids
+        self.label_table = label_table
+
+    def __len__(self):
+        return len(self.label_ids)
+
+    @property
+    def faces(self):
+        """(n_samples, 7500) uint8 matrix; zero-copy when there is one segment"""
+        if len(self.segments) == 1:
+            return self.segments[0]
+        if not self.segments:
+            return np.empty((0, 0), dtype=np.uint8)
+        return np.concatenate(self.segments, axis=0)
+
+    def take(self, rows):
+        """Gather sorted row indices across segments without concatenating them"""
+        rows = np.asarray(rows)
+        offsets = np.cumsum([0] + [len(seg) for seg in self.segments])
+        seg_of_row = np.searchsorted(offsets, rows, side='right') - 1
+        out = np.empty((len(rows), self.segments[0].shape[1]), dtype=np.uint8)
+        for i, seg in enumerate(self.segments):
+            mask = seg_of_row == i
+            if mask.any():
+                out[mask] = seg[rows[mask] - offsets[i]]
+        return out
+
+    @property
+    def names(self):
+        """Per-sample name array, equivalent to the old names.pkl list"""
+        return np.asarray(self.label_table, dtype=object)[self.label_ids]
+
+    @property
+    def people(self):
+        """Names that have at least one sample in the gallery"""
+        return [self.label_table[i] for i in np.unique(self.label_ids)]
+
+
+class GalleryManifest:
+    """What the status pages need to know about the gallery, without opening it"""
+
+    def __init__(self, data):
+        self.data = data
+
+    @property
+    def version(self):
+        return self.data['version']
+
+    @property
+    def counts(self):
+        """Samples per identity, in enrollment order, leaving out removed people"""
+        return {name: info['samples'] for name, info in self.data['identities'].items()
+                if info['samples'] and 'removed_at' not in info}
+
+    @property
+    def people(self):
+        """Names that have at least one sample in the gallery and were not removed"""
+        return list(self.counts)
+
+    @property
+    def samples(self):
+        """Samples of people still enrolled (``shape`` also counts rows awaiting compaction)"""
+        return sum(self.counts.values())
+
+    @property
+    def removed(self):
+        """{name: removal time} of every tombstoned identity, compacted or not"""
+        return {name: info['removed_at'] for name, info in self.data['identities'].items() if 'removed_at' in info}
+
+    @property
+    def pending_removal(self):
+        """Removed people whose samples are still in the segments"""
+        return [name for name, info in self.data['identities'].items() if 'removed_at' in info and info['samples']]
+
+    @property
+    def shape(self):
+        return tuple(self.data['shape'])
+
+    @property
+    def dtype(self):
+        return self.data['dtype']
+
+    @property
+    def checksum(self):
+        return self.data['checksum']
+
+    @property
+    def updated_at(self):
+        return self.data['updated_at']
+
+    def enrolled_at(self, name):
+        """(first, last) enrollment time of ``name``"""
+        info = self.data['identities'].get(name)
+        return (info['first_enrolled'], info['last_enrolled']) if info else (None, None)
+
+
+def _fsync_dir(path):
+    # Makes the renames themselves durable; directories cannot be opened on Windows
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_atomic(path, write):
+    """Write through ``write(f)`` into a temp file, fsync it and rename it over ``path``"""
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _json_writer(data):
+    return lambda f: f.write(json.dumps(data, indent=2).encode())
+
+
+def _npy_header(path):
+    """(shape, dtype) from an .npy header without reading the array"""
+    with open(path, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+        return shape, dtype, f.tell()
+
+
+def _segment_checksum(faces, label_ids):
+    digest = hashlib.sha256(np.ascontiguousarray(faces).data)
+    digest.update(np.ascontiguousarray(label_ids, dtype=np.int32).data)
+    return digest.hexdigest()
+
+
+class FaceGallery:
+    """Append-only face gallery stored as memory-mappable .npy segments
+
+    Every enrollment writes one new segment pair next to the existing ones:
+    ``seg_<n>.faces.npy`` (uint8 samples) and ``seg_<n>.labels.npy`` (int32
+    label ids), plus the small ``labels.json`` table mapping ids to names.
+    Existing segments are never rewritten: ``remove`` only tombstones an
+    identity in the manifest, the recognizer masks its rows from then on,
+    and ``compact_gallery.purge_removed`` later rewrites the segments and
+    index without them.
+
+    ``manifest.json`` summarises the gallery: identities with their sample
+    counts and enrollment times, the (n_samples, dim) shape, dtype, a
+    version bumped on every change and a checksum chained over the segment
+    hashes. It is replaced atomically after each append, so status pages
+    read it instead of the face matrix.
+
+    Appends are transactional: the segment files and ``labels.json`` are
+    written to temp files, fsynced and renamed into place, and the
+    manifest rename is the commit. ``load`` opens only the segments the
+    manifest lists, so a crash mid-append leaves stray files (see
+    ``uncommitted_files``/``repair``) but never a half-enrolled gallery.
+    Every manifest change runs under ``lock()`` (``<root>.lock``), so
+    processes enrolling, removing or compacting at once never overwrite
+    each other's commits.
+    """
+
+    def __init__(self, root=GALLERY_DIR):
+        self.root = root
+        # Threads sharing this instance queue here; the file lock orders processes
+        self._guard = threading.RLock()
+        self._depth = 0
+
+    @contextlib.contextmanager
+    def lock(self):
+        """Exclusive across threads and processes while a change is chosen and committed; reentrant per thread"""
+        with self._guard:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                return
+            with file_lock(f"{os.path.normpath(self.root)}.lock"):
+                self._depth = 1
+                try:
+                    yield
+                finally:
+                    self._depth = 0
+
+    def exists(self):
+        return os.path.exists(self._manifest_path()) or bool(self._segment_ids())
+
+    def fingerprint(self):
+        """Cheap identifier of the gallery contents, taken from the manifest"""
+        manifest = self.manifest()
+        # Content only: tombstones bump the version but leave the index valid
+        return f"{manifest.shape[0]}:{manifest.checksum[:16]}"
+
+    def manifest_stamp(self):
+        """Changes whenever the manifest is rewritten; None without one"""
+        try:
+            return os.stat(self._manifest_path()).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def tombstones(self):
+        """Names whose rows must not be matched any more"""
+        return set(self.manifest().removed)
+
+    def _segment_ids(self):
+        ids = []
+        for path in glob.glob(os.path.join(self.root, SEGMENT_PATTERN)):
+            stem = os.path.basename(path).split('.')[0]
+            ids.append(int(stem.split('_')[1]))
+        return sorted(ids)
+
+    def _segment_paths(self, seg_id):
+        stem = os.path.join(self.root, f"seg_{seg_id:06d}")
+        return f"{stem}.faces.npy", f"{stem}.labels.npy"
+
+    def load_label_table(self):
+        path = os.path.join(self.root, LABEL_TABLE_FILE)
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r') as f:
+            return json.load(f)['names']
+
+    def _save_label_table(self, names):
+        _write_atomic(os.path.join(self.root, LABEL_TABLE_FILE), _json_writer({'names': names}))
+
+    def _manifest_path(self):
+        return os.path.join(self.root, MANIFEST_FILE)
+
+    def _save_manifest(self, data):
+        _write_atomic(self._manifest_path(), _json_writer(data))
+        _fsync_dir(self.root)
+
+    def _empty_manifest(self):
+        now = time.strftime('%Y-%m-%dT%H:%M:%S')
+        return {'version': 0, 'shape': [0, 0], 'dtype': 'uint8', 'identities': {}, 'segments': [],
+                'checksum': hashlib.sha256().hexdigest(), 'created_at': now, 'updated_at': now}
+
+    @staticmethod
+    def _add_to_manifest(data, seg_id, faces, label_ids, table, checksum, when):
+        data['version'] += 1
+        data['shape'] = [data['shape'][0] + len(faces), faces.shape[1]]
+        data['dtype'] = str(faces.dtype)
+        data['segments'].append({'id': seg_id, 'samples': len(faces), 'checksum': checksum})
+        data['checksum'] = hashlib.sha256((data['checksum'] + checksum).encode()).hexdigest()
+        data['updated_at'] = when
+        ids, counts = np.unique(label_ids, return_counts=True)
+        for label_id, count in zip(ids, counts):
+            info = data['identities'].setdefault(
+                table[label_id], {'samples': 0, 'first_enrolled': when, 'last_enrolled': when})
+            if 'removed_at' in info:
+                # Re-enrolled after their old samples were compacted away
+                info.pop('removed_at')
+                info.pop('purged_at', None)
+                info['first_enrolled'] = when
+            info['samples'] += int(count)
+            info['last_enrolled'] = when
+
+    def rebuild_manifest(self, seg_ids=None):
+        """Recreate manifest.json from ``seg_ids`` (default: every segment, for galleries written before it existed)"""
+        data = self._empty_manifest()
+        table = self.load_label_table()
+        for seg_id in (self._segment_ids() if seg_ids is None else seg_ids):
+            faces_path, labels_path = self._segment_paths(seg_id)
+            faces = np.load(faces_path, mmap_mode='r')
+            label_ids = np.load(labels_path)
+            when = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(os.path.getmtime(faces_path)))
+            self._add_to_manifest(data, seg_id, faces, label_ids, table, _segment_checksum(faces, label_ids), when)
+        self._save_manifest(data)
+        return GalleryManifest(data)
+
+    def manifest(self):
+        """The gallery manifest, rebuilt once if missing"""
+        try:
+            with open(self._manifest_path(), 'r') as f:
+                return GalleryManifest(json.load(f))
+        except FileNotFoundError:
+            if not self.exists():
+                return GalleryManifest(self._empty_manifest())
+            return self.rebuild_manifest()
+
+    def append(self, faces, names):
+        """Append samples as a new segment and return its id
+
+        ``names`` is either one name for the whole batch or one per row.
+        """
+        faces = np.asarray(faces)
+        if faces.dtype != np.uint8:
+            faces = np.clip(faces, 0, 255).astype(np.uint8)
+        faces = faces.reshape(len(faces), -1)
+        if isinstance(names, str):
+            names = [names] * len(faces)
+        if len(names) != len(faces):
+            raise ValueError(f"Got {len(faces)} samples but {len(names)} names")
+
+        os.makedirs(self.root, exist_ok=True)
+        # Choosing the segment id and rewriting the manifest must not interleave with another writer
+        with self.lock():
+            manifest = self.manifest()
+            pending = set(manifest.pending_removal) & set(names)
+            if pending:
+                raise ValueError(f"{', '.join(sorted(pending))} awaiting removal; "
+                                 "run python compact_gallery.py --purge first")
+            manifest = manifest.data
+            table = self.load_label_table()
+            index = {name: i for i, name in enumerate(table)}
+            for name in names:
+                if name not in index:
+                    index[name] = len(table)
+                    table.append(name)
+            label_ids = np.fromiter((index[n] for n in names), dtype=np.int32, count=len(names))
+
+            # Never reuse an id, not even one left uncommitted by a crash
+            seg_ids = self._segment_ids() + [seg['id'] for seg in manifest['segments']]
+            seg_id = max(seg_ids) + 1 if seg_ids else 1
+            faces_path, labels_path = self._segment_paths(seg_id)
+            _write_atomic(faces_path, lambda f: np.save(f, faces))
+            _write_atomic(labels_path, lambda f: np.save(f, label_ids))
+            self._save_label_table(table)
+            # The manifest is the commit point: load() only opens the segments it lists
+            self._add_to_manifest(manifest, seg_id, faces, label_ids, table, _segment_checksum(faces, label_ids),
+                                  time.strftime('%Y-%m-%dT%H:%M:%S'))
+            self._save_manifest(manifest)
+        return seg_id
+
+    def remove(self, name):
+        """Tombstone ``name``: one manifest rewrite, no segment is touched
+
+        Returns False if they were already removed.
+        """
+        with self.lock():
+            data = self.manifest().data
+            info = data['identities'].get(name)
+            if info is None or not info['samples']:
+                raise ValueError(f"{name} is not enrolled in the gallery")
+            if 'removed_at' in info:
+                return False
+            info['removed_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+            data['version'] += 1
+            data['updated_at'] = info['removed_at']
+            self._save_manifest(data)
+        return True
+
+    def inherit_manifest(self, previous):
+        """Carry enrollment times, removals and the version over from the gallery this one rewrites"""
+        with self.lock():
+            data = self.manifest().data
+            now = time.strftime('%Y-%m-%dT%H:%M:%S')
+            for name, info in previous.data['identities'].items():
+                if name in data['identities']:
+                    current = data['identities'][name]
+                    current.update(first_enrolled=info['first_enrolled'], last_enrolled=info['last_enrolled'])
+                    # Removed but not purged yet (a repair keeps their rows): still masked
+                    current.update({key: info[key] for key in ('removed_at', 'purged_at') if key in info})
+                elif 'removed_at' in info:
+                    # Kept (with no samples) so recognizers still on the old index keep masking them
+                    data['identities'][name] = {**info, 'samples': 0, 'purged_at': info.get('purged_at', now)}
+            data['version'] = previous.version + 1
+            data['created_at'] = previous.data['created_at']
+            data['retired'] = previous.data.get('retired', [])
+            data['updated_at'] = now
+            self._save_manifest(data)
+
+    def _check_segment(self, seg, dim, deep):
+        """Why a committed segment cannot be trusted, or None"""
+        faces_path, labels_path = self._segment_paths(seg['id'])
+        try:
+            shape, dtype, header = _npy_header(faces_path)
+            label_shape, label_dtype, label_header = _npy_header(labels_path)
+        except (OSError, ValueError) as e:
+            return f"unreadable ({e})"
+        expected = (seg['samples'], dim)
+        if shape != expected or label_shape != (seg['samples'],):
+            return f"holds {shape} faces and {label_shape} labels, manifest says {expected}"
+        if (os.path.getsize(faces_path) != header + dtype.itemsize * shape[0] * shape[1]
+                or os.path.getsize(labels_path) != label_header + label_dtype.itemsize * shape[0]):
+            return "truncated"
+        if deep and _segment_checksum(np.load(faces_path, mmap_mode='r'), np.load(labels_path)) != seg['checksum']:
+            return "checksum mismatch"
+        return None
+
+    def validate(self, deep=False):
+        """{segment id: problem} for the committed gallery (empty when it is sound)
+
+        The default check reads only the manifest and each segment's .npy
+        header and file size, so its cost does not grow with the number of
+        samples. ``deep`` also re-hashes every segment against its checksum.
+        """
+        manifest = self.manifest()
+        problems = {}
+        for seg in manifest.data['segments']:
+            problem = self._check_segment(seg, manifest.shape[1], deep)
+            if problem:
+                problems[seg['id']] = problem
+        total = sum(seg['samples'] for seg in manifest.data['segments'])
+        if total != manifest.shape[0]:
+            problems[None] = f"segments hold {total} samples, manifest says {manifest.shape[0]}"
+        return problems
+
+    def _previous_manifest(self):
+        try:
+            with open(os.path.join(self.root, PREVIOUS_MANIFEST_FILE), 'r') as f:
+                return GalleryManifest(json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def _referenced_ids(self, data):
+        """Segment ids the manifest ``data`` commits, retires or keeps for rollback"""
+        previous = self._previous_manifest()
+        ids = {seg['id'] for seg in data['segments']} | set(data.get('retired', []))
+        if previous is not None:
+            ids |= {seg['id'] for seg in previous.data['segments']}
+        return ids
+
+    def commit_rewrite(self, staged, expected_version, keep_previous=False):
+        """Replace every committed segment with those of the gallery ``staged`` in one manifest commit
+
+        ``staged`` must have been written with this gallery's label table.
+        Its segment files are moved in under fresh ids and its manifest
+        becomes this one; no file a reader may have mapped is renamed. The
+        replaced segments are listed as ``retired`` and deleted by
+        ``prune`` (on Windows only once nothing maps them). With
+        ``keep_previous`` they are kept, with the old manifest, for
+        ``rollback``. Raises RuntimeError if this gallery is no longer at
+        ``expected_version``.
+        """
+        with self.lock():
+            current = self.manifest()
+            if current.version != expected_version:
+                raise RuntimeError("Gallery changed during compaction; run it again")
+            if staged.load_label_table() != self.load_label_table():
+                raise ValueError(f"{staged.root} was not written with the label table of {self.root}")
+            data = staged.manifest().data
+            previous = self._previous_manifest()
+            retired = set(current.data.get('retired', [])) | {seg['id'] for seg in current.data['segments']}
+            if previous is not None:
+                retired |= {seg['id'] for seg in previous.data['segments']}
+            next_id = max(self._segment_ids() + sorted(self._referenced_ids(current.data)) + [0]) + 1
+            for seg in data['segments']:
+                for src, dst in zip(staged._segment_paths(seg['id']), self._segment_paths(next_id)):
+                    os.replace(src, dst)
+                seg['id'] = next_id
+                next_id += 1
+            previous_path = os.path.join(self.root, PREVIOUS_MANIFEST_FILE)
+            if keep_previous:
+                _write_atomic(previous_path, _json_writer(current.data))
+                retired -= {seg['id'] for seg in current.data['segments']}
+            elif previous is not None:
+                os.remove(previous_path)
+            data['retired'] = sorted(retired)
+            self._save_manifest(data)
+        self.prune()
+
+    def rollback(self):
+        """Recommit the segments a compaction replaced; returns when that manifest was written, or None"""
+        with self.lock():
+            previous = self._previous_manifest()
+            if previous is None:
+                return None
+            for seg in previous.data['segments']:
+                missing = [path for path in self._segment_paths(seg['id']) if not os.path.exists(path)]
+                if missing:
+                    raise FileNotFoundError(f"Cannot roll back: {missing[0]} is gone")
+            current = self.manifest()
+            data = previous.data
+            now = time.strftime('%Y-%m-%dT%H:%M:%S')
+            for name, removed_at in current.removed.items():
+                if name in data['identities']:
+                    # Removed after the compaction: stay removed
+                    data['identities'][name]['removed_at'] = removed_at
+            kept = {seg['id'] for seg in data['segments']}
+            data['retired'] = sorted((set(current.data.get('retired', []))
+                                      | {seg['id'] for seg in current.data['segments']}) - kept)
+            data['version'] = current.version + 1
+            data['updated_at'] = now
+            self._save_manifest(data)
+            os.remove(os.path.join(self.root, PREVIOUS_MANIFEST_FILE))
+        self.prune()
+        return previous.updated_at
+
+    def prune(self):
+        """Delete retired segments; returns how many are still waiting (mapped by another process)"""
+        with self.lock():
+            data = self.manifest().data
+            retired = data.get('retired', [])
+            if not retired:
+                return 0
+            left = []
+            for seg_id in retired:
+                try:
+                    for path in self._segment_paths(seg_id):
+                        if os.path.exists(path):
+                            os.remove(path)
+                except OSError:
+                    left.append(seg_id)
+            if left != retired:
+                data['retired'] = left
+                self._save_manifest(data)
+        return len(left)
+
+    def uncommitted_files(self):
+        """Temp files and segments written by an append that never reached the manifest"""
+        committed = self._referenced_ids(self.manifest().data)
+        stray = glob.glob(os.path.join(self.root, '*.tmp'))
+        for seg_id in self._segment_ids():
+            if seg_id not in committed:
+                stray.extend(self._segment_paths(seg_id))
+        return [path for path in stray if os.path.exists(path)]
+
+    def repair(self, deep=True):
+        """Move uncommitted and damaged files to ``quarantine/`` and recommit the rest
+
+        Returns the quarantined paths. The manifest is rebuilt from the
+        segments left, keeping enrollment times, removals and the version.
+        """
+        # Under the lock no append is mid-way, so every temp file really is abandoned
+        with self.lock():
+            previous = self.manifest()
+            damaged = self.validate(deep)
+            moved = self.uncommitted_files()
+            for seg_id in damaged:
+                if seg_id is not None:
+                    moved.extend(path for path in self._segment_paths(seg_id) if os.path.exists(path))
+            if not moved and not damaged:
+                return []
+            quarantine = os.path.join(self.root, QUARANTINE_DIR, time.strftime('%Y%m%d-%H%M%S'))
+            os.makedirs(quarantine, exist_ok=True)
+            for path in moved:
+                os.replace(path, os.path.join(quarantine, os.path.basename(path)))
+            self.rebuild_manifest([seg['id'] for seg in previous.data['segments'] if seg['id'] not in damaged])
+            self.inherit_manifest(previous)
+        return moved
+
+    def load(self, mmap=True):
+        """Open every committed segment, memory-mapped by default"""
+        committed = self.manifest().data['segments']
+        if not committed:
+            raise FileNotFoundError(f"No face gallery found in {self.root}")
+
+        mode = 'r' if mmap else None
+        segments, labels = [], []
+        for seg in committed:
+            faces_path, labels_path = self._segment_paths(seg['id'])
+            faces = np.load(faces_path, mmap_mode=mode)
+            seg_labels = np.load(labels_path)
+            if not len(faces) == len(seg_labels) == seg['samples']:
+                raise ValueError(f"Segment {seg['id']} has {len(faces)} samples and {len(seg_labels)} labels, "
+                                 f"manifest says {seg['samples']}; run python fix_data.py")
+            segments.append(faces)
+            labels.append(seg_labels)
+
+        label_ids = np.concatenate(labels) if labels else np.empty(0, dtype=np.int32)
+        return GalleryData(segments, label_ids, self.load_label_table())
+
+    def migrate_legacy(self, faces_file=LEGACY_FACES_FILE, names_file=LEGACY_NAMES_FILE):
+        """Import faces_data.pkl / names.pkl as the first segment"""
+        if self.exists():
+            return False
+        if not (os.path.exists(faces_file) and os.path.exists(names_file)):
+            return False
+        with open(names_file, 'rb') as f:
+            names = pickle.load(f)
+        with open(faces_file, 'rb') as f:
+            faces = pickle.load(f)
+        n = min(len(faces), len(names))
+        self.append(np.asarray(faces)[:n], list(names)[:n])
+        print(f"✅ Migrated {n} legacy face samples into {self.root}")
+        return True
+
+
+def load_manifest(root=GALLERY_DIR):
+    """Gallery summary for status pages, migrating the legacy pickle files on first use"""
+    gallery = FaceGallery(root)
+    if not gallery.exists():
+        gallery.migrate_legacy()
+    return gallery.manifest()
+
+
+def load_gallery(root=GALLERY_DIR, mmap=True):
+    """Open the gallery, migrating the legacy pickle files on first use"""
+    gallery = FaceGallery(root)
+    if not gallery.exists():
+        gallery.migrate_legacy()
+    return gallery.load(mmap=mmap)
@@ -0,0 +1,156 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from config import load_config
+
+PROJECTION_FILE = 'projection.npz'
+MAX_FIT_SAMPLES = 5000
+METHODS = ('none', 'pca', 'lda')
+
+
+class FaceProjection:
+    """Eigenfaces (PCA) / Fisherfaces (PCA + LDA) projection of raw face crops
+
+    ``transform`` maps (n, 7500) uint8 pixel rows to compact float32
+    descriptors. With ``method='none'`` rows are only mean-centred, which
+    keeps the raw-pixel behaviour. LDA yields at most ``n_people - 1``
+    dimensions whatever ``n_components`` asks for.
+    """
+
+    def __init__(self, method='pca', n_components=128):
+        if method not in METHODS:
+            raise ValueError(f"Unknown projection method '{method}', expected one of {METHODS}")
+        self.method = method
+        self.n_components = n_components
+        self.mean = None
+        self.components = None
+
+    @property
+    def output_dim(self):
+        return len(self.mean) if self.components is None else self.components.shape[1]
+
+    def fit(self, X, label_ids=None, max_samples=MAX_FIT_SAMPLES, seed=0):
+        """Fit on (a random subsample of) the gallery rows"""
+        if len(X) > max_samples:
+            rows = np.sort(np.random.default_rng(seed).choice(len(X), max_samples, replace=False))
+            X = X[rows]
+            label_ids = label_ids[rows] if label_ids is not None else None
+        X = np.asarray(X, dtype=np.float32).reshape(len(X), -1)
+        self.mean = X.mean(axis=0)
+        if self.method == 'none':
+            self.components = None
+            return self
+
+        Xc = X - self.mean
+        _, s, vt = np.linalg.svd(Xc, full_matrices=False)
+        rank = int((s > s[0] * 1e-6).sum()) if len(s) else 0
+
+        if self.method == 'pca':
+            self.components = np.ascontiguousarray(vt[:min(self.n_components, rank)].T)
+            return self
+
+        if label_ids is None:
+            raise ValueError("LDA projection needs label ids")
+        classes = np.unique(label_ids)
+        # Project to the PCA subspace first so the within-class scatter is invertible
+        n_pca = max(1, min(rank, len(X) - len(classes)))
+        P = vt[:n_pca].T
+        Y = Xc @ P
+        Sw = np.zeros((n_pca, n_pca), dtype=np.float64)
+        Sb = np.zeros((n_pca, n_pca), dtype=np.float64)
+        for c in classes:
+            Yc = Y[label_ids == c]
+            mu = Yc.mean(axis=0)
+            D = Yc - mu
+            Sw += D.T @ D
+            Sb += len(Yc) * np.outer(mu, mu)
+        evals, evecs = np.linalg.eigh(Sw)
+        W = evecs / np.sqrt(np.maximum(evals, evals.max() * 1e-6))
+        evals_b, evecs_b = np.linalg.eigh(W.T @ Sb @ W)
+        k = min(self.n_components, len(classes) - 1, n_pca)
+        top = np.argsort(evals_b)[::-1][:max(k, 1)]
+        self.components = np.ascontiguousarray((P @ W @ evecs_b[:, top]).astype(np.float32))
+        return self
+
+    def transform(self, X):
+        Xc = np.asarray(X, dtype=np.float32).reshape(len(X), -1) - self.mean
+        return Xc if self.components is None else Xc @ self.components
+
+    def save(self, directory):
+        arrays = {'mean': self.mean}
+        if self.components is not None:
+            arrays['components'] = self.components
+        np.savez(os.path.join(directory, PROJECTION_FILE),
+                 method=self.method, n_components=self.n_components, **arrays)
+
+    @classmethod
+    def load(cls, directory):
+        with np.load(os.path.join(directory, PROJECTION_FILE)) as data:
+            projection = cls(str(data['method']), int(data['n_components']))
+            projection.mean = data['mean']
+            projection.components = data['components'] if 'components' in data else None
+        return projection
+
+
+def projection_from_config(config=None):
+    recognition = (config or load_config())['recognition']
+    return FaceProjection(recognition['projection'], recognition['n_components'])
+
+
+def _knn_labels(train, train_labels, test, k):
+    d2 = (test * test).sum(axis=1)[:, None] + (train * train).sum(axis=1)[None, :] - 2.0 * (test @ train.T)
+    neighbours = np.argpartition(d2, min(k, len(train) - 1), axis=1)[:, :k]
+    votes = np.zeros((len(test), train_labels.max() + 1), dtype=np.int32)
+    np.add.at(votes, (np.arange(len(test))[:, None], train_labels[neighbours]), 1)
+    return votes.argmax(axis=1)
+
+
+def evaluate(gallery, n_components_list=(64, 128, 256), test_fraction=0.2, k=5, seed=0):
+    """Hold out a slice of every identity and compare projections against raw pixels"""
+    rng = np.random.default_rng(seed)
+    label_ids = gallery.label_ids
+    test_mask = np.zeros(len(label_ids), dtype=bool)
+    for c in np.unique(label_ids):
+        rows = np.flatnonzero(label_ids == c)
+        test_mask[rng.choice(rows, max(1, int(len(rows) * test_fraction)), replace=False)] = True
+    faces = np.asarray(gallery.faces)
+    X_train, X_test = faces[~test_mask], faces[test_mask]
+    y_train, y_test = label_ids[~test_mask], label_ids[test_mask]
+
+    runs = [('none', None)]
+    runs += [(method, n) for method in ('pca', 'lda') for n in n_components_list]
+    results = []
+    for method, n in runs:
+        projection = FaceProjection(method, n or 0).fit(X_train, y_train)
+        train = projection.transform(X_train)
+        test = projection.transform(X_test)
+        start = time.perf_counter()
+        predicted = _knn_labels(train, y_train, test, k)
+        query_ms = (time.perf_counter() - start) * 1000 / max(len(test), 1)
+        results.append({
+            'method': method,
+            'dims': projection.output_dim,
+            'accuracy': float((predicted == y_test).mean()),
+            'bytes_per_sample': projection.output_dim * 4,
+            'query_ms': query_ms,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    from face_gallery import load_gallery
+
+    parser = argparse.ArgumentParser(description="Compare PCA/LDA descriptors against the raw-pixel baseline")
+    parser.add_argument('--dims', type=int, nargs='+', default=[64, 128, 256])
+    parser.add_argument('--test-fraction', type=float, default=0.2)
+    args = parser.parse_args()
+
+    rows = evaluate(load_gallery(), args.dims, args.test_fraction)
+    baseline = rows[0]['accuracy']
+    print(f"{'method':<8}{'dims':>6}{'accuracy':>10}{'vs raw':>9}{'bytes/row':>11}{'ms/query':>10}")
+    for row in rows:
+        print(f"{row['method']:<8}{row['dims']:>6}{row['accuracy']:>10.3f}"
+              f"{row['accuracy'] - baseline:>+9.3f}{row['bytes_per_sample']:>11}{row['query_ms']:>10.3f}")
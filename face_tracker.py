@@ -0,0 +1,200 @@
+import collections
+import itertools
+
+import cv2
+import numpy as np
+
+from config import load_config
+from recognition_engine import RecognitionResult, UNKNOWN
+
+
+def iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = iw * ih
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    """One face followed across frames, with its identity vote history"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, box, history):
+        self.id = next(self._ids)
+        self.box = tuple(int(v) for v in box)
+        self.votes = collections.deque(maxlen=history)
+        self.confidences = collections.deque(maxlen=history)
+        self.identity = None
+        self.recognized_box = None
+        self.template = None
+        self.misses = 0
+        self.lost = False
+
+    def forget_identity(self):
+        """Drop the converged identity and its votes so the face is recognized afresh"""
+        self.votes.clear()
+        self.confidences.clear()
+        self.identity = None
+        self.recognized_box = None
+
+    def add_vote(self, label, confidence, known):
+        self.votes.append(label if known else UNKNOWN)
+        self.confidences.append(float(confidence))
+
+    def leader(self):
+        """Most voted label and its share of the history"""
+        if not self.votes:
+            return UNKNOWN, 0.0
+        label, count = collections.Counter(self.votes).most_common(1)[0]
+        return label, count / len(self.votes)
+
+
+class FaceTracker:
+    """IoU multi-face tracker that gates detection and recognition
+
+    The cascade only runs every ``detect_every`` frames or when a track is
+    lost; in between, boxes are refined by template matching. A track is
+    recognized until ``converge_votes`` recent votes agree at
+    ``converge_ratio`` or more, and again only when its box drifts below
+    ``drift_iou`` from where it was last recognized, or when the engine's
+    removed identities change (so a person removed while in view loses
+    their label on the next frame).
+    """
+
+    def __init__(self, detect_every=5, iou_threshold=0.3, max_misses=2, history=10,
+                 converge_votes=5, converge_ratio=0.8, drift_iou=0.5, template_threshold=0.5):
+        self.detect_every = detect_every
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.history = history
+        self.converge_votes = converge_votes
+        self.converge_ratio = converge_ratio
+        self.drift_iou = drift_iou
+        self.template_threshold = template_threshold
+        self.tracks = []
+        self.frame_count = 0
+        self.detections = 0
+        self.recognitions = 0
+        self.tombstone_version = None
+
+    def _associate(self, boxes):
+        """Greedy highest-IoU matching of detections to existing tracks"""
+        pairs = sorted(
+            ((iou(track.box, box), t, d) for t, track in enumerate(self.tracks) for d, box in enumerate(boxes)),
+            reverse=True)
+        matched_tracks, matched_boxes = set(), set()
+        for score, t, d in pairs:
+            if score < self.iou_threshold:
+                break
+            if t in matched_tracks or d in matched_boxes:
+                continue
+            matched_tracks.add(t)
+            matched_boxes.add(d)
+            self.tracks[t].box = tuple(int(v) for v in boxes[d])
+            self.tracks[t].misses = 0
+            self.tracks[t].lost = False
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        for d, box in enumerate(boxes):
+            if d not in matched_boxes:
+                self.tracks.append(Track(box, self.history))
+
+    def _refine(self, gray, track):
+        """Follow a track between detections by matching its last appearance"""
+        if track.template is None:
+            return
+        x, y, w, h = track.box
+        H, W = gray.shape[:2]
+        x0, y0 = max(0, x - w // 2), max(0, y - h // 2)
+        x1, y1 = min(W, x + w + w // 2), min(H, y + h + h // 2)
+        window = gray[y0:y1, x0:x1]
+        if window.shape[0] < h or window.shape[1] < w:
+            track.lost = True
+            return
+        scores = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+        _, best, _, (dx, dy) = cv2.minMaxLoc(scores)
+        if best < self.template_threshold:
+            track.lost = True
+        else:
+            track.box = (x0 + dx, y0 + dy, w, h)
+
+    def _needs_recognition(self, track):
+        if track.identity is None:
+            return True
+        return track.recognized_box is None or iou(track.box, track.recognized_box) < self.drift_iou
+
+    def update(self, frame, gray, detect, engine):
+        """Advance one frame; returns boxes and a RecognitionResult covering every track"""
+        run_detection = (self.frame_count % self.detect_every == 0 or not self.tracks
+                         or any(track.lost for track in self.tracks))
+        self.frame_count += 1
+        if run_detection:
+            self.detections += 1
+            self._associate(list(detect(gray)))
+        else:
+            # Lost tracks are re-associated by the detection this triggers next frame
+            for track in self.tracks:
+                self._refine(gray, track)
+
+        for track in self.tracks:
+            x, y, w, h = track.box
+            if run_detection or track.template is None:
+                track.template = gray[y:y+h, x:x+w].copy()
+
+        engine.refresh_tombstones()
+        if engine.tombstone_version != self.tombstone_version:
+            if self.tombstone_version is not None:
+                for track in self.tracks:
+                    track.forget_identity()
+            self.tombstone_version = engine.tombstone_version
+
+        pending = [track for track in self.tracks if self._needs_recognition(track)]
+        if pending:
+            self.recognitions += len(pending)
+            result = engine.recognize_frame(frame, [track.box for track in pending])
+            for track, label, confidence, known in zip(pending, result.labels, result.confidence, result.known):
+                track.add_vote(label, confidence, known)
+                track.recognized_box = track.box
+                leader, share = track.leader()
+                converged = len(track.votes) >= self.converge_votes and share >= self.converge_ratio
+                track.identity = leader if converged else None
+
+        return self._result()
+
+    def _result(self):
+        boxes = [track.box for track in self.tracks]
+        labels, confidence = [], []
+        for track in self.tracks:
+            leader, _ = track.leader()
+            labels.append(track.identity or leader)
+            confidence.append(np.mean(track.confidences) if track.confidences else 0.0)
+        labels = np.asarray(labels, dtype=object)
+        confidence = np.asarray(confidence, dtype=np.float32)
+        known = labels != UNKNOWN
+        result = RecognitionResult(boxes, labels, None, None, None, known, confidence)
+        result.track_ids = [track.id for track in self.tracks]
+        return boxes, result
+
+    def stats(self):
+        frames = max(self.frame_count, 1)
+        return {
+            'frames': self.frame_count,
+            'tracks': len(self.tracks),
+            'detect_ratio': round(self.detections / frames, 3),
+            'recognitions_per_frame': round(self.recognitions / frames, 3),
+        }
+
+
+def tracker_from_config(config=None):
+    """FaceTracker built from the ``tracking`` settings, or None when disabled"""
+    settings = dict((config or load_config())['tracking'])
+    if not settings.pop('enabled'):
+        return None
+    return FaceTracker(**settings)
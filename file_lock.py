@@ -0,0 +1,73 @@
+import contextlib
+import os
+import time
+
+# a lock file older than this is assumed left behind by a process that died
+STALE_SECONDS = 600
+
+
+def pid_alive(pid):
+    """Whether process ``pid`` is still running (checked without signalling it)"""
+    if pid == os.getpid():
+        return True
+    if os.name == 'nt':
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        # PROCESS_QUERY_LIMITED_INFORMATION; os.kill would terminate the process here
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            # Access denied still means the process exists
+            return kernel32.GetLastError() == 5
+        code = ctypes.c_ulong()
+        try:
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        finally:
+            kernel32.CloseHandle(handle)
+        return code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _holder_gone(path, stale_seconds):
+    """True when the lock at ``path`` is stale or its holder has exited"""
+    if time.time() - os.path.getmtime(path) > stale_seconds:
+        return True
+    with open(path, 'r') as f:
+        owner = f.read().strip()
+    # Empty while the holder is still writing its pid
+    return owner.isdigit() and not pid_alive(int(owner))
+
+
+@contextlib.contextmanager
+def file_lock(path, stale_seconds=STALE_SECONDS, poll=0.05):
+    """Hold ``path`` as an exclusive lock file across processes, waiting for the current holder"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if _holder_gone(path, stale_seconds):
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            except PermissionError:
+                # Windows: the holder is deleting it right now
+                pass
+            time.sleep(poll)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
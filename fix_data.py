@@ -1,69 +1,44 @@
-import pickle
-import numpy as np
-import os
-
-print("Fixing face recognition data...")
-
-# Load existing data
-with open('data/faces_data.pkl', 'rb') as f:
-    faces = pickle.load(f)
-
-with open('data/names.pkl', 'rb') as f:
-    names = pickle.load(f)
-
-print(f"Original - Faces: {faces.shape}, Names: {len(names)}")
-print(f"Unique names: {set(names)}")
-
-# Clean names - remove any corrupted entries
-clean_names = []
-valid_names = {'Pragati', 'Anshita', 'Akshita', 'Shivi'}  # Add other valid names here
-
-for name in names:
-    if isinstance(name, str) and name in valid_names:
-        clean_names.append(name)
-
-print(f"Clean names length: {len(clean_names)}")
-print(f"Clean unique names: {set(clean_names)}")
-
-# Determine the minimum length to match
-min_length = min(len(faces), len(clean_names))
-print(f"Using minimum length: {min_length}")
-
-# Truncate both to the same length
-faces_fixed = faces[:min_length]
-names_fixed = clean_names[:min_length]
-
-print(f"Fixed - Faces: {faces_fixed.shape}, Names: {len(names_fixed)}")
-
-# Backup original files
-if not os.path.exists('data/backup/'):
-    os.makedirs('data/backup/')
-
-# Backup
-with open('data/backup/faces_data_backup.pkl', 'wb') as f:
-    pickle.dump(faces, f)
-with open('data/backup/names_backup.pkl', 'wb') as f:
-    pickle.dump(names, f)
-
-# Save fixed data
-with open('data/faces_data.pkl', 'wb') as f:
-    pickle.dump(faces_fixed, f)
-
-with open('data/names.pkl', 'wb') as f:
-    pickle.dump(names_fixed, f)
-
-print("✅ Data fixed successfully!")
-print(f"✅ Final - Faces: {faces_fixed.shape}, Names: {len(names_fixed)}")
-print("✅ Original data backed up to data/backup/")
-
-# Verify the fix
-with open('data/faces_data.pkl', 'rb') as f:
-    test_faces = pickle.load(f)
-with open('data/names.pkl', 'rb') as f:
-    test_names = pickle.load(f)
-
-print(f"✅ Verification - Faces: {test_faces.shape}, Names: {len(test_names)}")
-if len(test_faces) == len(test_names):
-    print("✅ Data is now synchronized!")
-else:
-    print("❌ Still mismatched - manual intervention needed")
+import argparse
+import time
+
+from face_gallery import GALLERY_DIR, QUARANTINE_DIR, FaceGallery
+from recognition_index import publish_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the face gallery against its manifest and repair it")
+    parser.add_argument('--quick', action='store_true',
+                        help="check .npy headers and sizes only (what startup does), skip the checksums")
+    parser.add_argument('--check', action='store_true', help="report only, do not repair")
+    args = parser.parse_args()
+
+    gallery = FaceGallery(GALLERY_DIR)
+    if not gallery.exists() and not gallery.migrate_legacy():
+        print(f"📝 No face gallery in {GALLERY_DIR}")
+        return
+
+    start = time.time()
+    manifest = gallery.manifest()
+    problems = gallery.validate(deep=not args.quick)
+    stray = gallery.uncommitted_files()
+    print(f"🔍 Checked {len(manifest.data['segments'])} segments ({manifest.samples} samples, "
+          f"{len(manifest.people)} people) in {time.time() - start:.2f}s")
+    for seg_id, problem in problems.items():
+        print(f"❌ Segment {seg_id}: {problem}" if seg_id is not None else f"❌ {problem}")
+    for path in stray:
+        print(f"⚠️ Uncommitted: {path}")
+    if not problems and not stray:
+        print("✅ Gallery matches its manifest")
+        return
+    if args.check:
+        return
+
+    moved = gallery.repair(deep=not args.quick)
+    manifest = gallery.manifest()
+    print(f"🧹 Moved {len(moved)} files to {GALLERY_DIR}/{QUARANTINE_DIR}/")
+    print(f"✅ Gallery recommitted: {manifest.samples} samples, {len(manifest.people)} people")
+    publish_index()
+
+
+if __name__ == "__main__":
+    main()
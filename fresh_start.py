@@ -1,7 +1,9 @@
 import pickle
 import numpy as np
 import os
+import shutil
 from datetime import datetime
+from face_gallery import GALLERY_DIR
 
 print("🗑️  Starting Fresh Face Recognition Setup...")
 print("=" * 50)
@@ -29,6 +31,11 @@ if os.path.exists('data/names.pkl'):
     print(f"✅ Names data backed up: {len(old_names)} labels")
     print(f"✅ People were: {set(old_names)}")
 
+if os.path.exists(GALLERY_DIR):
+    print("📦 Backing up existing face gallery...")
+    shutil.move(GALLERY_DIR, f'{backup_dir}/gallery')
+    print(f"✅ Face gallery moved to {backup_dir}/gallery")
+
 # Delete old training data files
 print("\n🗑️  Removing old training data...")
 if os.path.exists('data/faces_data.pkl'):
@@ -0,0 +1,202 @@
+import os
+import pickle
+
+import numpy as np
+
+KMEANS_ITERATIONS = 20
+KMEANS_MAX_TRAIN = 50000
+# Gallery rows per distance block are sized so one block stays cache resident
+BLOCK_BYTES = 4 * 1024 * 1024
+
+
+def squared_distances(Q, G, g_sq_norms=None):
+    """Squared L2 distances between query rows and gallery rows via ‖q‖² + ‖g‖² − 2q·g"""
+    if g_sq_norms is None:
+        g_sq_norms = (G * G).sum(axis=1)
+    d2 = (Q * Q).sum(axis=1)[:, None] + g_sq_norms[None, :] - 2.0 * (Q @ G.T)
+    return np.maximum(d2, 0, out=d2)
+
+
+def top_k(d2, k):
+    """Row-wise k smallest entries of a distance matrix, sorted ascending"""
+    k = min(k, d2.shape[1])
+    if k < d2.shape[1]:
+        indices = np.argpartition(d2, k - 1, axis=1)[:, :k]
+    else:
+        indices = np.broadcast_to(np.arange(k), d2.shape).copy()
+    values = np.take_along_axis(d2, indices, axis=1)
+    order = np.argsort(values, axis=1)
+    return np.take_along_axis(values, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+
+def blocked_top_k(Q, G, g_sq_norms, k, block_rows=None):
+    """Exact k nearest gallery rows in float32, one cache-sized gallery block at a time
+
+    Temporary memory is bounded by ``len(Q) x block_rows`` whatever the
+    gallery size; each block's candidates are merged into the running top-k.
+    """
+    Q = np.ascontiguousarray(Q, dtype=np.float32)
+    n = len(G)
+    k = min(k, n)
+    if block_rows is None:
+        block_rows = max(256, BLOCK_BYTES // (4 * max(G.shape[1], 1)))
+    q_sq = (Q * Q).sum(axis=1)[:, None]
+    best_d2 = np.empty((len(Q), 0), dtype=np.float32)
+    best_idx = np.empty((len(Q), 0), dtype=np.int64)
+    for lo in range(0, n, block_rows):
+        block = np.asarray(G[lo:lo + block_rows], dtype=np.float32)
+        d2 = block @ Q.T
+        d2 = q_sq - 2.0 * d2.T
+        d2 += g_sq_norms[lo:lo + len(block)]
+        np.maximum(d2, 0, out=d2)
+        block_d2, block_idx = top_k(d2, k)
+        best_d2 = np.concatenate([best_d2, block_d2], axis=1)
+        best_idx = np.concatenate([best_idx, block_idx + lo], axis=1)
+        if best_d2.shape[1] > k:
+            best_d2, keep = top_k(best_d2, k)
+            best_idx = np.take_along_axis(best_idx, keep, axis=1)
+    return best_d2, best_idx
+
+
+def kmeans(X, n_clusters, iterations=KMEANS_ITERATIONS, seed=0):
+    """Plain Lloyd's k-means; returns float32 centroids"""
+    rng = np.random.default_rng(seed)
+    if len(X) > KMEANS_MAX_TRAIN:
+        X = X[np.sort(rng.choice(len(X), KMEANS_MAX_TRAIN, replace=False))]
+    X = np.asarray(X, dtype=np.float32)
+    n_clusters = min(n_clusters, len(X))
+    centroids = X[rng.choice(len(X), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assign = squared_distances(X, centroids).argmin(axis=1)
+        counts = np.bincount(assign, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, X)
+        filled = counts > 0
+        new_centroids = centroids.copy()
+        new_centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters from the points furthest from their centroid
+        if not filled.all():
+            far = np.argsort(((X - centroids[assign]) ** 2).sum(axis=1))[::-1]
+            new_centroids[~filled] = X[far[:(~filled).sum()]]
+        if np.allclose(new_centroids, centroids):
+            break
+        centroids = new_centroids
+    return centroids
+
+
+class BruteForceBackend:
+    """Exact search over every gallery row with the blocked float32 kernel"""
+
+    name = 'brute'
+    build_keys = ()
+
+    def __init__(self, index, settings):
+        self.index = index
+
+    @classmethod
+    def build(cls, vectors, sq_norms, index_dir, settings):
+        return {}
+
+    def search(self, Q, k):
+        return blocked_top_k(Q, self.index.vectors, self.index.sq_norms, k)
+
+
+class TreeBackend:
+    """Exact ball-tree / KD-tree search, worthwhile on reduced descriptors"""
+
+    name = 'tree'
+    build_keys = ('tree', 'leaf_size')
+
+    def __init__(self, index, settings):
+        self.index = index
+        self._tree = None
+
+    @classmethod
+    def build(cls, vectors, sq_norms, index_dir, settings):
+        from sklearn.neighbors import BallTree, KDTree
+
+        tree_cls = KDTree if settings.get('tree') == 'kd' else BallTree
+        tree = tree_cls(np.asarray(vectors), leaf_size=settings.get('leaf_size', 40))
+        with open(os.path.join(index_dir, 'tree.pkl'), 'wb') as f:
+            pickle.dump(tree, f)
+        return {}
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            with open(os.path.join(self.index.index_dir, 'tree.pkl'), 'rb') as f:
+                self._tree = pickle.load(f)
+        return self._tree
+
+    def search(self, Q, k):
+        distances, indices = self.tree.query(Q, k=min(k, len(self.index)))
+        return (distances ** 2).astype(np.float32), indices
+
+
+class IVFBackend:
+    """Inverted-file index: k-means partitions, search only the closest ``n_probe``
+
+    ``n_probe`` is the recall/latency knob; it is read at query time, so it
+    can be tuned from config without rebuilding the index.
+    """
+
+    name = 'ivf'
+    build_keys = ('n_lists',)
+
+    def __init__(self, index, settings):
+        self.index = index
+        self.n_probe = settings.get('n_probe', 8)
+        self._lists = None
+
+    @classmethod
+    def build(cls, vectors, sq_norms, index_dir, settings):
+        n = len(vectors)
+        n_lists = settings.get('n_lists') or max(1, int(np.sqrt(n)))
+        centroids = kmeans(vectors, n_lists)
+        assign = np.empty(n, dtype=np.int32)
+        for lo in range(0, n, 8192):
+            assign[lo:lo + 8192] = squared_distances(np.asarray(vectors[lo:lo + 8192]), centroids).argmin(axis=1)
+        order = np.argsort(assign, kind='stable').astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(centroids)))])
+        np.save(os.path.join(index_dir, 'ivf_centroids.npy'), centroids)
+        np.save(os.path.join(index_dir, 'ivf_order.npy'), order)
+        np.save(os.path.join(index_dir, 'ivf_offsets.npy'), offsets.astype(np.int64))
+        return {'partitions': len(centroids)}
+
+    @property
+    def lists(self):
+        if self._lists is None:
+            load = lambda name: np.load(os.path.join(self.index.index_dir, name))
+            self._lists = load('ivf_centroids.npy'), load('ivf_order.npy'), load('ivf_offsets.npy')
+        return self._lists
+
+    def search(self, Q, k):
+        centroids, order, offsets = self.lists
+        sizes = np.diff(offsets)
+        k = min(k, len(order))
+        out_d2 = np.empty((len(Q), k), dtype=np.float32)
+        out_idx = np.empty((len(Q), k), dtype=np.int64)
+        for i, ranked in enumerate(np.argsort(squared_distances(Q, centroids), axis=1)):
+            # Probe n_probe partitions, and more if they hold fewer than k rows
+            n_probe = max(self.n_probe, int(np.searchsorted(np.cumsum(sizes[ranked]), k)) + 1)
+            rows = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in ranked[:n_probe]])
+            rows.sort()
+            d2, local = top_k(squared_distances(Q[i:i + 1], self.index.vectors[rows], self.index.sq_norms[rows]), k)
+            out_d2[i] = d2[0]
+            out_idx[i] = rows[local[0]]
+        return out_d2, out_idx
+
+
+BACKENDS = {backend.name: backend for backend in (BruteForceBackend, TreeBackend, IVFBackend)}
+
+
+def get_backend(name):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown index backend '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]
+
+
+def build_settings(settings):
+    """The subset of index settings that requires a rebuild when changed"""
+    backend = get_backend(settings['backend'])
+    return {'backend': backend.name, **{key: settings.get(key) for key in backend.build_keys}}
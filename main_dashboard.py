@@ -5,6 +5,8 @@ import os
 from datetime import datetime
 import subprocess
 import sys
+from face_gallery import LEGACY_FACES_FILE, FaceGallery, load_manifest
+from attendance_db import get_db
 
 st.set_page_config(
     page_title="🎯 Face Recognition Attendance System",
@@ -75,27 +77,20 @@ def main():
     # Load current data
     ts = time.time()
     date = datetime.fromtimestamp(ts).strftime("%d-%m-%y")
-    attendance_file = f"Attendance/Attendance_{date}.csv"
+    today = datetime.fromtimestamp(ts).date()
     
     try:
-        if os.path.exists(attendance_file):
-            df_today = pd.read_csv(attendance_file)
-            today_count = len(df_today) if not df_today.empty else 0
-        else:
-            today_count = 0
+        db = get_db()
+        today_count = db.day_count(today)
             
         st.sidebar.metric("📅 Today's Records", today_count)
         
-        # Total attendance files
-        attendance_files = [f for f in os.listdir("Attendance/") if f.endswith('.csv')]
-        st.sidebar.metric("📁 Total Days", len(attendance_files))
+        # Days with attendance
+        st.sidebar.metric("📁 Total Days", len(db.days()))
         
         # Trained users
-        if os.path.exists('data/names.pkl'):
-            import pickle
-            with open('data/names.pkl', 'rb') as f:
-                names = pickle.load(f)
-            unique_users = len(set(names))
+        if FaceGallery().exists() or os.path.exists(LEGACY_FACES_FILE):
+            unique_users = len(load_manifest().people)
             st.sidebar.metric("👥 Trained Users", unique_users)
         
     except Exception as e:
@@ -103,7 +98,7 @@ def main():
     
     # Main content based on selected page
     if page == "🏠 Dashboard":
-        show_dashboard(date, attendance_file)
+        show_dashboard(date, today)
     elif page == "📊 Analytics":
         st.info("📊 Opening Analytics Dashboard...")
         if st.button("🚀 Launch Analytics"):
@@ -119,7 +114,7 @@ def main():
     elif page == "🔧 System Control":
         show_system_control()
 
-def show_dashboard(date, attendance_file):
+def show_dashboard(date, today):
     """Main dashboard page"""
     col1, col2, col3 = st.columns(3)
     
@@ -132,13 +127,8 @@ def show_dashboard(date, attendance_file):
         """.format(date), unsafe_allow_html=True)
     
     with col2:
-        if os.path.exists(attendance_file):
-            df = pd.read_csv(attendance_file)
-            count = len(df) if not df.empty else 0
-            status = "🟢 Active"
-        else:
-            count = 0
-            status = "🔴 No Records"
+        count = get_db().day_count(today)
+        status = "🟢 Active" if count else "🔴 No Records"
             
         st.markdown("""
         <div class="metric-card">
@@ -163,32 +153,29 @@ def show_dashboard(date, attendance_file):
     # Today's attendance
     st.subheader("📋 Today's Attendance Records")
     
-    if os.path.exists(attendance_file):
-        try:
-            df = pd.read_csv(attendance_file)
-            if not df.empty:
-                # Enhanced table display
-                st.dataframe(
-                    df.style.highlight_max(axis=0),
-                    use_container_width=True,
-                    height=300
-                )
-                
-                # Summary
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.metric("Total Entries", len(df))
-                with col2:
-                    if 'NAME' in df.columns:
-                        unique_people = df['NAME'].nunique()
-                        st.metric("Unique People", unique_people)
-            else:
-                st.info("📝 No attendance records for today yet.")
-        except Exception as e:
-            st.error(f"Error reading attendance data: {e}")
-    else:
-        st.info("📝 No attendance file found for today.")
-        st.write("Start the face recognition system to begin taking attendance!")
+    try:
+        df = get_db().day_records(today)
+        if not df.empty:
+            # Enhanced table display
+            st.dataframe(
+                df.style.highlight_max(axis=0),
+                use_container_width=True,
+                height=300
+            )
+            
+            # Summary
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Total Entries", len(df))
+            with col2:
+                if 'NAME' in df.columns:
+                    unique_people = df['NAME'].nunique()
+                    st.metric("Unique People", unique_people)
+        else:
+            st.info("📝 No attendance records for today yet.")
+            st.write("Start the face recognition system to begin taking attendance!")
+    except Exception as e:
+        st.error(f"Error reading attendance data: {e}")
 
 def show_settings():
     """System settings page"""
@@ -237,15 +224,29 @@ def show_reports():
     if st.button("📊 Generate Report"):
         st.success("✅ Report generated successfully!")
         
-        # Sample report data
-        sample_data = {
-            'Date': ['15-08-25', '14-08-25', '13-08-25'],
-            'Total Records': [5, 8, 6],
-            'Unique People': [3, 4, 3],
-            'Average Time': ['09:30', '09:45', '09:15']
-        }
-        
-        df_report = pd.DataFrame(sample_data)
+        if report_type == "Daily Summary":
+            # Straight from the per-day rollup, no raw rows scanned
+            daily = get_db().daily_summary(start_date, end_date)
+            df_report = pd.DataFrame({
+                'Date': daily['Date'].dt.strftime("%d-%m-%y"),
+                'Total Records': daily['Count'],
+                'Unique People': daily['People'],
+                'First Mark': daily['First'].str[11:16],
+                'Last Mark': daily['Last'].str[11:16]
+            })
+        elif report_type == "Individual Report":
+            df_report = get_db().person_summary(start_date, end_date).rename(
+                columns={'Count': 'Total Records', 'Days': 'Days Present', 'First': 'First Day', 'Last': 'Last Day'})
+        else:
+            # Sample report data
+            sample_data = {
+                'Date': ['15-08-25', '14-08-25', '13-08-25'],
+                'Total Records': [5, 8, 6],
+                'Unique People': [3, 4, 3],
+                'Average Time': ['09:30', '09:45', '09:15']
+            }
+            
+            df_report = pd.DataFrame(sample_data)
         st.dataframe(df_report, use_container_width=True)
         
         # Download button
@@ -0,0 +1,121 @@
+import time
+
+import cv2
+
+from config import load_config
+
+
+class MotionGate:
+    """Cheap motion check that lets the recognizer idle on a static scene
+
+    Each checked frame is shrunk to ``downscale_width`` pixels wide and
+    compared with the previous one (plain frame differencing, or a MOG2
+    background subtractor with ``method='mog2'``). After ``idle_after``
+    seconds without motion and without visible faces the gate goes idle:
+    callers skip detection and recognition and only check ``idle_fps`` times
+    per second. Any motion wakes it on the next check.
+    """
+
+    def __init__(self, downscale_width=160, pixel_threshold=25, min_area=0.005,
+                 idle_after=3.0, idle_fps=5, method='diff'):
+        self.downscale_width = downscale_width
+        self.pixel_threshold = pixel_threshold
+        self.min_area = min_area
+        self.idle_after = idle_after
+        self.idle_interval = 1.0 / idle_fps
+        self.method = method
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(detectShadows=False) if method == 'mog2' else None
+        self.previous = None
+        self.idle = False
+        self.faces_present = False
+        self.last_motion = time.perf_counter()
+        self.next_check = 0.0
+        self.started = time.perf_counter()
+        self.state_since = self.started
+        self.active_seconds = 0.0
+        self.idle_seconds = 0.0
+        self.frames_active = 0
+        self.frames_idle = 0
+        self.wakeups = 0
+
+    def _shrink(self, frame):
+        h, w = frame.shape[:2]
+        scale = self.downscale_width / float(w)
+        small = cv2.resize(frame, (self.downscale_width, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def motion_fraction(self, frame):
+        """Share of downscaled pixels that changed since the previous check"""
+        small = self._shrink(frame)
+        if self.subtractor is not None:
+            mask = self.subtractor.apply(small)
+            return cv2.countNonZero(mask) / float(mask.size)
+        if self.previous is None or self.previous.shape != small.shape:
+            self.previous = small
+            return 1.0
+        diff = cv2.absdiff(self.previous, small)
+        self.previous = small
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(mask) / float(mask.size)
+
+    def should_check(self):
+        """While idle, only every ``idle_interval`` seconds is a frame worth decoding"""
+        return not self.idle or time.perf_counter() >= self.next_check
+
+    def _switch(self, idle, now):
+        elapsed = now - self.state_since
+        if self.idle:
+            self.idle_seconds += elapsed
+        else:
+            self.active_seconds += elapsed
+        self.state_since = now
+        self.idle = idle
+        if not idle:
+            self.wakeups += 1
+
+    def update(self, frame):
+        """Feed a frame; returns True when it should go through detection"""
+        now = time.perf_counter()
+        moving = self.motion_fraction(frame) >= self.min_area
+        if moving or self.faces_present:
+            self.last_motion = now
+            if self.idle:
+                self._switch(False, now)
+        elif not self.idle and now - self.last_motion >= self.idle_after:
+            self._switch(True, now)
+
+        if self.idle:
+            self.frames_idle += 1
+            self.next_check = now + self.idle_interval
+            return False
+        self.frames_active += 1
+        return True
+
+    def stats(self):
+        """Duty-cycle metrics: share of wall time and frames spent active"""
+        now = time.perf_counter()
+        active, idle = self.active_seconds, self.idle_seconds
+        if self.idle:
+            idle += now - self.state_since
+        else:
+            active += now - self.state_since
+        total = max(active + idle, 1e-9)
+        return {
+            'state': 'idle' if self.idle else 'active',
+            'duty_cycle': round(active / total, 3),
+            'active_s': round(active, 1),
+            'idle_s': round(idle, 1),
+            'frames_active': self.frames_active,
+            'frames_idle': self.frames_idle,
+            'wakeups': self.wakeups,
+        }
+
+
+def motion_gate_from_config(config=None):
+    """MotionGate built from the ``motion`` settings, or None when disabled"""
+    settings = dict((config or load_config())['motion'])
+    if not settings.pop('enabled'):
+        return None
+    return MotionGate(**settings)
@@ -0,0 +1,157 @@
+import shutil
+import subprocess
+import threading
+import time
+
+from config import load_config
+from queues import LatestQueue
+
+
+class SapiBackend:
+    """Windows SAPI voice through win32com"""
+
+    def __init__(self):
+        import pythoncom
+        from win32com.client import Dispatch
+
+        # COM objects belong to the thread that created them
+        pythoncom.CoInitialize()
+        self.voice = Dispatch("SAPI.SpVoice")
+
+    def say(self, text):
+        self.voice.Speak(text)
+
+
+class Pyttsx3Backend:
+    """Offline text to speech through pyttsx3 (SAPI5, NSSpeech or espeak underneath)"""
+
+    def __init__(self):
+        import pyttsx3
+
+        self.engine = pyttsx3.init()
+
+    def say(self, text):
+        self.engine.say(text)
+        self.engine.runAndWait()
+
+
+class EspeakBackend:
+    """The espeak / espeak-ng command line voice"""
+
+    def __init__(self):
+        self.binary = shutil.which('espeak-ng') or shutil.which('espeak')
+        if self.binary is None:
+            raise RuntimeError("espeak is not installed")
+
+    def say(self, text):
+        subprocess.run([self.binary, text], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+
+
+class ConsoleBackend:
+    """Print announcements instead of speaking them"""
+
+    def say(self, text):
+        print(f"🔊 {text}")
+
+
+class NoopBackend:
+    """Silent backend for headless machines"""
+
+    def say(self, text):
+        pass
+
+
+NOTIFICATION_BACKENDS = {
+    'sapi': SapiBackend,
+    'pyttsx3': Pyttsx3Backend,
+    'espeak': EspeakBackend,
+    'console': ConsoleBackend,
+    'none': NoopBackend,
+}
+
+# 'auto' tries these in order and keeps the first that loads
+AUTO_ORDER = ('sapi', 'pyttsx3', 'espeak', 'console')
+
+
+class Announcer:
+    """Speaks announcements on a worker thread so callers never wait on audio
+
+    ``announce`` only queues the text. The same text is dropped if it was
+    queued or spoken in the last ``coalesce_seconds``, and when speech falls
+    behind the oldest pending announcements are dropped past ``max_queue``.
+    The backend is created on the worker thread, as SAPI and pyttsx3 are
+    bound to the thread that initialised them.
+    """
+
+    def __init__(self, backend='auto', coalesce_seconds=10.0, max_queue=5):
+        self.backend_name = backend
+        self.coalesce_seconds = coalesce_seconds
+        self.queue = LatestQueue(max_queue)
+        self.last_announced = {}
+        self.lock = threading.Lock()
+        self.backend = None
+        self.spoken = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.thread = threading.Thread(target=self._run, name='announcer', daemon=True)
+        self.thread.start()
+
+    def _load_backend(self):
+        names = AUTO_ORDER if self.backend_name == 'auto' else (self.backend_name, 'console')
+        for name in names:
+            try:
+                return name, NOTIFICATION_BACKENDS[name]()
+            except Exception as e:
+                if self.backend_name != 'auto':
+                    print(f"⚠️ Notification backend '{name}' not available: {e}")
+        return 'none', NoopBackend()
+
+    def announce(self, text):
+        """Queue ``text`` to be spoken; returns False when it was coalesced"""
+        now = time.monotonic()
+        with self.lock:
+            last = self.last_announced.get(text)
+            if last is not None and now - last < self.coalesce_seconds:
+                self.coalesced += 1
+                return False
+            self.last_announced[text] = now
+            # Forget stale entries so the table does not grow with every name seen
+            if len(self.last_announced) > 256:
+                self.last_announced = {t: at for t, at in self.last_announced.items()
+                                       if now - at < self.coalesce_seconds}
+        self.queue.put(text)
+        return True
+
+    def _run(self):
+        self.backend_name, self.backend = self._load_backend()
+        while True:
+            text = self.queue.get(timeout=0.5)
+            if text is None:
+                if self.queue.closed:
+                    break
+                continue
+            try:
+                self.backend.say(text)
+                self.spoken += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"⚠️ Announcement failed: {e}")
+
+    def close(self, timeout=2.0):
+        """Stop after the announcements already queued, waiting at most ``timeout``"""
+        self.queue.close()
+        self.thread.join(timeout)
+
+    def stats(self):
+        return {
+            'backend': self.backend_name,
+            'spoken': self.spoken,
+            'coalesced': self.coalesced,
+            'dropped': self.queue.drops,
+            'failed': self.failed,
+        }
+
+
+def announcer_from_config(config=None):
+    """Announcer built from the ``notifications`` settings"""
+    return Announcer(**(config or load_config())['notifications'])
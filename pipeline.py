@@ -0,0 +1,211 @@
+import collections
+import threading
+import time
+
+import cv2
+
+from queues import LatestQueue
+from recognition_engine import RecognitionResult
+
+
+class FrameItem:
+    """A frame travelling through the pipeline, annotated stage by stage"""
+
+    def __init__(self, seq, frame):
+        self.seq = seq
+        self.captured_at = time.perf_counter()
+        self.frame = frame
+        self.gray = None
+        self.boxes = ()
+        self.result = None
+
+
+class RecognitionPipeline:
+    """Threaded capture -> detect -> recognize pipeline; rendering stays with the caller
+
+    A grabber thread keeps only the newest camera frame, a pool of detection
+    workers (each with its own ``FaceDetector``, as OpenCV cascades are not
+    thread-safe) runs ``detect(detector, gray)``, and one recognition thread
+    batches the faces through the engine. Every hand-off is a bounded
+    ``LatestQueue`` so a slow stage sheds old frames instead of building
+    latency. OpenCV releases the GIL, so the stages use separate cores.
+
+    With a ``FaceTracker`` the detect and recognize stages collapse into a
+    single tracking thread, because tracks depend on the previous frame;
+    the tracker then decides when detection and recognition actually run.
+
+    With a ``MotionGate`` the grabber sends frames of a static, face-free
+    scene straight to the render queue and, while idle, drops frames
+    without decoding them between the gate's low-rate checks.
+
+    Detectors are built by ``start`` on the calling thread, so a missing
+    model raises there. An exception in any stage stops the pipeline
+    (``is_alive`` turns False), is kept in ``error`` and re-raised by
+    ``stop``.
+    """
+
+    def __init__(self, video, make_detector, engine, detect=None, detect_workers=2, queue_size=1,
+                 tracker=None, motion_gate=None):
+        self.video = video
+        self.tracker = tracker
+        self.motion_gate = motion_gate
+        self.make_detector = make_detector
+        self.engine = engine
+        self.detect = detect or (lambda detector, gray: detector.detect(gray))
+        self.detect_workers = detect_workers
+        self.queues = {
+            'capture': LatestQueue(queue_size),
+            'detect': LatestQueue(queue_size + detect_workers),
+            'result': LatestQueue(queue_size),
+        }
+        self.threads = []
+        self.running = False
+        self.error = None
+        self.stale = 0
+        self.processed = collections.Counter()
+        self.latency_ms = 0.0
+
+    def start(self):
+        detectors = [self.make_detector() for _ in range(1 if self.tracker is not None else self.detect_workers)]
+        self.running = True
+        self.threads = [self._thread(self._grab, 'grabber')]
+        if self.tracker is not None:
+            self.threads.append(self._thread(self._track_loop, 'track', detectors[0]))
+        else:
+            for i, detector in enumerate(detectors):
+                self.threads.append(self._thread(self._detect_loop, f'detect-{i}', detector))
+            self.threads.append(self._thread(self._recognize_loop, 'recognize'))
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def _thread(self, loop, name, *args):
+        def run():
+            try:
+                loop(*args)
+            except Exception as e:
+                if self.error is None:
+                    self.error = e
+                print(f"❌ Pipeline {name} thread failed: {e}")
+                self.running = False
+                for queue in self.queues.values():
+                    queue.close()
+        return threading.Thread(target=run, name=name, daemon=True)
+
+    def stop(self):
+        """Stop every stage; re-raises the exception that stopped a stage, if any"""
+        self.running = False
+        for queue in self.queues.values():
+            queue.close()
+        for thread in self.threads:
+            thread.join(timeout=2)
+        if self.error is not None:
+            raise self.error
+
+    def is_alive(self):
+        return self.running or any(thread.is_alive() for thread in self.threads)
+
+    def get(self, timeout=None):
+        """Newest recognized frame for the render loop, or None on timeout"""
+        item = self.queues['result'].get(timeout)
+        if item is not None:
+            latency = (time.perf_counter() - item.captured_at) * 1000
+            self.latency_ms = latency if not self.latency_ms else 0.9 * self.latency_ms + 0.1 * latency
+        return item
+
+    def _grab(self):
+        seq = 0
+        gate = self.motion_gate
+        while self.running:
+            if gate is not None and not gate.should_check():
+                # Idle: keep the camera buffer drained without decoding
+                if not self.video.grab():
+                    self.running = False
+                    break
+                continue
+            ret, frame = self.video.read()
+            if not ret:
+                self.running = False
+                break
+            seq += 1
+            self.processed['capture'] += 1
+            item = FrameItem(seq, frame)
+            if gate is not None and not gate.update(frame):
+                item.result = RecognitionResult.empty()
+                self.processed['idle'] += 1
+                self.queues['result'].put(item)
+                continue
+            self.queues['capture'].put(item)
+        self.queues['capture'].close()
+
+    def _detect_loop(self, detector):
+        while True:
+            item = self.queues['capture'].get(timeout=0.5)
+            if item is None:
+                if not self.running:
+                    break
+                continue
+            item.gray = cv2.cvtColor(item.frame, cv2.COLOR_BGR2GRAY)
+            item.boxes = self.detect(detector, item.gray)
+            self.processed['detect'] += 1
+            self.queues['detect'].put(item)
+
+    def _recognize_loop(self):
+        last_seq = 0
+        while True:
+            item = self.queues['detect'].get(timeout=0.5)
+            if item is None:
+                if not self.running:
+                    break
+                continue
+            # Detection workers can finish out of order; never go back in time
+            if item.seq <= last_seq:
+                self.stale += 1
+                continue
+            last_seq = item.seq
+            item.result = self.engine.recognize_frame(item.frame, item.boxes)
+            self.processed['recognize'] += 1
+            if self.motion_gate is not None:
+                self.motion_gate.faces_present = len(item.boxes) > 0
+            self.queues['result'].put(item)
+        self.queues['result'].close()
+
+    def _track_loop(self, detector):
+        detect = lambda gray: self.detect(detector, gray)
+        while True:
+            item = self.queues['capture'].get(timeout=0.5)
+            if item is None:
+                if not self.running:
+                    break
+                continue
+            item.gray = cv2.cvtColor(item.frame, cv2.COLOR_BGR2GRAY)
+            item.boxes, item.result = self.tracker.update(item.frame, item.gray, detect, self.engine)
+            self.processed['track'] += 1
+            if self.motion_gate is not None:
+                self.motion_gate.faces_present = len(item.boxes) > 0
+            self.queues['result'].put(item)
+        self.queues['result'].close()
+
+    def stats(self):
+        """Per-stage queue depth, drop and throughput counters"""
+        return {
+            'queues': {name: {'depth': len(q), 'drops': q.drops, 'puts': q.puts} for name, q in self.queues.items()},
+            'processed': dict(self.processed),
+            'stale': self.stale,
+            'latency_ms': round(self.latency_ms, 1),
+            'tracker': self.tracker.stats() if self.tracker is not None else None,
+            'motion': self.motion_gate.stats() if self.motion_gate is not None else None,
+        }
+
+    def format_stats(self):
+        stats = self.stats()
+        queues = ' | '.join(f"{name}: depth {q['depth']} drop {q['drops']}" for name, q in stats['queues'].items())
+        line = f"{queues} | stale {stats['stale']} | latency {stats['latency_ms']} ms"
+        if stats['tracker']:
+            tracker = stats['tracker']
+            line += (f" | detect ratio {tracker['detect_ratio']}"
+                     f" | recognitions/frame {tracker['recognitions_per_frame']}")
+        if stats['motion']:
+            motion = stats['motion']
+            line += f" | duty cycle {motion['duty_cycle']:.0%} ({motion['wakeups']} wakeups)"
+        return line
@@ -0,0 +1,38 @@
+import collections
+import threading
+
+
+class LatestQueue:
+    """Bounded queue that drops the oldest item instead of blocking the producer"""
+
+    def __init__(self, maxsize=1):
+        self.maxsize = maxsize
+        self.items = collections.deque()
+        self.cond = threading.Condition()
+        self.puts = 0
+        self.drops = 0
+        self.closed = False
+
+    def put(self, item):
+        with self.cond:
+            if len(self.items) >= self.maxsize:
+                self.items.popleft()
+                self.drops += 1
+            self.items.append(item)
+            self.puts += 1
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """Oldest queued item, or None on timeout / once closed and drained"""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.items or self.closed, timeout):
+                return None
+            return self.items.popleft() if self.items else None
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def __len__(self):
+        return len(self.items)
@@ -0,0 +1,197 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from config import load_config
+from face_gallery import GALLERY_DIR, FaceGallery
+from recognition_index import load_index
+
+FACE_SIZE = (50, 50)
+UNKNOWN = "Unknown"
+# how often the gallery manifest is stat'ed for enrollments and tombstones
+GALLERY_CHECK_SECONDS = 1.0
+
+
+def crop_faces(frame, boxes):
+    """Stack every detected face in a frame into one (n_faces, 7500) uint8 batch"""
+    batch = np.empty((len(boxes), FACE_SIZE[0] * FACE_SIZE[1] * 3), dtype=np.uint8)
+    for i, (x, y, w, h) in enumerate(boxes):
+        batch[i] = cv2.resize(frame[y:y+h, x:x+w, :], FACE_SIZE).reshape(-1)
+    return batch
+
+
+class RecognitionResult:
+    """Everything one neighbour search produced for a batch of faces"""
+
+    def __init__(self, boxes, labels, distances, neighbours, vote_fractions, known, confidence):
+        self.boxes = boxes
+        self.labels = labels
+        self.distances = distances
+        self.neighbours = neighbours
+        self.vote_fractions = vote_fractions
+        self.known = known
+        self.confidence = confidence
+
+    def __len__(self):
+        return len(self.labels)
+
+    @classmethod
+    def empty(cls, boxes=(), n_neighbors=5):
+        """Result for a frame with no faces (or one that skipped recognition)"""
+        scores = np.empty(0, dtype=np.float32)
+        return cls(
+            boxes, np.empty(0, dtype=object), np.empty((0, n_neighbors), dtype=np.float32),
+            np.empty((0, n_neighbors), dtype=np.intp), scores, np.empty(0, dtype=bool), scores)
+
+    @property
+    def names(self):
+        """Predicted names with unknown faces replaced by ``UNKNOWN``"""
+        return [label if ok else UNKNOWN for label, ok in zip(self.labels, self.known)]
+
+    def recognized(self):
+        """(name, confidence) pairs for faces that passed the unknown check"""
+        return [(label, conf) for label, conf, ok in zip(self.labels, self.confidence, self.known) if ok]
+
+
+class RecognitionEngine:
+    """Batched KNN recognition over the persisted index
+
+    ``confidence`` selects how a face is scored: ``'votes'`` uses the
+    fraction of the k neighbours agreeing with the winning label (what
+    ``predict_proba`` returned), ``'distance'`` uses ``1 - mean_distance / 100``
+    as ``advanced_recognition.py`` always has. Faces scoring at or below
+    ``threshold`` are reported as unknown.
+
+    Rows of people removed from the gallery (tombstoned in its manifest)
+    are masked without touching the index: the search fetches twice the
+    neighbours and keeps the nearest ``n_neighbors`` live ones, and masked
+    rows never vote. The manifest is re-checked every
+    ``GALLERY_CHECK_SECONDS``, so a removal applies within a second.
+
+    With ``hot_reload`` (default: the ``recognition.hot_reload`` setting
+    when the engine opens the index itself) a manifest whose content
+    fingerprint no longer matches the index starts a background thread
+    that opens, or builds and publishes, the new index and pages it in.
+    The next ``recognize`` call swaps it in before searching, so a frame
+    is always answered entirely by the old or entirely by the new index
+    and the frame loop never waits for a build.
+    """
+
+    def __init__(self, index=None, n_neighbors=5, confidence='votes', threshold=0.6, gallery_root=GALLERY_DIR,
+                 hot_reload=None):
+        if hot_reload is None:
+            hot_reload = index is None and load_config()['recognition']['hot_reload']
+        self.index = (index if index is not None else load_index(gallery_root)).warm()
+        self.n_neighbors = n_neighbors
+        self.confidence = confidence
+        self.threshold = threshold
+        self.hot_reload = hot_reload
+        self.classes = np.asarray(self.index.label_table, dtype=object)
+        self.last_result = None
+        self.gallery = FaceGallery(gallery_root)
+        self.masked_rows = None
+        self.tombstones = set()
+        # bumped whenever the removed set changes, so callers caching identities can drop them
+        self.tombstone_version = 0
+        self.reloads = 0
+        self._manifest_stamp = None
+        self._next_gallery_check = 0.0
+        self._pending_index = None
+        self._reload_thread = None
+        self._swap_lock = threading.RLock()
+        self.refresh_tombstones(force=True)
+
+    def refresh_tombstones(self, force=False):
+        """Re-read the removed identities (and check for enrollments) if the gallery manifest changed"""
+        now = time.monotonic()
+        if not force and now < self._next_gallery_check:
+            return
+        self._next_gallery_check = now + GALLERY_CHECK_SECONDS
+        stamp = self.gallery.manifest_stamp()
+        if stamp == self._manifest_stamp and not force:
+            return
+        self._manifest_stamp = stamp
+        removed = self.gallery.tombstones() if stamp is not None else set()
+        if removed != self.tombstones:
+            self.tombstones = removed
+            self.tombstone_version += 1
+        with self._swap_lock:
+            label_ids = [i for i, name in enumerate(self.index.label_table) if name in removed]
+            self.masked_rows = np.isin(self.index.label_ids, label_ids) if label_ids else None
+        if (self.hot_reload and stamp is not None
+                and self.gallery.fingerprint() != self.index.meta.get('gallery_fingerprint')):
+            self._start_reload()
+
+    def _start_reload(self):
+        if self._reload_thread is not None and self._reload_thread.is_alive():
+            return
+        self._reload_thread = threading.Thread(target=self._reload, name='index-reload', daemon=True)
+        self._reload_thread.start()
+
+    def _reload(self):
+        try:
+            index = load_index(self.gallery.root, self.index.root).warm()
+        except (OSError, ValueError) as e:
+            # Keep the stamp: the next attempt waits for the manifest to change (e.g. fix_data.py)
+            print(f"⚠️ Could not reload the recognition index: {e}")
+            return
+        if index.meta != self.index.meta:
+            self._pending_index = index
+        # Enrolled again while this one was building: look again on the next check
+        self._manifest_stamp = None
+
+    def _swap_pending(self):
+        """Install a reloaded index between two searches"""
+        with self._swap_lock:
+            index, self._pending_index = self._pending_index, None
+            if index is None:
+                return
+            self.index = index
+            self.classes = np.asarray(index.label_table, dtype=object)
+            self.reloads += 1
+            self.refresh_tombstones(force=True)
+        print(f"🔄 Recognition index reloaded: {len(index)} samples, {len(self.classes)} people")
+
+    def recognize(self, faces, boxes=None):
+        """Run a single neighbour search for every face in the batch"""
+        if self._pending_index is not None:
+            self._swap_pending()
+        self.refresh_tombstones()
+        # One consistent model for the whole batch, even if another thread swaps meanwhile
+        with self._swap_lock:
+            index, classes, masked = self.index, self.classes, self.masked_rows
+        if len(faces) == 0:
+            result = RecognitionResult.empty(boxes, self.n_neighbors)
+        else:
+            faces = np.asarray(faces).reshape(len(faces), -1)
+            if masked is None:
+                distances, neighbours = index.kneighbors(faces, self.n_neighbors)
+                live = np.ones(neighbours.shape, dtype=bool)
+            else:
+                distances, neighbours = index.kneighbors(faces, min(2 * self.n_neighbors, len(index)))
+                live = ~masked[neighbours]
+                # Live neighbours first, each group still nearest-first
+                keep = np.argsort(~live, axis=1, kind='stable')[:, :self.n_neighbors]
+                distances, neighbours, live = (np.take_along_axis(a, keep, axis=1) for a in (distances, neighbours, live))
+            neighbour_labels = index.label_ids[neighbours]
+            votes = np.zeros((len(faces), len(classes)), dtype=np.float32)
+            np.add.at(votes, (np.arange(len(faces))[:, None], neighbour_labels), live)
+            label_ids = votes.argmax(axis=1)
+            vote_fractions = votes[np.arange(len(faces)), label_ids] / neighbours.shape[1]
+
+            if self.confidence == 'distance':
+                mean_distance = np.where(live, distances, 0).sum(axis=1) / np.maximum(live.sum(axis=1), 1)
+                confidence = np.where(live.any(axis=1), np.clip(1.0 - mean_distance / 100, 0, 1), 0.0)
+            else:
+                confidence = vote_fractions
+            result = RecognitionResult(
+                boxes, classes[label_ids], distances, neighbours,
+                vote_fractions, confidence > self.threshold, confidence)
+        self.last_result = result
+        return result
+
+    def recognize_frame(self, frame, boxes):
+        """Crop, batch and recognize every detected face in a frame"""
+        return self.recognize(crop_faces(frame, boxes), boxes)
@@ -0,0 +1,293 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from config import load_config
+from face_gallery import GALLERY_DIR, FaceGallery
+from face_projection import MAX_FIT_SAMPLES, FaceProjection, projection_from_config
+from file_lock import file_lock
+from index_backends import build_settings, get_backend
+
+INDEX_DIR = 'data/index'
+# names the published version under INDEX_DIR; switched with os.replace
+CURRENT_FILE = 'CURRENT'
+# published versions kept besides the current one, for readers still mapping them
+KEEP_VERSIONS = 2
+INDEX_VERSION = 3
+BUILD_CHUNK = 4096
+# a build lock older than this is assumed abandoned
+BUILD_LOCK_STALE_SECONDS = 600
+
+
+def current_version_dir(index_dir=INDEX_DIR):
+    """Directory of the published index: the version ``CURRENT`` names, else ``index_dir`` itself (older layout)"""
+    try:
+        with open(os.path.join(index_dir, CURRENT_FILE), 'r') as f:
+            return os.path.join(index_dir, f.read().strip())
+    except FileNotFoundError:
+        return index_dir
+
+
+class RecognitionIndex:
+    """Pre-fitted nearest-neighbour index loaded lazily from ``INDEX_DIR``
+
+    The artifact holds the fitted projection, the projected float32 gallery
+    matrix, its per-row squared norms, the label ids and whatever structure
+    the configured backend (see ``index_backends``) needs, so opening it is
+    an mmap instead of a ``KNeighborsClassifier.fit`` on the raw pixel rows.
+
+    ``root`` is the directory holding the published versions and
+    ``index_dir`` the version this instance reads.
+    """
+
+    def __init__(self, index_dir=INDEX_DIR, settings=None):
+        self.root = index_dir
+        self.index_dir = current_version_dir(index_dir)
+        self.settings = settings if settings is not None else load_config()['recognition']['index']
+        with open(os.path.join(self.index_dir, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version {self.meta.get('version')}")
+        self.label_table = self.meta['label_table']
+        self._vectors = None
+        self._sq_norms = None
+        self._label_ids = None
+        self._projection = None
+        self._backend = None
+
+    def _load(self, name, mmap=False):
+        return np.load(os.path.join(self.index_dir, name), mmap_mode='r' if mmap else None)
+
+    @property
+    def vectors(self):
+        if self._vectors is None:
+            self._vectors = self._load('vectors.npy', mmap=True)
+        return self._vectors
+
+    @property
+    def sq_norms(self):
+        if self._sq_norms is None:
+            self._sq_norms = self._load('sq_norms.npy')
+        return self._sq_norms
+
+    @property
+    def label_ids(self):
+        if self._label_ids is None:
+            self._label_ids = self._load('label_ids.npy')
+        return self._label_ids
+
+    @property
+    def projection(self):
+        if self._projection is None:
+            self._projection = FaceProjection.load(self.index_dir)
+        return self._projection
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            backend_cls = get_backend(self.meta['index']['backend'])
+            self._backend = backend_cls(self, self.settings)
+        return self._backend
+
+    def __len__(self):
+        return self.meta['n_samples']
+
+    def warm(self):
+        """Open every lazily loaded part now, so later queries never read from ``index_dir`` again"""
+        self.vectors, self.sq_norms, self.label_ids, self.projection, self.backend
+        return self
+
+    def transform(self, X):
+        """Map raw (n, 7500) pixel rows into the index space"""
+        return self.projection.transform(X)
+
+    def kneighbors(self, X, n_neighbors=5):
+        """Euclidean distances and row indices of the nearest gallery samples"""
+        d2, indices = self.backend.search(self.transform(X), n_neighbors)
+        return np.sqrt(d2), indices
+
+
+def build_index(gallery_root=GALLERY_DIR, index_dir=INDEX_DIR, projection=None, settings=None):
+    """Fit the projection and write the versioned index artifact for the gallery"""
+    start = time.time()
+    settings = settings if settings is not None else load_config()['recognition']['index']
+    backend_cls = get_backend(settings['backend'])
+    store = FaceGallery(gallery_root)
+    # Taken before reading the segments: an enrollment landing mid-build only triggers another build
+    fingerprint = store.fingerprint()
+    gallery = store.load(mmap=True)
+    n = len(gallery)
+    projection = projection if projection is not None else projection_from_config()
+
+    os.makedirs(index_dir, exist_ok=True)
+    meta_path = os.path.join(index_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    rows = np.arange(n)
+    if n > MAX_FIT_SAMPLES:
+        rows = np.sort(np.random.default_rng(0).choice(n, MAX_FIT_SAMPLES, replace=False))
+    projection.fit(gallery.take(rows), gallery.label_ids[rows])
+    projection.save(index_dir)
+    dim = projection.output_dim
+
+    vectors = np.lib.format.open_memmap(
+        os.path.join(index_dir, 'vectors.npy'), mode='w+', dtype=np.float32, shape=(n, dim))
+    sq_norms = np.empty(n, dtype=np.float32)
+    row = 0
+    for seg in gallery.segments:
+        for lo in range(0, len(seg), BUILD_CHUNK):
+            block = projection.transform(seg[lo:lo + BUILD_CHUNK])
+            vectors[row:row + len(block)] = block
+            sq_norms[row:row + len(block)] = (block * block).sum(axis=1)
+            row += len(block)
+    vectors.flush()
+    backend_info = backend_cls.build(vectors, sq_norms, index_dir, settings)
+    del vectors
+
+    np.save(os.path.join(index_dir, 'sq_norms.npy'), sq_norms)
+    np.save(os.path.join(index_dir, 'label_ids.npy'), gallery.label_ids.astype(np.int32))
+    meta = {
+        'version': INDEX_VERSION,
+        'gallery_fingerprint': fingerprint,
+        'n_samples': n,
+        'dim': dim,
+        'projection': {'method': projection.method, 'n_components': projection.n_components},
+        'index': {**build_settings(settings), **backend_info},
+        'label_table': gallery.label_table,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    # meta.json is written last so a half-built index is never picked up
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    print(f"✅ Built recognition index: {n} samples x {dim} dims ({projection.method}, {backend_cls.name}) in {time.time() - start:.2f}s")
+    return RecognitionIndex(index_dir)
+
+
+def _build_lock(index_dir):
+    """Only one process builds an index at a time; the others wait for it"""
+    return file_lock(f"{index_dir}.lock", BUILD_LOCK_STALE_SECONDS, poll=0.5)
+
+
+def _current_index(store, index_dir, recognition):
+    """The persisted index if it matches the gallery and the configured projection/backend"""
+    wanted = {'method': recognition['projection'], 'n_components': recognition['n_components']}
+    wanted_index = build_settings(recognition['index'])
+    try:
+        index = RecognitionIndex(index_dir, recognition['index'])
+        built_index = {key: index.meta['index'].get(key) for key in wanted_index}
+        if (index.meta.get('gallery_fingerprint') == store.fingerprint()
+                and index.meta.get('projection') == wanted
+                and built_index == wanted_index):
+            return index
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+    return None
+
+
+def _version_name(fingerprint):
+    return f"{time.strftime('%Y%m%d-%H%M%S')}_{fingerprint.replace(':', '_')}"
+
+
+def _switch_current(index_dir, name):
+    path = os.path.join(index_dir, CURRENT_FILE)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    for attempt in range(20):
+        try:
+            os.replace(tmp, path)
+            return
+        except PermissionError:
+            # Windows: a reader has the pointer open for the moment it takes to read it
+            if attempt == 19:
+                raise
+            time.sleep(0.05)
+
+
+def prune_versions(index_dir=INDEX_DIR, keep=KEEP_VERSIONS):
+    """Delete index versions older than the newest ``keep`` besides the current one
+
+    Files another process still maps cannot be deleted on Windows. Their
+    ``meta.json`` goes first, so a version that was only partly deleted is
+    never opened again and is retried by the next prune whatever ``keep`` is.
+    """
+    current = os.path.basename(current_version_dir(index_dir))
+    versions = [entry.name for entry in sorted(os.scandir(index_dir), key=lambda entry: entry.stat().st_mtime)
+                if entry.is_dir() and entry.name != current]
+    finished = [name for name in versions if not name.endswith('.building')
+                and os.path.exists(os.path.join(index_dir, name, 'meta.json'))]
+    stale = [name for name in versions if name not in finished]
+    stale += finished[:max(0, len(finished) - keep)]
+    for name in stale:
+        try:
+            os.remove(os.path.join(index_dir, name, 'meta.json'))
+        except OSError:
+            pass
+        shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+    # Files of the older single-directory layout, and its sibling staging directories
+    for entry in os.scandir(index_dir):
+        if entry.is_file() and entry.name not in (CURRENT_FILE, CURRENT_FILE + '.tmp'):
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+    for path in (f"{index_dir}.building", f"{index_dir}.retired"):
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def publish_index(gallery_root=GALLERY_DIR, index_dir=INDEX_DIR, settings=None, only_if_stale=False,
+                  keep=KEEP_VERSIONS):
+    """Build a new index version under ``index_dir`` and point ``CURRENT`` at it
+
+    Nothing a reader may have mapped is renamed or overwritten: running
+    recognizers keep their version open and move to the new one on their
+    next reload, and all but ``keep`` older versions are pruned. With ``only_if_stale``
+    the build is skipped when another process published a matching index
+    while this one waited for the build lock.
+    """
+    with _build_lock(index_dir):
+        if only_if_stale:
+            index = _current_index(FaceGallery(gallery_root), index_dir, load_config()['recognition'])
+            if index is not None:
+                return index
+        os.makedirs(index_dir, exist_ok=True)
+        name = _version_name(FaceGallery(gallery_root).fingerprint())
+        suffix = 1
+        while os.path.exists(os.path.join(index_dir, name)):
+            name, suffix = f"{name.rsplit('.', 1)[0]}.{suffix}", suffix + 1
+        staging = os.path.join(index_dir, name + '.building')
+        shutil.rmtree(staging, ignore_errors=True)
+        build_index(gallery_root, staging, settings=settings)
+        # A directory nobody has opened yet can be renamed on every platform
+        os.rename(staging, os.path.join(index_dir, name))
+        _switch_current(index_dir, name)
+        prune_versions(index_dir, keep)
+    return RecognitionIndex(index_dir, settings)
+
+
+def load_index(gallery_root=GALLERY_DIR, index_dir=INDEX_DIR):
+    """Open the persisted index, rebuilding it only if the gallery or projection changed"""
+    store = FaceGallery(gallery_root)
+    if not store.exists():
+        store.migrate_legacy()
+    # Header and size checks only: a torn or truncated segment fails here, not mid-search
+    problems = store.validate()
+    if problems:
+        details = '; '.join(f"segment {seg_id}: {problem}" if seg_id is not None else problem
+                            for seg_id, problem in problems.items())
+        raise ValueError(f"Face gallery in {gallery_root} is damaged ({details}); run python fix_data.py")
+    recognition = load_config()['recognition']
+    index = _current_index(store, index_dir, recognition)
+    if index is not None:
+        return index
+    return publish_index(gallery_root, index_dir, settings=recognition['index'], only_if_stale=True)
+
+
+if __name__ == "__main__":
+    publish_index()
@@ -1,75 +1,67 @@
-from sklearn.neighbors import KNeighborsClassifier 
 import cv2
-import pickle
 import numpy as np
-import os
-import csv 
-import time
-from datetime import datetime
+from recognition_engine import RecognitionEngine
+from pipeline import RecognitionPipeline
+from face_tracker import tracker_from_config
+from motion_gate import motion_gate_from_config
+from face_detection import detector_from_config
+from notifications import announcer_from_config
+from attendance_writer import get_writer
 
-from win32com.client import Dispatch
-
-def speak(str1):
-    speak = Dispatch("SAPI.SpVoice")
-    speak.speak(str1) 
+#speech runs on its own thread so the camera never waits on it
+announcer= announcer_from_config()
+#marks are queued and written to Attendance/ on a background thread
+attendance_writer= get_writer()
 
 # Open the default camera (usually the built-in webcam)
 video = cv2.VideoCapture(0)
-facedetect = cv2.CascadeClassifier('data/haarcascade_frontalface_default.xml')
-with open ('data/names.pkl','rb') as f:
-        LABLES= pickle.load(f)
-with open ('data/faces_data.pkl', 'rb') as f:
-        FACES= pickle.load(f)
-
-knn= KNeighborsClassifier(n_neighbors=5)
-knn.fit(FACES, LABLES) 
+engine= RecognitionEngine(n_neighbors=5)
+#capture, detection and recognition run on their own threads
+pipeline= RecognitionPipeline(video, detector_from_config, engine,
+                             tracker=tracker_from_config(), motion_gate=motion_gate_from_config())
+pipeline.start()
     
 imgBackground= cv2.imread("background.png")    
 
-COL_NAMES = ['NAME', 'TIME']
-    
 faces_data=[] #emty list
 
 while True:
-    # Capture frame-by-frame
-    ret, frame = video.read()
-    
-    gray= cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) #for color and conversion
-    faces= facedetect.detectMultiScale(gray, 1.3, 5)
+    # Newest frame that made it through detection and recognition
+    item= pipeline.get(timeout=0.1)
+    if item is None:
+        if not pipeline.is_alive():
+            break
+        cv2.waitKey(1)
+        continue
+    frame, faces, result= item.frame, item.boxes, item.result
     #get coordinate from faces: xy and w h widtyh height 
-    for (x,y,w,h) in faces:
-        crop_img= frame[y:y+h, x:x+w,: ]
-        resized_img= cv2.resize(crop_img, (50,50)).flatten().reshape(1,-1)
-        output= knn.predict(resized_img)
-        ts= time.time()
-        date= datetime.fromtimestamp(ts).strftime("%d-%m-%y")
-        timestamp= datetime.fromtimestamp(ts).strftime("%H:%M-%S")
-        exit= os.path.isfile("Attendance/Attendance_" + date + ".csv")
-        cv2.putText(frame, str(output[0]), (x,y-15), cv2.FONT_HERSHEY_COMPLEX, 1, (255,255,255), 1)
+    for (x,y,w,h), output in zip(faces, result.names):
+        cv2.putText(frame, str(output), (x,y-15), cv2.FONT_HERSHEY_COMPLEX, 1, (255,255,255), 1)
         cv2.rectangle(frame, (x, y), (x+w, y+h), (50,50,225),1 )   
-        attendance = [str(output[0]), str(timestamp)]
+    # only faces that passed the unknown check are marked
+    recognized= [name for name, _ in result.recognized()]
+    attendance= recognized[-1] if recognized else None
     imgBackground[162:162 + 480, 55:55 + 640] = frame
     # Display the resulting frame
     cv2.imshow("Frame", imgBackground)
     k= cv2.waitKey(1)
     if k ==ord ('o'):
-        speak("Attendance Taken!") 
-        time.sleep(5)
-
-        if exit:
-            with open("Attendance/Attendance_" + date + ".csv", "a") as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(attendance)
-        else:
-            with open("Attendance/Attendance_" + date + ".csv", "w") as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(COL_NAMES)
-                writer.writerow(attendance)
+        announcer.announce("Attendance Taken!")
+        if attendance:
+            attendance_writer.mark(attendance)
                     
     # Check if the user pressed the 'q' key
     if k == ord('q') :
         break
 
+print(pipeline.format_stats())
+try:
+    pipeline.stop()
+except Exception as e:
+    print(f"❌ Recognition pipeline failed: {e}")
+announcer.close()
+attendance_writer.close()
+
 # Release the video capture object
 video.release()
 
@@ -0,0 +1,60 @@
+from datetime import date, datetime
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from attendance_archive import AttendanceArchive
+from attendance_db import AttendanceDB
+
+
+def _records(df):
+    return sorted(zip(df['NAME'], df['TS'].dt.strftime("%Y-%m-%d %H:%M:%S")))
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = AttendanceDB(str(tmp_path / 'attendance.db'))
+    db.insert([('Alice', datetime(2024, 1, 5, 9, 0)), ('Bob', datetime(2024, 1, 5, 9, 5)),
+               ('Alice', datetime(2024, 2, 1, 8, 55)), ('Carol', datetime(2024, 2, 29, 17, 0))], 'seed.csv')
+    yield db
+    db.close()
+
+
+def test_compact_then_load_round_trip(tmp_path, db):
+    archive = AttendanceArchive(str(tmp_path / 'archive'), db)
+    written = archive.compact(until=date(2024, 3, 1))
+
+    assert [key for key, _, _ in written] == ['2024-01', '2024-02']
+    assert (tmp_path / 'archive' / 'year=2024' / 'month=02' / 'attendance.parquet').exists()
+    # A fresh instance reads the manifest and partitions back
+    loaded = AttendanceArchive(str(tmp_path / 'archive'), db).load()
+    assert _records(loaded) == _records(db.query_records())
+    assert list(loaded.columns[:2]) == ['NAME', 'TS']
+
+    feb = archive.load(date(2024, 2, 1), date(2024, 2, 29), names=['Carol'])
+    assert _records(feb) == [('Carol', '2024-02-29 17:00:00')]
+    # Nothing changed, so a second run rewrites no month
+    assert archive.compact(until=date(2024, 3, 1)) == []
+
+
+def test_load_prefers_sqlite_for_months_edited_after_archiving(tmp_path, db):
+    archive = AttendanceArchive(str(tmp_path / 'archive'), db)
+    archive.compact(until=date(2024, 3, 1))
+    db.insert([('Dave', datetime(2024, 1, 20, 10, 0)), ('Erin', datetime(2024, 3, 2, 9, 0))], 'late.csv')
+
+    loaded = archive.load(date(2024, 1, 1), date(2024, 3, 31))
+    assert _records(loaded) == _records(db.query_records(date(2024, 1, 1), date(2024, 3, 31)))
+    assert archive.compact(until=date(2024, 3, 1))[0][0] == '2024-01'
+
+
+def test_short_view_counts_only_its_own_months(tmp_path, db, monkeypatch):
+    archive = AttendanceArchive(str(tmp_path / 'archive'), db)
+    archive.compact(until=date(2024, 3, 1))
+    calls = []
+    month_stats = db.month_stats
+    monkeypatch.setattr(db, 'month_stats', lambda start, end: calls.append((start, end)) or month_stats(start, end))
+
+    week = archive.load(date(2024, 1, 1), date(2024, 1, 7))
+    assert _records(week) == [('Alice', '2024-01-05 09:00:00'), ('Bob', '2024-01-05 09:05:00')]
+    assert calls == [(date(2024, 1, 1), date(2024, 1, 31))]
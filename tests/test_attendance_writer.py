@@ -0,0 +1,91 @@
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+from attendance_db import read_attendance_csv
+from attendance_writer import JOURNAL_FILE, AttendanceWriter
+
+
+@pytest.fixture
+def exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+@pytest.fixture
+def running_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+    yield process.pid
+    process.kill()
+    process.wait()
+
+
+def _crashed_batch(directory, pid):
+    """A day file with one committed row and a torn batch, plus the journal that batch left"""
+    path = os.path.join(directory, 'Attendance_05-01-24.csv')
+    with open(path, 'w', newline='') as f:
+        f.write("NAME,TIME\nAlice,09:00-00\n")
+    offset = os.path.getsize(path)
+    with open(path, 'a', newline='') as f:
+        f.write("Bob,09:0")
+    journal = os.path.join(directory, f"{JOURNAL_FILE}.{pid}.0")
+    with open(journal, 'w') as f:
+        json.dump([{'file': path, 'offset': offset, 'rows': [['Bob', '09:05-00'], ['Carol', '09:06-30']]}], f)
+    return path, journal
+
+
+def test_recover_replays_the_journal_of_an_exited_process(tmp_path, exited_pid):
+    path, journal = _crashed_batch(str(tmp_path), exited_pid)
+
+    writer = AttendanceWriter(str(tmp_path), flush_interval=0.05)
+    writer.close()
+
+    assert writer.recovered == 2
+    assert not os.path.exists(journal)
+    with open(path) as f:
+        assert f.read().splitlines() == ['NAME,TIME', 'Alice,09:00-00', 'Bob,09:05-00', 'Carol,09:06-30']
+
+
+def test_recover_leaves_a_live_writers_journal_alone(tmp_path, running_pid):
+    path, journal = _crashed_batch(str(tmp_path), running_pid)
+
+    writer = AttendanceWriter(str(tmp_path), flush_interval=0.05)
+    writer.mark('Dave', datetime(2024, 1, 5, 10, 0))
+    assert writer.flush()
+    writer.close()
+
+    assert writer.recovered == 0
+    assert os.path.exists(journal)
+    # The new writer used its own journal and cleared it
+    assert writer.journal_path != journal and not os.path.exists(writer.journal_path)
+
+
+def test_read_attendance_csv_normalizes_rows(tmp_path):
+    path = tmp_path / 'Attendance_05-01-24.csv'
+    path.write_text("NAME,TIME\nAlice,09:00-00\n\n , \nNAME,TIME\nBob,9:05:30\nCarol,17:45\n"
+                    "Dave,25:00-00\n,09:10-00\nErin\n")
+
+    rows, skipped = read_attendance_csv(str(path))
+
+    assert rows == [('Alice', datetime(2024, 1, 5, 9, 0, 0)), ('Bob', datetime(2024, 1, 5, 9, 5, 30)),
+                    ('Carol', datetime(2024, 1, 5, 17, 45, 0))]
+    assert skipped == 3
+
+
+def test_read_attendance_csv_tail_from_an_offset(tmp_path):
+    path = tmp_path / 'Attendance_05-01-24.csv'
+    path.write_text("NAME,TIME\nAlice,09:00-00\n")
+    offset = path.stat().st_size
+    with open(path, 'a') as f:
+        f.write("Bob,09:05-00\nCar")
+
+    assert read_attendance_csv(str(path), offset) is None
+    assert read_attendance_csv(str(path), offset, offset + len("Bob,09:05-00\n")) == \
+        ([('Bob', datetime(2024, 1, 5, 9, 5, 0))], 0)
+    # Not on a line boundary: the file was rewritten rather than appended to
+    assert read_attendance_csv(str(path), offset - 3) is None
@@ -0,0 +1,67 @@
+import threading
+
+import numpy as np
+import pytest
+
+from face_gallery import FaceGallery
+
+
+def _faces(n, seed):
+    return np.random.default_rng(seed).integers(0, 255, (n, 7500), dtype=np.uint8)
+
+
+def test_repair_keeps_pending_tombstones(tmp_path):
+    gallery = FaceGallery(str(tmp_path / 'gallery'))
+    gallery.append(_faces(10, 0), 'Papa')
+    gallery.append(_faces(10, 1), 'Mama')
+    gallery.remove('Papa')
+    (tmp_path / 'gallery' / 'labels.json.tmp').write_text('left by a crash')
+
+    moved = gallery.repair()
+
+    manifest = gallery.manifest()
+    assert [path.endswith('labels.json.tmp') for path in moved] == [True]
+    assert 'Papa' in manifest.removed
+    assert manifest.people == ['Mama']
+    assert manifest.pending_removal == ['Papa']
+    assert gallery.tombstones() == {'Papa'}
+
+
+def test_repair_quarantines_damaged_segments(tmp_path):
+    gallery = FaceGallery(str(tmp_path / 'gallery'))
+    gallery.append(_faces(10, 0), 'Papa')
+    seg_id = gallery.append(_faces(5, 1), 'Mama')
+    faces_path, _ = gallery._segment_paths(seg_id)
+    with open(faces_path, 'r+b') as f:
+        f.seek(-10, 2)
+        f.write(b'\xff' * 10)
+
+    assert gallery.validate() == {}
+    assert gallery.validate(deep=True) == {seg_id: 'checksum mismatch'}
+    gallery.repair()
+    assert gallery.validate(deep=True) == {}
+    assert gallery.manifest().counts == {'Papa': 10}
+
+
+@pytest.mark.parametrize('shared', [False, True], ids=['instance-per-thread', 'shared-instance'])
+def test_concurrent_appends_keep_every_segment(tmp_path, shared):
+    root = str(tmp_path / 'gallery')
+    common = FaceGallery(root)
+
+    def enroll(worker):
+        gallery = common if shared else FaceGallery(root)
+        for i in range(5):
+            gallery.append(_faces(2, worker * 10 + i), f"person{worker}")
+
+    threads = [threading.Thread(target=enroll, args=(worker,)) for worker in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    gallery = FaceGallery(root)
+    manifest = gallery.manifest()
+    assert len(manifest.data['segments']) == 30
+    assert manifest.counts == {f"person{worker}": 10 for worker in range(6)}
+    assert len(gallery.load()) == 60
+    assert gallery.uncommitted_files() == []
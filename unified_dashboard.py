@@ -2,11 +2,11 @@ import streamlit as st
 import pandas as pd
 import time
 import os
-import pickle
-import numpy as np
 from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
+from face_gallery import LEGACY_FACES_FILE, FaceGallery, load_manifest
+from attendance_db import get_db
 
 # Set page configuration
 st.set_page_config(
@@ -43,23 +43,22 @@ st.sidebar.markdown("### 🖥️ System Status")
 
 # Load system data with error handling for cloud deployment
 try:
-    if os.path.exists('data/names.pkl') and os.path.exists('data/faces_data.pkl'):
-        with open('data/names.pkl', 'rb') as f:
-            all_names = pickle.load(f)
-        with open('data/faces_data.pkl', 'rb') as f:
-            all_faces = pickle.load(f)
-        trained_people = list(set(all_names))
+    if FaceGallery().exists() or os.path.exists(LEGACY_FACES_FILE):
+        # Only the manifest is read: no face matrix on every rerun
+        manifest = load_manifest()
+        trained_people = manifest.people
+        sample_count = manifest.samples
     else:
         # Default data for cloud deployment demo
-        all_names = ['Akshita', 'Anshita', 'Papa', 'Mumma'] * 100  # 400 samples
-        all_faces = np.random.rand(400, 50, 50)  # Dummy face data
         trained_people = ['Akshita', 'Anshita', 'Papa', 'Mumma']
+        sample_count = 400
     st.sidebar.success(f"✅ System Active")
     st.sidebar.info(f"👥 {len(trained_people)} people trained")
-    st.sidebar.info(f"📊 {len(all_faces)} face samples")
+    st.sidebar.info(f"📊 {sample_count} face samples")
 except:
     st.sidebar.error("❌ No training data")
     trained_people = []
+    sample_count = 0
 
 # Main Content Area
 if st.session_state.current_page == 'Dashboard':
@@ -73,13 +72,14 @@ if st.session_state.current_page == 'Dashboard':
     
     # Today's attendance section
     st.markdown("### 📅 Today's Attendance")
-    attendance_file = f"Attendance/Attendance_{date}.csv"
+    db = get_db()
+    today = datetime.fromtimestamp(ts).date()
     
     col1, col2, col3, col4 = st.columns(4)
     
-    if os.path.exists(attendance_file):
+    if db.day_count(today):
         try:
-            df = pd.read_csv(attendance_file)
+            df = db.day_records(today)
             if not df.empty:
                 with col1:
                     st.metric("📋 Total Records", len(df))
@@ -98,7 +98,7 @@ if st.session_state.current_page == 'Dashboard':
         except Exception as e:
             st.error(f"Error reading attendance: {str(e)}")
     else:
-        st.info(f"📋 No attendance file found for today ({date})")
+        st.info(f"📋 No attendance recorded yet today ({date})")
         
     # System Information
     st.markdown("### 🖥️ System Information")
@@ -174,37 +174,25 @@ elif st.session_state.current_page == 'Analytics':
     st.title("📈 Analytics & Reports")
     st.markdown("---")
     
-    # Load all attendance files with error handling
-    attendance_files = []
-    if os.path.exists("Attendance/"):
-        attendance_files = [f for f in os.listdir("Attendance/") if f.endswith('.csv')]
+    # Metrics and charts read the rollup tables; only the raw table needs every record
+    try:
+        db = get_db()
+        summary = db.summary()
+    except Exception as e:
+        st.error(f"Error reading attendance database: {e}")
+        summary = None
     
-    if attendance_files:
-        # Combine all attendance data
-        all_data = []
-        for file in attendance_files:
-            try:
-                df = pd.read_csv(f"Attendance/{file}")
-                if not df.empty and 'NAME' in df.columns:
-                    # Extract date from filename
-                    date_str = file.replace('Attendance_', '').replace('.csv', '')
-                    df['DATE'] = date_str
-                    all_data.append(df)
-            except:
-                continue
-        
-        if all_data:
-            combined_df = pd.concat(all_data, ignore_index=True)
-            
+    if summary is not None:
+        if summary['records']:
             # Analytics
             col1, col2 = st.columns(2)
             
             with col1:
                 st.markdown("#### 👥 Attendance by Person")
-                person_counts = combined_df['NAME'].value_counts()
+                person_counts = db.person_summary()
                 fig_bar = px.bar(
-                    x=person_counts.index,
-                    y=person_counts.values,
+                    x=person_counts['NAME'],
+                    y=person_counts['Count'],
                     labels={'x': 'Person', 'y': 'Attendance Count'},
                     title="Total Attendance by Person"
                 )
@@ -212,10 +200,10 @@ elif st.session_state.current_page == 'Analytics':
             
             with col2:
                 st.markdown("#### 📅 Daily Attendance")
-                daily_counts = combined_df['DATE'].value_counts().sort_index()
+                daily_counts = db.daily_summary()
                 fig_line = px.line(
-                    x=daily_counts.index,
-                    y=daily_counts.values,
+                    x=daily_counts['Date'],
+                    y=daily_counts['Count'],
                     labels={'x': 'Date', 'y': 'Total Attendance'},
                     title="Daily Attendance Trend"
                 )
@@ -226,22 +214,19 @@ elif st.session_state.current_page == 'Analytics':
             summary_col1, summary_col2, summary_col3, summary_col4 = st.columns(4)
             
             with summary_col1:
-                st.metric("📋 Total Records", len(combined_df))
+                st.metric("📋 Total Records", summary['records'])
             with summary_col2:
-                st.metric("👥 Unique People", combined_df['NAME'].nunique())
+                st.metric("👥 Unique People", summary['people'])
             with summary_col3:
-                st.metric("📅 Days with Data", combined_df['DATE'].nunique())
+                st.metric("📅 Days with Data", summary['days'])
             with summary_col4:
-                avg_daily = len(combined_df) / combined_df['DATE'].nunique()
-                st.metric("📈 Avg Daily Attendance", f"{avg_daily:.1f}")
+                st.metric("📈 Avg Daily Attendance", f"{summary['avg_daily']:.1f}")
             
             # Raw data table
             st.markdown("### 📄 All Attendance Records")
-            st.dataframe(combined_df, use_container_width=True)
+            st.dataframe(db.records()[['NAME', 'TIME', 'DATE']], use_container_width=True)
         else:
-            st.info("No valid attendance data found")
-    else:
-        st.info("No attendance files found")
+            st.info("No attendance records found")
 
 elif st.session_state.current_page == 'Settings':
     st.title("⚙️ System Settings")
@@ -256,8 +241,8 @@ elif st.session_state.current_page == 'Settings':
         st.markdown("#### 📊 Training Data")
         if trained_people:
             st.success(f"✅ {len(trained_people)} people trained")
-            st.info(f"📈 {len(all_faces)} total face samples")
-            st.info(f"🎯 Average samples per person: {len(all_faces)//len(trained_people) if trained_people else 0}")
+            st.info(f"📈 {sample_count} total face samples")
+            st.info(f"🎯 Average samples per person: {sample_count//len(trained_people) if trained_people else 0}")
         else:
             st.warning("❌ No training data found")
     
@@ -270,6 +255,8 @@ elif st.session_state.current_page == 'Settings':
                     st.info(f"📄 {file}")
                 elif file.endswith('.xml'):
                     st.info(f"🤖 {file}")
+                elif os.path.isdir(os.path.join("data", file)):
+                    st.info(f"📁 {file}/")
         else:
             st.warning("Data directory not found")
     
@@ -1,11 +1,13 @@
 import streamlit as st
 import pandas as pd
 import os
-import pickle
+import time
 import cv2
 import numpy as np
 from datetime import datetime
 import json
+from face_gallery import GALLERY_DIR, FaceGallery, load_manifest
+from compact_gallery import start_background_purge
 
 def load_user_database():
     """Load user information database"""
@@ -27,15 +29,15 @@ def main():
     # Load current users
     user_db = load_user_database()
     
-    # Load face recognition data
+    # Gallery summary from the manifest (the face matrix itself is never loaded here)
     try:
-        with open('data/names.pkl', 'rb') as f:
-            names = pickle.load(f)
-        with open('data/faces_data.pkl', 'rb') as f:
-            faces = pickle.load(f)
+        manifest = load_manifest()
+        sample_counts = manifest.counts
         
-        current_users = list(set(names))
+        current_users = manifest.people
     except:
+        manifest = None
+        sample_counts = {}
         current_users = []
         st.error("Could not load face recognition data!")
     
@@ -62,7 +64,7 @@ def main():
             with col2:
                 st.subheader("📊 Statistics")
                 st.metric("Total Users", len(current_users))
-                st.metric("Face Samples", len(names))
+                st.metric("Face Samples", sum(sample_counts.values()))
                 
                 # Show user roles
                 roles = [user_db.get(user, {}).get('role', 'Student') for user in current_users]
@@ -141,9 +143,12 @@ def main():
                     st.write(user_info['notes'])
                 
                 # Face recognition stats
-                user_face_count = names.count(selected_user) if selected_user in names else 0
+                user_face_count = sample_counts.get(selected_user, 0)
                 st.subheader("🤖 Face Recognition Stats")
                 st.metric("Face Samples Trained", user_face_count)
+                first_enrolled, last_enrolled = manifest.enrolled_at(selected_user) if manifest else (None, None)
+                if first_enrolled:
+                    st.write(f"**Enrolled:** {first_enrolled[:10]} (last update {last_enrolled[:10]})")
                 
                 if user_face_count > 0:
                     st.success("✅ Face recognition trained")
@@ -156,10 +161,30 @@ def main():
         
         if current_users:
             user_to_remove = st.selectbox("Select User to Remove", current_users)
+            confirm = st.checkbox(f"I understand {user_to_remove}'s face samples will be deleted")
             
-            if st.button("❌ Remove User", type="primary"):
-                st.error("🚧 Feature under development - Manual removal required")
-                st.info("To manually remove a user, you'll need to retrain the system without that person's data.")
+            if st.button("❌ Remove User", type="primary", disabled=not confirm):
+                try:
+                    start = time.perf_counter()
+                    FaceGallery().remove(user_to_remove)
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    if user_to_remove in user_db:
+                        user_db[user_to_remove]['face_trained'] = False
+                        save_user_database(user_db)
+                    # Recognizers stop matching them within a second; the rewrite happens in the background
+                    start_background_purge()
+                    st.success(f"✅ {user_to_remove} removed in {elapsed_ms:.1f} ms")
+                    st.info("🧹 Their samples are being compacted out of the gallery and index in the background.")
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+        else:
+            st.info("No users to remove")
+        
+        if manifest is not None and manifest.pending_removal:
+            st.warning(f"🧹 Awaiting compaction: {', '.join(manifest.pending_removal)}")
+            if st.button("🔄 Compact Now"):
+                start_background_purge()
+                st.info("Compaction started in the background.")
     
     elif action == "Backup Data":
         st.header("💾 Backup & Export")
@@ -175,8 +200,7 @@ def main():
                 # Copy important files
                 import shutil
                 try:
-                    shutil.copy('data/faces_data.pkl', backup_dir)
-                    shutil.copy('data/names.pkl', backup_dir)
+                    shutil.copytree(GALLERY_DIR, os.path.join(backup_dir, 'gallery'))
                     if os.path.exists('data/user_database.json'):
                         shutil.copy('data/user_database.json', backup_dir)
                     
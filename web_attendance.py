@@ -1,13 +1,14 @@
 import streamlit as st
 import cv2
-import pickle
 import numpy as np
 import pandas as pd
 import time
 import os
-import csv
 from datetime import datetime
-from sklearn.neighbors import KNeighborsClassifier
+from face_gallery import load_manifest
+from recognition_engine import RecognitionEngine
+from face_detection import detector_from_config
+from attendance_writer import get_writer
 import threading
 from streamlit_webrtc import webrtc_streamer, VideoTransformerBase, RTCConfiguration
 import av
@@ -22,38 +23,30 @@ st.set_page_config(
 st.title("📷 Live Face Recognition Attendance")
 st.markdown("---")
 
-# Load face recognition data
-@st.cache_data
+# Trained people and their sample counts, from the gallery manifest
 def load_face_data():
-    try:
-        with open('data/names.pkl', 'rb') as f:
-            names = pickle.load(f)
-        with open('data/faces_data.pkl', 'rb') as f:
-            faces = pickle.load(f)
-        return names, faces
-    except FileNotFoundError:
+    manifest = load_manifest()
+    if not manifest.samples:
         st.error("Face recognition data not found. Please run addFaces.py first.")
-        return None, None
+        return None
+    return manifest.counts
 
-# Initialize face detection
-@st.cache_resource
+# Initialize face detection (one per stream: the detector remembers the previous faces)
 def load_face_detector():
-    return cv2.CascadeClassifier('data/haarcascade_frontalface_default.xml')
+    return detector_from_config()
 
-# Initialize KNN model
+# Initialize recognition engine (shared by every stream; it hot-reloads new enrollments itself)
 @st.cache_resource
-def load_knn_model():
-    names, faces = load_face_data()
-    if names is not None and faces is not None:
-        knn = KNeighborsClassifier(n_neighbors=5)
-        knn.fit(faces, names)
-        return knn
-    return None
+def load_recognition_engine():
+    try:
+        return RecognitionEngine(n_neighbors=5, threshold=0.6)
+    except FileNotFoundError:
+        return None
 
 class FaceRecognitionTransformer(VideoTransformerBase):
     def __init__(self):
         self.face_detector = load_face_detector()
-        self.knn_model = load_knn_model()
+        self.engine = load_recognition_engine()
         self.last_detection = None
         self.detection_time = None
         self.confidence_threshold = 0.6
@@ -61,25 +54,19 @@ class FaceRecognitionTransformer(VideoTransformerBase):
     def transform(self, frame):
         img = frame.to_ndarray(format="bgr24")
         
-        if self.knn_model is None:
+        if self.engine is None:
             cv2.putText(img, "No trained model found", (10, 30), 
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
             return img
         
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        faces = self.face_detector.detectMultiScale(gray, 1.3, 5)
+        faces = self.face_detector.detect(gray)
         
-        for (x, y, w, h) in faces:
-            # Extract face region
-            face_roi = img[y:y+h, x:x+w]
-            resized_face = cv2.resize(face_roi, (50, 50)).flatten().reshape(1, -1)
-            
-            # Predict
-            prediction = self.knn_model.predict(resized_face)
-            probabilities = self.knn_model.predict_proba(resized_face)
-            confidence = np.max(probabilities)
-            
-            name = prediction[0] if confidence > self.confidence_threshold else "Unknown"
+        # One neighbour search for every face in the frame
+        result = self.engine.recognize_frame(img, faces)
+        
+        for (x, y, w, h), prediction, confidence in zip(faces, result.labels, result.confidence):
+            name = prediction if confidence > self.confidence_threshold else "Unknown"
             
             # Draw rectangle and name
             color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
@@ -97,8 +84,8 @@ class FaceRecognitionTransformer(VideoTransformerBase):
         return img
 
 # Load data
-names, faces = load_face_data()
-if names is None or faces is None:
+sample_counts = load_face_data()
+if sample_counts is None:
     st.stop()
 
 # Sidebar controls
@@ -134,35 +121,15 @@ if ctx.video_transformer:
         
         # Attendance button
         if st.sidebar.button("✅ Mark Attendance", type="primary"):
-            # Save attendance
-            ts = time.time()
-            date = datetime.fromtimestamp(ts).strftime("%d-%m-%y")
-            timestamp = datetime.fromtimestamp(ts).strftime("%H:%M-%S")
-            
-            attendance_file = f"Attendance/Attendance_{date}.csv"
-            attendance_data = [detected_name, timestamp]
+            # Save attendance through the shared writer; wait so the table below includes it
+            writer = get_writer()
+            writer.mark(detected_name)
             
-            # Check if file exists
-            file_exists = os.path.isfile(attendance_file)
-            
-            try:
-                if file_exists:
-                    # Append to existing file
-                    with open(attendance_file, "a", newline='') as csvfile:
-                        writer = csv.writer(csvfile)
-                        writer.writerow(attendance_data)
-                else:
-                    # Create new file with headers
-                    with open(attendance_file, "w", newline='') as csvfile:
-                        writer = csv.writer(csvfile)
-                        writer.writerow(["NAME", "TIME"])
-                        writer.writerow(attendance_data)
-                
+            if writer.flush():
                 st.sidebar.success(f"✅ Attendance marked for {detected_name}!")
                 st.balloons()
-                
-            except Exception as e:
-                st.sidebar.error(f"Error saving attendance: {str(e)}")
+            else:
+                st.sidebar.error("Error saving attendance: the write failed or timed out")
     else:
         st.sidebar.info("👁️ Looking for faces...")
 
@@ -203,38 +170,21 @@ with st.expander("Add attendance manually"):
     
     with col1:
         # Get available names from training data
-        available_names = list(set(names))
+        available_names = list(sample_counts)
         selected_name = st.selectbox("Select Person", available_names)
     
     with col2:
         manual_time = st.time_input("Time", datetime.now().time())
     
     if st.button("➕ Add Manual Entry"):
-        ts = time.time()
-        date = datetime.fromtimestamp(ts).strftime("%d-%m-%y")
-        manual_timestamp = manual_time.strftime("%H:%M-%S")
-        
-        attendance_file = f"Attendance/Attendance_{date}.csv"
-        attendance_data = [selected_name, manual_timestamp]
-        
-        file_exists = os.path.isfile(attendance_file)
+        writer = get_writer()
+        writer.mark(selected_name, datetime.combine(datetime.now().date(), manual_time))
         
-        try:
-            if file_exists:
-                with open(attendance_file, "a", newline='') as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerow(attendance_data)
-            else:
-                with open(attendance_file, "w", newline='') as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerow(["NAME", "TIME"])
-                    writer.writerow(attendance_data)
-            
+        if writer.flush():
             st.success(f"✅ Manual attendance added for {selected_name}!")
             st.rerun()
-            
-        except Exception as e:
-            st.error(f"Error adding manual attendance: {str(e)}")
+        else:
+            st.error("Error adding manual attendance: the write failed or timed out")
 
 # Instructions
 with st.expander("📖 How to Use"):